@@ -1,99 +1,242 @@
 import os
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional
 from pyairtable import Table
 import logging
 from dotenv import load_dotenv
 
+from metrics import metrics
+from rate_limit import TokenBucket, backoff_delay, retry_after, status_code
+
 # Load environment variables
 load_dotenv()
 
 log = logging.getLogger(__name__)
 
+# Airtable accepts at most 10 records per write request and 5 requests per second per base
+BATCH_SIZE = 10
+REQUESTS_PER_SECOND = 5
+MAX_RETRIES = 5
+
+# Fields that identify a record; writes upsert on them, so a retried write never duplicates records
+COURSE_KEY_FIELDS = ['Course Number', 'Subject Code']
+SECTION_KEY_FIELDS = ['Course Code', 'Section ID']
+
+
+def chunked(items: List, size: int = BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _batch_records(result) -> List[Dict]:
+    # batch_upsert returns a dict in pyairtable 2.x and a plain list before that
+    return result['records'] if isinstance(result, dict) else result
+
+
+def _rejected(error: Exception) -> bool:
+    # A 4xx means Airtable refused the request, so nothing in it was written
+    status = status_code(error)
+    return status is not None and 400 <= status < 500
+
+
 class AirtableManager:
-    def __init__(self):
+    def __init__(self, batch_writes: bool = True, requests_per_second: float = REQUESTS_PER_SECOND, max_retries: int = MAX_RETRIES):
         # Get environment variables
         self.api_key = os.getenv('AIRTABLE_API_KEY')
         self.base_id = os.getenv('AIRTABLE_BASE_ID')
-        
+
         # Extract table IDs from the full paths
         courses_table_path = os.getenv('AIRTABLE_TABLE_NAME_COURSES', '')
         sections_table_path = os.getenv('AIRTABLE_TABLE_NAME_SECTIONS', '')
-        
+
         self.courses_table_id = courses_table_path.split('/')[0] if '/' in courses_table_path else courses_table_path
         self.sections_table_id = sections_table_path.split('/')[0] if '/' in sections_table_path else sections_table_path
-        
+
         if not all([self.api_key, self.base_id, self.courses_table_id, self.sections_table_id]):
             raise ValueError("Missing required Airtable environment variables")
-        
+
         # Initialize Airtable tables
         self.courses_table = Table(self.api_key, self.base_id, self.courses_table_id)
         self.sections_table = Table(self.api_key, self.base_id, self.sections_table_id)
-        
+
+        # Write behaviour; all requests share one rate limiter
+        self.batch_writes = batch_writes
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket(requests_per_second)
+
         log.info(f"Initialized Airtable connection with base ID: {self.base_id}")
         log.info(f"Using courses table: {self.courses_table_id}")
         log.info(f"Using sections table: {self.sections_table_id}")
-    
+
+    def call(self, func, *args, **kwargs):
+        """Call the Airtable API under the rate limit, retrying on 429 and 5xx responses.
+
+        Writes are upserts on the key fields, so resending one that the
+        server committed before failing doesn't create duplicates.
+        """
+        for attempt in range(self.max_retries + 1):
+            metrics.observe('airtable_throttle', self.rate_limiter.acquire())
+            try:
+                with metrics.timer('airtable_request'):
+                    return func(*args, **kwargs)
+            except Exception as e:
+                status = status_code(e)
+                retryable = status == 429 or (status is not None and status >= 500)
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = retry_after(e) or backoff_delay(attempt)
+                metrics.incr('airtable_retries')
+                log.warning(f"Airtable returned {status}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    @staticmethod
+    def course_fields(course: Dict) -> Dict:
+        return {
+            'Course Number': course['number'],
+            'Course Name': course['name'],
+            'Units': course.get('units', 'N/A'),
+            'Subject Code': course.get('subject_code', 'N/A'),
+        }
+
+    @staticmethod
+    def course_code(course: Dict) -> str:
+        return f"{course.get('subject_code', 'N/A')} {course['number']}"
+
+    @staticmethod
+    def section_fields(section: Dict, course_id: str, course_code: str) -> Dict:
+        return {
+            'Course Code': course_code,
+            'Section ID': section['sectionId'],
+            'Meeting Type': section['meetingType'],
+            'Days': section['days'],
+            'Time': section['time'],
+            'Building': section['building'],
+            'Room': section['room'],
+            'Instructor': section['instructor'],
+            'Available Seats': section.get('available', 0),
+            'Seat Limit': section.get('limit', 0),
+            'Course Link': [course_id]  # Link to the parent course
+        }
+
+    def _upsert(self, table, fields: List[Dict], key_fields: List[str]) -> List[str]:
+        result = self.call(table.batch_upsert, [{'fields': f} for f in fields], key_fields)
+        return [record['id'] for record in _batch_records(result)]
+
     def create_course(self, course: Dict) -> str:
-        """Create a course record in Airtable and return its ID."""
+        """Create (or update) a course record in Airtable and return its ID."""
         try:
-            # Clean up course data
-            course_data = {
-                'Course Number': course['number'],
-                'Course Name': course['name'],
-                'Units': course.get('units', 'N/A'),
-                'Subject Code': course.get('subject_code', 'N/A'),
-            }
-            
             # Create course record
-            record = self.courses_table.create(course_data)
+            record_id, = self._upsert(self.courses_table, [self.course_fields(course)], COURSE_KEY_FIELDS)
             log.info(f"Created course: {course['number']} - {course['name']}")
-            return record['id']
-            
+            return record_id
+
         except Exception as e:
             log.error(f"Error creating course {course.get('number', 'unknown')}: {e}")
             return None
-    
-    def create_section(self, section: Dict, course_id: str) -> str:
-        """Create a section record in Airtable and return its ID."""
+
+    def create_section(self, section: Dict, course_id: str, course_code: str) -> str:
+        """Create (or update) a section record in Airtable and return its ID."""
         try:
-            # Clean up section data
-            section_data = {
-                'Section ID': section['sectionId'],
-                'Meeting Type': section['meetingType'],
-                'Days': section['days'],
-                'Time': section['time'],
-                'Building': section['building'],
-                'Room': section['room'],
-                'Instructor': section['instructor'],
-                'Available Seats': section.get('available', 0),
-                'Seat Limit': section.get('limit', 0),
-                'Course Link': [course_id]  # Link to the parent course
-            }
-            
             # Create section record
-            record = self.sections_table.create(section_data)
+            record_id, = self._upsert(self.sections_table, [self.section_fields(section, course_id, course_code)],
+                                      SECTION_KEY_FIELDS)
             log.info(f"Created section: {section['sectionId']}")
-            return record['id']
-            
+            return record_id
+
         except Exception as e:
             log.error(f"Error creating section {section.get('sectionId', 'unknown')}: {e}")
             return None
-    
-    def upload_courses(self, courses: List[Dict]) -> None:
-        """Upload a list of courses and their sections to Airtable."""
+
+    def batch_create_courses(self, courses: List[Dict]) -> List[Optional[str]]:
+        """Upsert courses 10 at a time and return their IDs in input order.
+
+        A batch Airtable rejected (a 4xx response) is retried record by record,
+        so a single invalid course is reported without losing the rest. A batch
+        that still fails after call()'s retries is reported as failed.
+        """
+        course_ids = []
+        for chunk in chunked(courses):
+            try:
+                course_ids.extend(self._upsert(self.courses_table, [self.course_fields(c) for c in chunk],
+                                               COURSE_KEY_FIELDS))
+                log.info(f"Created {len(chunk)} courses: {', '.join(c['number'] for c in chunk)}")
+            except Exception as e:
+                if not _rejected(e):
+                    log.error(f"Course batch {', '.join(c['number'] for c in chunk)} failed: {e}")
+                    course_ids.extend([None] * len(chunk))
+                    continue
+                log.warning(f"Course batch failed ({e}), falling back to single writes")
+                course_ids.extend(self.create_course(course) for course in chunk)
+        return course_ids
+
+    def batch_create_sections(self, sections: List[Dict], course_ids: List[str],
+                              course_codes: List[str]) -> List[Optional[str]]:
+        """Upsert sections 10 at a time, each linked to the matching course ID.
+
+        Failed batches are handled as in batch_create_courses.
+        """
+        section_ids = []
+        for chunk in chunked(list(zip(sections, course_ids, course_codes))):
+            try:
+                section_ids.extend(self._upsert(self.sections_table,
+                                                [self.section_fields(*item) for item in chunk], SECTION_KEY_FIELDS))
+                log.info(f"Created {len(chunk)} sections: {', '.join(s['sectionId'] for s, _, _ in chunk)}")
+            except Exception as e:
+                if not _rejected(e):
+                    log.error(f"Section batch {', '.join(s['sectionId'] for s, _, _ in chunk)} failed: {e}")
+                    section_ids.extend([None] * len(chunk))
+                    continue
+                log.warning(f"Section batch failed ({e}), falling back to single writes")
+                section_ids.extend(self.create_section(*item) for item in chunk)
+        return section_ids
+
+    def upload_courses_batched(self, courses: List[Dict]) -> int:
+        """Upload courses, then all of their sections, using batched requests.
+
+        Returns the number of records (courses and sections) that failed.
+        """
+        course_ids = self.batch_create_courses(courses)
+        failed = 0
+
+        sections, section_course_ids, section_course_codes = [], [], []
+        for course, course_id in zip(courses, course_ids):
+            if not course_id:
+                failed += 1 + len(course['sections'])
+                continue
+            for section in course['sections']:
+                sections.append(section)
+                section_course_ids.append(course_id)
+                section_course_codes.append(self.course_code(course))
+
+        section_ids = self.batch_create_sections(sections, section_course_ids, section_course_codes)
+        return failed + sum(1 for section_id in section_ids if not section_id)
+
+    def upload_courses(self, courses: List[Dict]) -> bool:
+        """Upload a list of courses and their sections to Airtable.
+
+        Returns True when every record was written.
+        """
         try:
             log.info(f"Starting upload of {len(courses)} courses to Airtable")
-            for course in courses:
-                # Create course record
-                course_id = self.create_course(course)
-                if not course_id:
-                    continue
-                
-                # Create section records
-                for section in course['sections']:
-                    self.create_section(section, course_id)
+            failed = 0
+            if self.batch_writes:
+                failed = self.upload_courses_batched(courses)
+            else:
+                for course in courses:
+                    # Create course record
+                    course_id = self.create_course(course)
+                    if not course_id:
+                        failed += 1 + len(course['sections'])
+                        continue
+
+                    # Create section records
+                    for section in course['sections']:
+                        if not self.create_section(section, course_id, self.course_code(course)):
+                            failed += 1
             log.info("Finished uploading courses to Airtable")
-                    
+            return failed == 0
+
         except Exception as e:
             log.error(f"Error uploading courses: {e}")
             log.exception("Stack trace:")
+            return False
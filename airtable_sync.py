@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from airtable_integration import AirtableManager, chunked
+
+log = logging.getLogger(__name__)
+
+# Section fields compared between a scrape and the stored record ('Course Link' is part of the key)
+SECTION_FIELD_NAMES = [
+    'Course Code', 'Section ID', 'Meeting Type', 'Days', 'Time', 'Building', 'Room',
+    'Instructor', 'Available Seats', 'Seat Limit',
+]
+
+SectionKey = Tuple[str, str, str]
+
+
+def fingerprint(fields: Dict) -> str:
+    """Stable hash of the comparable section fields."""
+    payload = json.dumps([fields.get(name) for name in SECTION_FIELD_NAMES], separators=(',', ':'))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+@dataclass
+class SyncSummary:
+    courses_created: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    failed: int = 0
+    changed_fields: Dict[str, int] = field(default_factory=dict)
+
+    def __str__(self):
+        text = (f"{self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged, "
+                f"{self.deleted} deleted, {self.courses_created} new courses, {self.failed} failed")
+        if self.changed_fields:
+            text += " (changed: " + ', '.join(f"{k}={v}" for k, v in sorted(self.changed_fields.items())) + ")"
+        return text
+
+
+class IncrementalSync:
+    """Write only new or changed sections to Airtable.
+
+    Existing records are indexed once by (subject_code, course number, sectionId)
+    with a bulk read at startup. It exposes the same upload_courses() method as
+    AirtableManager, so it can be passed wherever the manager is used; call
+    complete_subject() once every page of a subject has been uploaded, and
+    finish() at the end of the run for optional deletes and the diff summary.
+    """
+
+    def __init__(self, airtable: AirtableManager, delete_missing: bool = False):
+        self.airtable = airtable
+        self.delete_missing = delete_missing
+        self.summary = SyncSummary()
+
+        self.course_ids: Dict[Tuple[str, str], str] = {}
+        self.sections: Dict[SectionKey, Tuple[str, str, Dict]] = {}
+        self.duplicates: List[Tuple[SectionKey, str]] = []
+        self.seen: set = set()
+        self.subjects_complete: set = set()
+        self.subjects_failed: set = set()
+
+    def load_index(self) -> None:
+        """Read every existing course and section in one paginated pass per table."""
+        airtable = self.airtable
+        courses = airtable.call(airtable.courses_table.all, fields=['Course Number', 'Subject Code'])
+        course_keys = {}
+        for record in courses:
+            fields = record.get('fields', {})
+            key = (fields.get('Subject Code', 'N/A'), fields.get('Course Number', ''))
+            self.course_ids.setdefault(key, record['id'])
+            course_keys[record['id']] = key
+
+        sections = airtable.call(airtable.sections_table.all, fields=SECTION_FIELD_NAMES + ['Course Link'])
+        for record in sections:
+            fields = record.get('fields', {})
+            links = fields.get('Course Link') or []
+            if not links or links[0] not in course_keys:
+                continue
+            subject_code, number = course_keys[links[0]]
+            key = (subject_code, number, fields.get('Section ID', ''))
+            if key in self.sections:
+                self.duplicates.append((key, record['id']))
+                continue
+            self.sections[key] = (record['id'], fingerprint(fields), fields)
+
+        log.info(f"Indexed {len(self.course_ids)} courses and {len(self.sections)} sections "
+                 f"({len(self.duplicates)} duplicates)")
+
+    def _course_ids_for(self, courses: List[Dict]) -> List[Optional[str]]:
+        keys = [(c.get('subject_code', 'N/A'), c['number']) for c in courses]
+        missing = [c for c, key in zip(courses, keys) if key not in self.course_ids]
+        if missing:
+            created = self.airtable.batch_create_courses(missing)
+            for course, course_id in zip(missing, created):
+                if course_id:
+                    self.course_ids[(course.get('subject_code', 'N/A'), course['number'])] = course_id
+                    self.summary.courses_created += 1
+        return [self.course_ids.get(key) for key in keys]
+
+    def upload_courses(self, courses: List[Dict]) -> bool:
+        """Insert new sections and update changed ones; unchanged sections cost no requests.
+
+        Returns True when every write for these courses succeeded.
+        """
+        failed_before = self.summary.failed
+        try:
+            inserts, insert_course_ids, insert_course_codes, insert_keys, updates = [], [], [], [], []
+            for course, course_id in zip(courses, self._course_ids_for(courses)):
+                subject_code = course.get('subject_code', 'N/A')
+                if not course_id:
+                    self.summary.failed += len(course['sections'])
+                    continue
+
+                course_code = AirtableManager.course_code(course)
+                for section in course['sections']:
+                    key = (subject_code, course['number'], section['sectionId'])
+                    self.seen.add(key)
+                    new_fields = AirtableManager.section_fields(section, course_id, course_code)
+                    existing = self.sections.get(key)
+                    if existing is None:
+                        inserts.append(section)
+                        insert_course_ids.append(course_id)
+                        insert_course_codes.append(course_code)
+                        insert_keys.append((key, new_fields))
+                        continue
+
+                    record_id, old_fingerprint, old_fields = existing
+                    new_fingerprint = fingerprint(new_fields)
+                    if new_fingerprint == old_fingerprint:
+                        self.summary.unchanged += 1
+                        continue
+
+                    changed = {name: new_fields[name] for name in SECTION_FIELD_NAMES
+                               if old_fields.get(name) != new_fields[name]}
+                    for name in changed:
+                        self.summary.changed_fields[name] = self.summary.changed_fields.get(name, 0) + 1
+                    updates.append((key, changed, (record_id, new_fingerprint, {**old_fields, **changed})))
+
+            if inserts:
+                created = self.airtable.batch_create_sections(inserts, insert_course_ids, insert_course_codes)
+                for (key, new_fields), record_id in zip(insert_keys, created):
+                    if record_id:
+                        # Indexed so that re-uploading the page updates instead of inserting again
+                        self.sections[key] = (record_id, fingerprint(new_fields), new_fields)
+                        self.summary.inserted += 1
+                    else:
+                        self.summary.failed += 1
+            self._apply_updates(updates)
+            ok = self.summary.failed == failed_before
+
+        except Exception as e:
+            log.error(f"Error syncing courses: {e}")
+            log.exception("Stack trace:")
+            ok = False
+        if not ok:
+            self.subjects_failed.update(c.get('subject_code', 'N/A') for c in courses)
+        return ok
+
+    def complete_subject(self, subject_code: str) -> None:
+        """Mark a subject as fully scraped, making it eligible for delete_missing."""
+        self.subjects_complete.add(subject_code)
+
+    def update_sections(self, changes: Dict[SectionKey, Dict]) -> int:
+        """Write the given fields of already indexed sections; unknown keys are skipped."""
+        updates = []
+        for key, fields in changes.items():
+            existing = self.sections.get(key)
+            if existing is None:
+                log.warning(f"No Airtable record for section {' '.join(key)}")
+                continue
+            record_id, _, old_fields = existing
+            merged = {**old_fields, **fields}
+            updates.append((key, fields, (record_id, fingerprint(merged), merged)))
+        self._apply_updates(updates)
+        return len(updates)
+
+    def _apply_updates(self, updates: List[Tuple[SectionKey, Dict, Tuple[str, str, Dict]]]) -> None:
+        """Write (key, changed fields, new index entry) updates; the index only follows successful writes."""
+        airtable = self.airtable
+        for chunk in chunked(updates):
+            try:
+                airtable.call(airtable.sections_table.batch_update,
+                              [{'id': entry[0], 'fields': fields} for _, fields, entry in chunk])
+                self.summary.updated += len(chunk)
+            except Exception as e:
+                log.error(f"Error updating sections {', '.join(entry[0] for _, _, entry in chunk)}: {e}")
+                self.summary.failed += len(chunk)
+                continue
+            for key, _, entry in chunk:
+                self.sections[key] = entry
+
+    def _delete(self, record_ids: List[str]) -> None:
+        airtable = self.airtable
+        for chunk in chunked(record_ids):
+            try:
+                airtable.call(airtable.sections_table.batch_delete, chunk)
+                self.summary.deleted += len(chunk)
+            except Exception as e:
+                log.error(f"Error deleting sections {', '.join(chunk)}: {e}")
+                self.summary.failed += len(chunk)
+
+    def finish(self) -> SyncSummary:
+        """Optionally delete vanished sections, then log and return the diff summary.
+
+        Only subjects this run scraped completely and wrote without errors
+        are considered for deletion, so a partial or failed run never removes
+        records it simply didn't get to.
+        """
+        if self.delete_missing:
+            complete = self.subjects_complete - self.subjects_failed
+            skipped = self.subjects_failed & self.subjects_complete
+            if skipped:
+                log.warning(f"Not deleting missing sections of {', '.join(sorted(skipped))}: some writes failed")
+            stale = [record_id for key, (record_id, _, _) in self.sections.items()
+                     if key[0] in complete and key not in self.seen]
+            stale += [record_id for key, record_id in self.duplicates if key[0] in complete]
+            self._delete(stale)
+        log.info(f"Incremental sync finished: {self.summary}")
+        return self.summary
@@ -0,0 +1,201 @@
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from checkpoint import CheckpointJournal, complete_subject, fail_subject, subject_code_of, upload_page
+from metrics import metrics
+from sinks import Sink
+from soc_parser import parse_batch_page
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 8
+MAX_BATCH_SIZE = 32
+# Results pages one search should produce; bigger searches are slower to page through and to retry
+TARGET_PAGES = 6
+
+
+class AdaptiveBatcher:
+    """Group subjects into multi-subject searches of about `target_pages` results pages.
+
+    The batch size follows a running estimate of pages per subject, so runs
+    of small subjects are searched together in larger groups and large
+    subjects in smaller ones. A failed search is split in half and requeued,
+    and the batch size is halved as well.
+    """
+
+    def __init__(self, subjects: List[Dict], batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_batch_size: int = MAX_BATCH_SIZE, target_pages: float = TARGET_PAGES):
+        self.queue = deque(subjects)
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_size = min(max(1, batch_size), self.max_batch_size)
+        self.target_pages = target_pages
+        self.pages_per_subject: Optional[float] = None
+
+    def __iter__(self):
+        while self.queue:
+            size = min(self.batch_size, len(self.queue))
+            yield [self.queue.popleft() for _ in range(size)]
+
+    def record(self, batch: List[Dict], pages: int):
+        observed = pages / len(batch)
+        if self.pages_per_subject is None:
+            self.pages_per_subject = observed
+        else:
+            self.pages_per_subject = 0.5 * self.pages_per_subject + 0.5 * observed
+        size = round(self.target_pages / max(self.pages_per_subject, 0.1))
+        self.batch_size = min(max(1, size), self.max_batch_size)
+
+    def record_failure(self, batch: List[Dict]) -> bool:
+        """Shrink the batch size; returns True if the subjects were requeued for another try."""
+        self.batch_size = max(1, len(batch) // 2)
+        if len(batch) == 1:
+            return False
+        half = len(batch) // 2
+        for group in (batch[half:], batch[:half]):
+            self.queue.extendleft(reversed(group))
+        return True
+
+
+def split_resumed(subjects: List[Dict], journal: Optional[CheckpointJournal]) -> Tuple[List[Dict], List[Dict]]:
+    """Split into (batchable, single) subjects.
+
+    Subjects the journal already has pages for are scraped on their own, so
+    that page numbers line up with what the previous run recorded.
+    """
+    if not journal:
+        return subjects, []
+    batchable, single = [], []
+    for subject in subjects:
+        (single if journal.pages.get(subject_code_of(subject)) else batchable).append(subject)
+    return batchable, single
+
+
+def upload_batch(sink: Sink, batch: List[Dict], courses: List[Dict], journal: Optional[CheckpointJournal] = None,
+                 no_classes: bool = False, work=None) -> List[Dict]:
+    """Upload a finished batch one subject at a time and mark each subject done.
+
+    Returns the subjects of the batch that have no courses in the results.
+    Unless the search showed "No classes found", those are neither uploaded
+    nor journaled, so the caller can search them again on their own.
+    """
+    by_subject: Dict[str, List[Dict]] = {}
+    for course in courses:
+        by_subject.setdefault(course['subject_code'], []).append(course)
+
+    codes = [subject_code_of(subject) for subject in batch]
+    missing = []
+    for subject, code in zip(batch, codes):
+        subject_courses = by_subject.get(code, [])
+        if subject_courses:
+            log.info(f"Extracted {len(subject_courses)} courses for {code}")
+        elif no_classes:
+            log.info(f"No classes found for subject: {code}")
+        else:
+            missing.append(subject)
+            continue
+        upload_page(sink, subject_courses, code, 1, journal)
+        if journal:
+            journal.finish_subject(code, 1)
+        complete_subject(sink, code, journal)
+        if work:
+            work.complete(code)
+
+    unexpected = [code for code in by_subject if code not in codes]
+    if unexpected:
+        # Not searched for, so their pages are uploaded but not journaled
+        log.warning(f"Courses for subjects outside the batch: {', '.join(unexpected)}")
+    for code in unexpected:
+        upload_page(sink, by_subject[code], code, 1)
+    if missing:
+        log.info(f"No results for {', '.join(subject_code_of(s) for s in missing)} in the batch, "
+                 f"searching them on their own")
+    return missing
+
+
+def scrape_batches_http(scraper, sink: Sink, subjects: List[Dict], batch_size: int = DEFAULT_BATCH_SIZE,
+                        journal: Optional[CheckpointJournal] = None, work=None) -> List[Dict]:
+    """Search several subjects per form submission with the HTTP engine.
+
+    Returns the subjects that should still be scraped one at a time. `work`
+    (see sharding.py) is told about every subject finished or given up on.
+    """
+    batchable, single = split_resumed(subjects, journal)
+    batcher = AdaptiveBatcher(batchable, batch_size)
+    for batch in batcher:
+        codes = [subject_code_of(subject) for subject in batch]
+        label = ','.join(codes)
+        log.info(f"Searching {len(batch)} subjects: {label}")
+        courses, pages, subject_code, no_classes = [], 0, '', False
+        try:
+            results = scraper.iter_result_pages([subject['value'] for subject in batch])
+            while True:
+                with metrics.timer('navigate', label):
+                    item = next(results, None)
+                if item is None:
+                    break
+                page_number, html = item
+                pages = page_number
+                if page_number == 1 and scraper.has_no_classes(html):
+                    no_classes = True
+                    break
+                with metrics.timer('extract', label):
+                    page_courses, subject_code = scraper.parse_page(html, subject_code or codes[0],
+                                                                    parse_batch_page)
+                courses.extend(page_courses)
+        except Exception as e:
+            log.error(f"Error searching subjects {label}: {e}")
+            if not batcher.record_failure(batch):
+                log.exception("Stack trace:")
+                fail_subject(journal, work, codes[0], e)
+            continue
+
+        batcher.record(batch, pages)
+        log.info(f"{label}: {pages} page(s), next batch size {batcher.batch_size}")
+        single.extend(upload_batch(sink, batch, courses, journal, no_classes, work))
+    return single
+
+
+def scrape_batches_browser(page, sink: Sink, subjects: List[Dict], batch_size: int = DEFAULT_BATCH_SIZE,
+                           fast: bool = False, journal: Optional[CheckpointJournal] = None,
+                           work=None) -> List[Dict]:
+    """Browser engine version of scrape_batches_http, using the lean row extractor."""
+    from tritonscraper import (EXTRACT_ROWS_JS, check_results_rendered, go_to_results_page, rows_to_batch_courses,
+                               select_subject_and_search)
+
+    batchable, single = split_resumed(subjects, journal)
+    batcher = AdaptiveBatcher(batchable, batch_size)
+    for batch in batcher:
+        codes = [subject_code_of(subject) for subject in batch]
+        label = ','.join(codes)
+        log.info(f"Searching {len(batch)} subjects: {label}")
+        courses, current_page, subject_code, no_classes = [], 1, '', False
+        try:
+            with metrics.timer('navigate', label):
+                select_subject_and_search(page, [subject['value'] for subject in batch], label,
+                                          debug_capture=False, fast=fast)
+            while True:
+                with metrics.timer('extract', label):
+                    result = page.evaluate(EXTRACT_ROWS_JS, current_page + 1)
+                check_results_rendered(result, label)
+                if result['noClasses']:
+                    no_classes = True
+                    break
+                page_courses, subject_code = rows_to_batch_courses(result['rows'], subject_code or codes[0])
+                courses.extend(page_courses)
+                if not result['hasNext']:
+                    break
+                current_page += 1
+                with metrics.timer('navigate', label):
+                    go_to_results_page(page, current_page, fast, label)
+        except Exception as e:
+            log.error(f"Error searching subjects {label}: {e}")
+            if not batcher.record_failure(batch):
+                log.exception("Stack trace:")
+                fail_subject(journal, work, codes[0], e)
+            continue
+
+        batcher.record(batch, current_page)
+        log.info(f"{label}: {current_page} page(s), next batch size {batcher.batch_size}")
+        single.extend(upload_batch(sink, batch, courses, journal, no_classes, work))
+    return single
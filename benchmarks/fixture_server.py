@@ -0,0 +1,186 @@
+"""Local stand-in for act.ucsd.edu serving the saved pages in fixtures/.
+
+It mimics the parts of the Schedule of Classes the scrapers touch: the
+search form page, the form POST to the results page and the stateful
+`?page=N` pagination links (results are remembered per JSESSIONID cookie).
+Result pages are looked up as fixtures/<SUBJECT>_<page>.html; subjects
+without a page 1 get the "No classes found" page. A search for several
+subjects is served as their pages one after another, with the pagination
+links renumbered to match.
+"""
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SEARCH_PATH = '/scheduleOfClasses/scheduleOfClassesStudent.htm'
+RESULT_PATH = '/scheduleOfClasses/scheduleOfClassesStudentResult.htm'
+NO_CLASSES_PAGE = 'NOCLASSES.html'
+
+PAGER_RE = re.compile(r'<table><tr><td align="right">Page&nbsp;.*?</table>\n?')
+RESULTS_TABLE = '<table class="tbrdr">'
+
+
+def fixture_path(name: str) -> str:
+    return os.path.join(FIXTURES_DIR, name)
+
+
+def read_fixture(name: str) -> str:
+    with open(fixture_path(name), encoding='utf-8') as f:
+        return f.read()
+
+
+def results_page_name(subjects, page: int):
+    """Fixture file for a page of a search, or None if that page doesn't exist."""
+    if len(subjects) == 1:
+        name = f'{subjects[0].strip()}_{page}.html'
+        if os.path.exists(fixture_path(name)):
+            return name
+        return NO_CLASSES_PAGE if page == 1 else None
+    return None
+
+
+def _pager(page: int, total: int) -> str:
+    links = ' '.join(f'<b>{n}</b>' if n == page else f'<a href="scheduleOfClassesStudentResult.htm?page={n}">{n}</a>'
+                     for n in range(1, total + 1))
+    return f'<table><tr><td align="right">Page&nbsp;({page}&nbsp;of&nbsp;{total})&nbsp;{links}</td></tr></table>\n'
+
+
+def render_results_page(subjects, page: int):
+    """HTML of a page of a search, or None if that page doesn't exist."""
+    if len(subjects) <= 1:
+        name = results_page_name(subjects, page) if subjects else None
+        return read_fixture(name) if name else None
+
+    names = []
+    for subject in subjects:
+        subject_page = 1
+        name = results_page_name([subject], subject_page)
+        while name and name != NO_CLASSES_PAGE:
+            names.append(name)
+            subject_page += 1
+            name = results_page_name([subject], subject_page)
+    if not names:
+        return read_fixture(NO_CLASSES_PAGE) if page == 1 else None
+    if page > len(names):
+        return None
+    html = PAGER_RE.sub('', read_fixture(names[page - 1]))
+    if len(names) > 1:
+        html = html.replace(RESULTS_TABLE, _pager(page, len(names)) + RESULTS_TABLE, 1)
+    return html
+
+
+class FixtureServer:
+    """Threaded HTTP server for the fixture corpus; use as a context manager."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0):
+        self.delay = delay
+        self.sessions = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def url(self) -> str:
+        """Equivalent of the scrapers' URL constant."""
+        return self.base_url + SEARCH_PATH
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _session_id(self):
+                for part in self.headers.get('Cookie', '').split(';'):
+                    name, _, value = part.strip().partition('=')
+                    if name == 'JSESSIONID':
+                        return value
+                return None
+
+            def _send(self, status, body='', session_id=None):
+                if server.delay:
+                    time.sleep(server.delay)
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html;charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                if session_id:
+                    self.send_header('Set-Cookie', f'JSESSIONID={session_id}; Path=/')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                url = urlsplit(self.path)
+                if url.path == SEARCH_PATH:
+                    session_id = self._session_id() or uuid.uuid4().hex
+                    return self._send(200, read_fixture('search.html'), session_id)
+                if url.path == RESULT_PATH:
+                    subjects = server.sessions.get(self._session_id())
+                    page = int(parse_qs(url.query).get('page', ['1'])[0])
+                    html = render_results_page(subjects, page) if subjects else None
+                    if html:
+                        return self._send(200, html)
+                return self._send(404, 'Not found')
+
+            def do_POST(self):
+                with server._lock:
+                    server.requests += 1
+                url = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                form = parse_qs(self.rfile.read(length).decode('utf-8'), keep_blank_values=True)
+                if url.path != RESULT_PATH:
+                    return self._send(404, 'Not found')
+                session_id = self._session_id() or uuid.uuid4().hex
+                subjects = form.get('selectedSubjects', [])
+                server.sessions[session_id] = subjects
+                html = render_results_page(subjects, 1) or read_fixture(NO_CLASSES_PAGE)
+                return self._send(200, html, session_id)
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    with FixtureServer(port=args.port, delay=args.delay) as fixture_server:
+        print(f"Serving fixtures at {fixture_server.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,573 @@
+"""Offline benchmarks for extraction, pagination and upload against the fixture corpus.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--iterations N] [--only NAME ...]
+    python benchmarks/run_benchmarks.py --update-baseline
+
+Each benchmark reports pages/s, sections/s, p50/p95 per-page latency and
+peak RSS. Every run happens in a fresh process, so the peak RSS is that
+benchmark's own rather than the largest of the ones before it. Results are compared with baseline.json and
+the script exits with status 1 when a metric regresses by more than the
+tolerance, or when a benchmark that ran has no baseline to compare with.
+Each benchmark is run --repeats times after an untimed warm-up iteration.
+The lowest p50/p95 latency over the runs is kept (interference only ever
+adds latency), and the median of every other metric. Runs of
+fewer than MIN_COMPARE_ITERATIONS iterations are not compared, and latency
+changes within LATENCY_NOISE are ignored. Benchmarks whose dependencies (Playwright, requests, pyairtable, NumPy)
+are not installed are skipped. --update-baseline records such a skip in
+place of metrics; a benchmark whose baseline is a skip is reported but
+not compared until a baseline is recorded where it can run.
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fixture_server import RESULT_PATH, FixtureServer, read_fixture  # noqa: E402
+from soc_parser import has_no_classes, parse_courses  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+# Pages parsed by the extraction benchmarks: (fixture, subject_code)
+CORPUS = [
+    ('AAS_1.html', 'AAS'),
+    ('ANAR_1.html', 'ANAR'),
+    ('ANTH_1.html', 'ANTH'),
+    ('ANTH_2.html', 'ANTH'),
+    ('ANTH_3.html', 'ANTH'),
+    ('NOCLASSES.html', 'ANBI'),
+]
+
+# Subjects scraped by the pagination benchmarks (ANTH spans three pages, ANBI has no classes)
+SUBJECTS = [
+    {'value': 'AAS', 'text': 'AAS - African American Studies'},
+    {'value': 'ANAR', 'text': 'ANAR - Anthropological Archaeology'},
+    {'value': 'ANTH', 'text': 'ANTH - Anthropology'},
+    {'value': 'ANBI', 'text': 'ANBI - Anthro/Biological Anthropology'},
+]
+
+# Higher is better for these metrics, lower is better for everything else compared
+THROUGHPUT_METRICS = ('pages_per_s', 'sections_per_s', 'records_per_s')
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'peak_rss_mb')
+PERCENTILE_METRICS = ('p50_ms', 'p95_ms')
+# Absolute changes below these are machine noise rather than regressions
+LATENCY_NOISE = {'p50_ms': 1.0, 'p95_ms': 5.0, 'peak_rss_mb': 5.0}
+# Shorter runs are too noisy to compare with the baseline
+MIN_COMPARE_ITERATIONS = 10
+# Untimed iterations before each run (imports, caches, first-call costs)
+WARMUP_ITERATIONS = 1
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # Peak of the whole process, hence one process per run; ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def summarize(latencies: List[float], sections: int, elapsed: float, **extra) -> Dict:
+    pages = len(latencies)
+    result = {
+        'pages': pages,
+        'sections': sections,
+        'seconds': round(elapsed, 4),
+        'pages_per_s': round(pages / elapsed, 2) if elapsed else 0.0,
+        'sections_per_s': round(sections / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+    }
+    result.update(extra)
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return result
+
+
+def count_sections(courses: List[Dict]) -> int:
+    return sum(len(course['sections']) for course in courses)
+
+
+class RecordingUploader:
+    """Stand-in for AirtableManager that timestamps every uploaded page."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.page_times = []
+        self.sections = 0
+
+    def upload_courses(self, courses: List[Dict]) -> None:
+        self.page_times.append(time.perf_counter())
+        self.sections += count_sections(courses)
+
+    def latencies(self) -> List[float]:
+        previous = self.started
+        result = []
+        for stamp in self.page_times:
+            result.append(stamp - previous)
+            previous = stamp
+        return result
+
+
+class FetchRecorder(RecordingUploader):
+    """requests response hook that timestamps every results page fetched.
+
+    A batched search uploads its subjects only after fetching all of their
+    pages, so the HTTP benchmarks count and time fetches rather than uploads.
+    """
+
+    def __call__(self, response, *args, **kwargs):
+        if response.ok and urlsplit(response.url).path == RESULT_PATH:
+            self.page_times.append(time.perf_counter())
+
+
+class MockTable:
+    """In-memory pyairtable Table replacement with optional per-request latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.records = {}
+
+    def _request(self):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _store(self, fields: Dict) -> Dict:
+        record = {'id': f'rec{len(self.records):014d}', 'fields': dict(fields)}
+        self.records[record['id']] = record
+        return record
+
+    def create(self, fields: Dict) -> Dict:
+        self._request()
+        return self._store(fields)
+
+    def batch_create(self, records: List[Dict]) -> List[Dict]:
+        self._request()
+        return [self._store(fields) for fields in records]
+
+    def batch_upsert(self, records: List[Dict], key_fields: List[str]) -> Dict:
+        self._request()
+        by_key = {tuple(r['fields'].get(name) for name in key_fields): r for r in self.records.values()}
+        result = []
+        for record in records:
+            existing = by_key.get(tuple(record['fields'].get(name) for name in key_fields))
+            if existing:
+                existing['fields'].update(record['fields'])
+                result.append(existing)
+            else:
+                result.append(self._store(record['fields']))
+        return {'records': result}
+
+    def batch_update(self, records: List[Dict]) -> List[Dict]:
+        self._request()
+        for record in records:
+            self.records[record['id']]['fields'].update(record['fields'])
+        return [self.records[record['id']] for record in records]
+
+    def batch_delete(self, record_ids: List[str]) -> List[Dict]:
+        self._request()
+        return [{'id': record_id, 'deleted': self.records.pop(record_id, None) is not None}
+                for record_id in record_ids]
+
+    def all(self, **kwargs) -> List[Dict]:
+        self._request()
+        return list(self.records.values())
+
+
+def bench_parse(iterations: int) -> Dict:
+    """soc_parser.parse_courses over the corpus (the HTTP engine's extractor)."""
+    pages = [(read_fixture(name), code) for name, code in CORPUS]
+    latencies, sections = [], 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for html, code in pages:
+            t0 = time.perf_counter()
+            courses = parse_courses(html, code)
+            latencies.append(time.perf_counter() - t0)
+            sections += count_sections(courses)
+    return summarize(latencies, sections, time.perf_counter() - started)
+
+
+def traced_bytes(after: tracemalloc.Snapshot, before: tracemalloc.Snapshot) -> int:
+    """Bytes allocated between two snapshots, leaving out tracemalloc's own bookkeeping."""
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    return sum(stat.size_diff for stat in after.filter_traces(ignore).compare_to(before.filter_traces(ignore),
+                                                                                    'filename'))
+
+
+def bench_catalog(iterations: int) -> Dict:
+    """Build a compact Catalog from parsed pages and compare its footprint with the dicts.
+
+    The catalog's footprint is measured after the page dicts are dropped, so
+    it includes the strings it shares with them and keeps alive.
+    """
+    from catalog import Catalog
+
+    parsed = [json.dumps(parse_courses(read_fixture(name), code)) for name, code in CORPUS]
+    latencies, sections, elapsed = [], 0, 0.0
+    dict_bytes = catalog_bytes = 0
+    for _ in range(iterations):
+        tracemalloc.start()
+        empty = tracemalloc.take_snapshot()
+        # Fresh, unshared strings for every page, as page.evaluate returns them
+        pages = [json.loads(text) for text in parsed]
+        loaded = tracemalloc.take_snapshot()
+        catalog = Catalog()
+        started = time.perf_counter()
+        for courses in pages:
+            t0 = time.perf_counter()
+            catalog.add_courses(courses)
+            latencies.append(time.perf_counter() - t0)
+            sections += count_sections(courses)
+        elapsed += time.perf_counter() - started
+        del pages, courses
+        built = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        dict_bytes += traced_bytes(loaded, empty)
+        catalog_bytes += traced_bytes(built, empty)
+    return summarize(latencies, sections, elapsed,
+                     dict_kb=round(dict_bytes / iterations / 1024, 1),
+                     catalog_kb=round(catalog_bytes / iterations / 1024, 1))
+
+
+def bench_conflict_index(iterations: int) -> Dict:
+    """Enumerate conflict-free schedules of 2-6 ANTH courses with the NumPy conflict index."""
+    try:
+        from conflict_index import ConflictIndex
+    except ImportError as e:
+        raise SkipBenchmark(str(e))
+
+    courses = [course for name, code in CORPUS for course in parse_courses(read_fixture(name), code)]
+    started = time.perf_counter()
+    index = ConflictIndex.from_courses(courses)
+    build_ms = round((time.perf_counter() - started) * 1000, 3)
+    anth = [key for key in index.course_rows if key[0] == 'ANTH']
+    queries = [anth[i:i + size] for size in range(2, 7) for i in range(0, len(anth) - size, 5)]
+
+    latencies, combinations = [], 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for query in queries:
+            t0 = time.perf_counter()
+            combinations += len(index.combinations(query, open_only=False))
+            latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, combinations, time.perf_counter() - started, build_ms=build_ms)
+
+
+def _with_browser(func: Callable):
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        raise SkipBenchmark("playwright is not installed")
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            return func(browser.new_page())
+        finally:
+            browser.close()
+
+
+def _bench_extract(iterations: int, lean: bool) -> Dict:
+    try:
+        import tritonscraper
+    except ImportError as e:
+        raise SkipBenchmark(str(e))
+
+    def run(page):
+        latencies, sections = [], 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for name, code in CORPUS:
+                html = read_fixture(name)
+                page.set_content(html)
+                t0 = time.perf_counter()
+                if lean:
+                    courses = tritonscraper.extract_course_data_lean(page, code)[0]
+                elif has_no_classes(html):
+                    # scrape_subject_pages stops before extracting a page without a results table
+                    courses = []
+                else:
+                    courses = tritonscraper.extract_course_data(page, code)
+                latencies.append(time.perf_counter() - t0)
+                sections += count_sections(courses)
+        return latencies, sections, time.perf_counter() - started
+
+    latencies, sections, elapsed = _with_browser(run)
+    return summarize(latencies, sections, elapsed)
+
+
+def bench_extract(iterations: int) -> Dict:
+    """extract_course_data on each corpus page loaded into a headless browser."""
+    return _bench_extract(iterations, lean=False)
+
+
+def bench_extract_lean(iterations: int) -> Dict:
+    """extract_course_data_lean on each corpus page loaded into a headless browser."""
+    return _bench_extract(iterations, lean=True)
+
+
+def _bench_http_pagination(iterations: int, **options) -> Dict:
+    try:
+        from http_scraper import HttpScraper
+        import tritonscraper
+    except ImportError as e:
+        raise SkipBenchmark(str(e))
+
+    latencies, sections, elapsed = [], 0, 0.0
+    with FixtureServer() as server:
+        for _ in range(iterations):
+            scraper = HttpScraper(url=server.url)
+            uploader, fetches = RecordingUploader(), FetchRecorder()
+            scraper.session.hooks['response'].append(fetches)
+            tritonscraper.scrape_courses_http(scraper, uploader, subjects=SUBJECTS, **options)
+            elapsed += time.perf_counter() - fetches.started
+            latencies.extend(fetches.latencies())
+            sections += uploader.sections
+            scraper.close()
+        requests_per_run = server.requests / iterations
+    return summarize(latencies, sections, elapsed, requests_per_run=round(requests_per_run, 1))
+
+
+def bench_http_pagination(iterations: int) -> Dict:
+    """scrape_courses_http end to end against the local fixture server, per results page fetched."""
+    return _bench_http_pagination(iterations)
+
+
+def bench_http_pagination_batched(iterations: int) -> Dict:
+    """scrape_courses_http searching all subjects in one batched submission, per results page fetched."""
+    return _bench_http_pagination(iterations, batch_size=len(SUBJECTS))
+
+
+def _bench_browser_pagination(iterations: int, **options) -> Dict:
+    try:
+        import tritonscraper
+        from metrics import metrics
+    except ImportError as e:
+        raise SkipBenchmark(str(e))
+
+    def ready_wait() -> float:
+        return metrics.snapshot()['totals']['timers'].get('ready_wait', {}).get('seconds', 0.0)
+
+    def run(page):
+        latencies, sections, elapsed = [], 0, 0.0
+        for _ in range(iterations):
+            uploader = RecordingUploader()
+            tritonscraper.scrape_courses(page, uploader, subjects=SUBJECTS, **options)
+            elapsed += time.perf_counter() - uploader.started
+            latencies.extend(uploader.latencies())
+            sections += uploader.sections
+        return latencies, sections, elapsed
+
+    with FixtureServer() as server:
+        # The browser path navigates to the module-level URL
+        original_url = tritonscraper.URL
+        tritonscraper.URL = server.url
+        waited = ready_wait()
+        try:
+            latencies, sections, elapsed = _with_browser(run)
+        finally:
+            tritonscraper.URL = original_url
+    # Measured readiness waits per run, to compare default and fast navigation
+    return summarize(latencies, sections, elapsed, ready_wait_s=round((ready_wait() - waited) / iterations, 3))
+
+
+def bench_browser_pagination(iterations: int) -> Dict:
+    """scrape_courses (default navigation) against the local fixture server."""
+    return _bench_browser_pagination(iterations)
+
+
+def bench_browser_pagination_fast(iterations: int) -> Dict:
+    """scrape_courses with lean extraction and fast navigation."""
+    return _bench_browser_pagination(iterations, lean=True, fast=True)
+
+
+def _bench_upload(iterations: int, batch_writes: bool) -> Dict:
+    for name in ('AIRTABLE_API_KEY', 'AIRTABLE_BASE_ID', 'AIRTABLE_TABLE_NAME_COURSES', 'AIRTABLE_TABLE_NAME_SECTIONS'):
+        os.environ.setdefault(name, 'bench')
+    try:
+        from airtable_integration import AirtableManager
+    except ImportError as e:
+        raise SkipBenchmark(str(e))
+
+    pages = [parse_courses(read_fixture(name), code) for name, code in CORPUS]
+    pages = [courses for courses in pages if courses]
+    latencies, records, requests = [], 0, 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        # No rate limit: this measures client-side overhead and request count
+        airtable = AirtableManager(batch_writes=batch_writes, requests_per_second=1e9)
+        airtable.courses_table, airtable.sections_table = MockTable(), MockTable()
+        for courses in pages:
+            t0 = time.perf_counter()
+            airtable.upload_courses(courses)
+            latencies.append(time.perf_counter() - t0)
+            records += len(courses) + count_sections(courses)
+        requests += airtable.courses_table.requests + airtable.sections_table.requests
+    elapsed = time.perf_counter() - started
+    sections = sum(count_sections(courses) for courses in pages) * iterations
+    return summarize(latencies, sections, elapsed,
+                     records_per_s=round(records / elapsed, 2) if elapsed else 0.0,
+                     requests_per_page=round(requests / len(latencies), 2) if latencies else 0.0)
+
+
+def bench_upload(iterations: int) -> Dict:
+    """AirtableManager.upload_courses (batched) against in-memory tables."""
+    return _bench_upload(iterations, batch_writes=True)
+
+
+def bench_upload_unbatched(iterations: int) -> Dict:
+    """AirtableManager.upload_courses with one request per record."""
+    return _bench_upload(iterations, batch_writes=False)
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'extract': bench_extract,
+    'extract_lean': bench_extract_lean,
+    'http_pagination': bench_http_pagination,
+    'http_pagination_batched': bench_http_pagination_batched,
+    'browser_pagination': bench_browser_pagination,
+    'browser_pagination_fast': bench_browser_pagination_fast,
+    'upload': bench_upload,
+    'upload_unbatched': bench_upload_unbatched,
+    'catalog': bench_catalog,
+    'conflict_index': bench_conflict_index,
+}
+
+
+def run_isolated(name: str, iterations: int, verbose: bool = False) -> Dict:
+    """Run one benchmark in a worker process; returns {'skipped': reason} if it can't run."""
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING, force=True)
+    # The fixture server is local, so requests are not rate limited (they still pass through the scheduler)
+    from politeness import scheduler
+    scheduler.configure(requests_per_second=None)
+    try:
+        BENCHMARKS[name](WARMUP_ITERATIONS)
+        return BENCHMARKS[name](iterations)
+    except SkipBenchmark as e:
+        return {'skipped': str(e)}
+
+
+def combine_runs(runs: List[Dict]) -> Dict:
+    """Minimum latency percentiles and median of every other metric over several runs of a benchmark."""
+    combined = {}
+    for metric in runs[0]:
+        values = [run[metric] for run in runs]
+        combined[metric] = round(min(values) if metric in PERCENTILE_METRICS else statistics.median(values), 4)
+    return combined
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed beyond the tolerance and every missing baseline."""
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            regressions.append(f"{name}: no baseline (run with --update-baseline)")
+            continue
+        if 'skipped' in baseline[name]:
+            continue
+        for metric, old in baseline[name].items():
+            new = metrics.get(metric)
+            if new is None or not old:
+                continue
+            if metric in THROUGHPUT_METRICS and new < old * (1 - tolerance):
+                regressions.append(f"{name}.{metric}: {new} < baseline {old}")
+            elif (metric in LATENCY_METRICS and new > old * (1 + tolerance)
+                  and new - old > LATENCY_NOISE.get(metric, 0.0)):
+                regressions.append(f"{name}.{metric}: {new} > baseline {old}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline scraper benchmarks")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=3,
+                        help="runs of each benchmark (default 3), see combine_runs")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression (default 0.25)")
+    parser.add_argument('--output', help="also write the results as JSON to this file")
+    parser.add_argument('--verbose', action='store_true', help="keep the scrapers' INFO logging")
+    args = parser.parse_args(argv)
+
+    # Spawned rather than forked, so no run starts with the parent's (or a previous run's) memory
+    context = multiprocessing.get_context('spawn')
+    results, skipped = {}, {}
+    for name in args.only or BENCHMARKS:
+        runs = []
+        for _ in range(max(1, args.repeats)):
+            with context.Pool(1) as pool:
+                runs.append(pool.apply(run_isolated, (name, args.iterations, args.verbose)))
+            if 'skipped' in runs[-1]:
+                break
+        if 'skipped' in runs[-1]:
+            skipped[name] = runs[-1]
+            print(f"{name:<24} skipped ({runs[-1]['skipped']})")
+            continue
+        results[name] = combine_runs(runs)
+        r = results[name]
+        print(f"{name:<24} {r['pages_per_s']:>10.1f} pages/s {r['sections_per_s']:>12.1f} sections/s "
+              f"p50 {r['p50_ms']:>8.2f} ms  p95 {r['p95_ms']:>8.2f} ms  peak RSS {r['peak_rss_mb']:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        # A skip only stands in for a missing baseline, never replaces recorded metrics
+        baseline.update({name: skip for name, skip in skipped.items() if 'skipped' in baseline.get(name, skip)})
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --update-baseline)")
+        return 0
+    if args.iterations < MIN_COMPARE_ITERATIONS:
+        print(f"Not comparing with the baseline: use at least {MIN_COMPARE_ITERATIONS} iterations")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    for name in results:
+        if 'skipped' in baseline.get(name, {}):
+            print(f"WARNING {name}: not compared, its baseline was recorded without its dependencies "
+                  f"({baseline[name]['skipped']}); record one with --update-baseline --only {name}")
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
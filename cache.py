@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Mapping, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = 'scrape_cache.db'
+# Results pages change as seats fill; the subject list changes about once a term
+DEFAULT_PAGE_TTL = 3600
+DEFAULT_SUBJECTS_TTL = 86400
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subject_lists (
+    term TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS searches (
+    term TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (term, subject)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    term TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    content_hash TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (term, subject, page)
+);
+CREATE TABLE IF NOT EXISTS parsed (
+    content_hash TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    result BLOB NOT NULL,
+    PRIMARY KEY (content_hash, parser)
+);
+"""
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _pack(text: str) -> bytes:
+    return zlib.compress(text.encode('utf-8'), 6)
+
+
+def _unpack(blob: bytes) -> str:
+    return zlib.decompress(blob).decode('utf-8')
+
+
+class ResponseCache:
+    """On-disk cache of the subject list and raw results pages for one term.
+
+    Pages are keyed by (term, search, page number), where the search is the
+    comma-joined subject values submitted together, and stored zlib-compressed
+    in one SQLite file. A search whose pages are all younger than their TTL
+    is served without touching the network. Stale pages are revalidated
+    with If-None-Match / If-Modified-Since where the server allows it (the
+    GETs for page 2 onwards; the search itself is a POST and always
+    refetched). Parsed courses, the "No classes found" flag and the next-page
+    link are stored by page content hash, so a page that comes back
+    unchanged (a hit or a 304) is not parsed or scanned again.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, term: str = '', page_ttl: float = DEFAULT_PAGE_TTL,
+                 subjects_ttl: float = DEFAULT_SUBJECTS_TTL):
+        self.path = path
+        self.term = term
+        self.page_ttl = page_ttl
+        self.subjects_ttl = subjects_ttl
+        self.hits = self.misses = self.parses_skipped = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(CACHE_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get_subjects(self) -> Optional[List[Dict]]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT body FROM subject_lists WHERE term = ? AND expires_at > ? AND fetched_at > ?",
+                (self.term, now, now - self.subjects_ttl)).fetchone()
+        return json.loads(_unpack(row[0])) if row else None
+
+    def put_subjects(self, subjects: List[Dict]):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO subject_lists (term, body, fetched_at, expires_at) VALUES (?, ?, ?, ?)",
+                (self.term, _pack(json.dumps(subjects)), now, now + self.subjects_ttl))
+
+    def get_search(self, subject: str) -> Optional[List[str]]:
+        """Every page of a search, or None unless all of them are cached and fresh.
+
+        An entry is fresh until the TTL it was stored with runs out, or
+        sooner if this cache was opened with a shorter TTL.
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT page_count FROM searches WHERE term = ? AND subject = ? AND expires_at > ? AND fetched_at > ?",
+                (self.term, subject, now, now - self.page_ttl)).fetchone()
+            pages = [] if row is None else self.conn.execute(
+                "SELECT body FROM pages WHERE term = ? AND subject = ? AND page <= ? ORDER BY page",
+                (self.term, subject, row[0])).fetchall()
+        if row is None or len(pages) != row[0]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [_unpack(body) for body, in pages]
+
+    def validators(self, subject: str, page: int) -> Dict[str, str]:
+        """Conditional request headers for revalidating a stored page."""
+        with self._lock:
+            row = self.conn.execute("SELECT etag, last_modified FROM pages WHERE term = ? AND subject = ? AND page = ?",
+                                    (self.term, subject, page)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def get_page(self, subject: str, page: int) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT body FROM pages WHERE term = ? AND subject = ? AND page = ?",
+                                    (self.term, subject, page)).fetchone()
+        return _unpack(row[0]) if row else None
+
+    def put_page(self, subject: str, page: int, html: str, headers: Optional[Mapping[str, str]] = None,
+                 last: bool = False):
+        """Store a fetched page; `last` marks the search complete with `page` pages."""
+        headers = headers or {}
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (term, subject, page, body, content_hash, etag, last_modified, "
+                "fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.term, subject, page, _pack(html), content_hash(html), headers.get('ETag'),
+                 headers.get('Last-Modified'), now))
+            if last:
+                self.conn.execute("DELETE FROM pages WHERE term = ? AND subject = ? AND page > ?",
+                                  (self.term, subject, page))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO searches (term, subject, page_count, fetched_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)", (self.term, subject, page, now, now + self.page_ttl))
+
+    def parsed(self, html: str, parser: Callable, *args):
+        """parser(html, *args), reusing the stored result for content parsed before.
+
+        Results round-trip through JSON, so tuples come back as lists.
+        """
+        key = f"{parser.__module__}.{parser.__name__}:{json.dumps(args)}"
+        digest = content_hash(html)
+        with self._lock:
+            row = self.conn.execute("SELECT result FROM parsed WHERE content_hash = ? AND parser = ?",
+                                    (digest, key)).fetchone()
+        if row:
+            self.parses_skipped += 1
+            return json.loads(_unpack(row[0]))
+        result = parser(html, *args)
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO parsed (content_hash, parser, result) VALUES (?, ?, ?)",
+                              (digest, key, _pack(json.dumps(result))))
+        return result
+
+    def prune(self):
+        """Drop parse results of pages that are no longer stored."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM parsed WHERE content_hash NOT IN (SELECT content_hash FROM pages)")
+
+    def close(self):
+        log.info(f"Cache {self.path}: {self.hits} searches served from cache, {self.misses} fetched, "
+                 f"{self.parses_skipped} parse results reused")
+        self.prune()
+        self.conn.close()
@@ -0,0 +1,157 @@
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from soc_parser import parse_int
+
+# Section columns that repeat across the catalog and are worth interning
+_CATEGORICAL = ('meetingType', 'days', 'time', 'building', 'room', 'instructor')
+
+
+def _seats(value) -> int:
+    # Lean rows and the Python parser already give ints; older callers may pass text
+    return value if isinstance(value, int) else parse_int(value)
+
+
+class Section:
+    """One meeting of a course, stored without a per-instance __dict__."""
+    __slots__ = ('section_id', 'meeting_type', 'days', 'time', 'building', 'room', 'instructor',
+                 'available', 'limit')
+
+    def __init__(self, section_id: str, meeting_type: str, days: str, time: str, building: str, room: str,
+                 instructor: str, available: int, limit: int):
+        self.section_id = section_id
+        self.meeting_type = meeting_type
+        self.days = days
+        self.time = time
+        self.building = building
+        self.room = room
+        self.instructor = instructor
+        self.available = available
+        self.limit = limit
+
+    @classmethod
+    def from_dict(cls, section: Dict, intern=sys.intern) -> 'Section':
+        meeting_type, days, time, building, room, instructor = (
+            intern(section.get(key) or '') for key in _CATEGORICAL)
+        return cls(section['sectionId'], meeting_type, days, time, building, room, instructor,
+                   _seats(section.get('available', 0)), _seats(section.get('limit', 0)))
+
+    def to_dict(self) -> Dict:
+        return {
+            'sectionId': self.section_id,
+            'meetingType': self.meeting_type,
+            'days': self.days,
+            'time': self.time,
+            'building': self.building,
+            'room': self.room,
+            'instructor': self.instructor,
+            'available': self.available,
+            'limit': self.limit,
+        }
+
+    def __repr__(self):
+        return f"Section({self.section_id!r}, {self.meeting_type!r}, {self.available}/{self.limit})"
+
+
+class Course:
+    __slots__ = ('subject_code', 'number', 'name', 'units', 'sections', 'term')
+
+    def __init__(self, subject_code: str, number: str, name: str, units: str, sections: Tuple[Section, ...],
+                 term: str = ''):
+        self.subject_code = subject_code
+        self.number = number
+        self.name = name
+        self.units = units
+        self.sections = sections
+        self.term = term
+
+    @classmethod
+    def from_dict(cls, course: Dict, intern=sys.intern, term: str = '') -> 'Course':
+        """Build from a scraped course dict; its 'term', if any, overrides `term`."""
+        # Numbers and names repeat in every term a course is offered
+        units = course.get('units', 'N/A')
+        return cls(intern(course.get('subject_code', 'N/A')), intern(course['number']), intern(course['name']),
+                   intern(units) if units is not None else None,
+                   tuple(Section.from_dict(section, intern) for section in course['sections']),
+                   intern(course.get('term', term)))
+
+    def to_dict(self) -> Dict:
+        """The course dict shape scrapers produce and AirtableManager.upload_courses expects."""
+        course = {
+            'name': self.name,
+            'number': self.number,
+            'units': self.units,
+            'subject_code': self.subject_code,
+            'sections': [section.to_dict() for section in self.sections],
+        }
+        if self.term:
+            course['term'] = self.term
+        return course
+
+    def __repr__(self):
+        term = f"{self.term!r}, " if self.term else ''
+        return f"Course({term}{self.subject_code!r}, {self.number!r}, {len(self.sections)} sections)"
+
+
+class Catalog:
+    """Compact in-memory store of scraped courses, grouped by subject.
+
+    Repeated strings (meeting type, days, time, building, room, instructor,
+    units, course numbers and names) are interned, so each distinct value is
+    stored once no matter how many sections share it, and seat counts are
+    plain ints. Courses are kept as tuples of __slots__ objects, and
+    to_dicts() rebuilds the dict shape the sinks take when a page or subject
+    needs uploading.
+
+    Courses are grouped by (term, subject code), so one catalog can hold
+    several terms side by side. Courses without a 'term' of their own belong
+    to the catalog's `term`, which is also what lookups default to.
+    """
+
+    def __init__(self, courses: Iterable[Dict] = (), term: str = ''):
+        self.term = term
+        self.subjects: Dict[Tuple[str, str], List[Course]] = {}
+        self.add_courses(courses)
+
+    def add_courses(self, courses: Iterable[Dict], term: Optional[str] = None) -> List[Course]:
+        term = self.term if term is None else term
+        added = []
+        for course in courses:
+            compact = Course.from_dict(course, term=term)
+            self.subjects.setdefault((compact.term, compact.subject_code), []).append(compact)
+            added.append(compact)
+        return added
+
+    @property
+    def terms(self) -> List[str]:
+        return sorted({term for term, _ in self.subjects})
+
+    def __len__(self) -> int:
+        return sum(len(courses) for courses in self.subjects.values())
+
+    def __iter__(self) -> Iterator[Course]:
+        for courses in self.subjects.values():
+            yield from courses
+
+    @property
+    def section_count(self) -> int:
+        return sum(len(course.sections) for course in self)
+
+    def _courses(self, subject_code: str, term: Optional[str]) -> List[Course]:
+        return self.subjects.get((self.term if term is None else term, subject_code), [])
+
+    def to_dicts(self, subject_code: Optional[str] = None, term: Optional[str] = None) -> List[Dict]:
+        """Course dicts of one subject (in `term`, default the catalog's), or of the whole catalog."""
+        courses = self._courses(subject_code, term) if subject_code else self
+        return [course.to_dict() for course in courses]
+
+    def find(self, subject_code: str, number: str, term: Optional[str] = None) -> Optional[Course]:
+        for course in self._courses(subject_code, term):
+            if course.number == number:
+                return course
+        return None
+
+    def seats(self, subject_code: str, term: Optional[str] = None) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """Seat counts keyed like soc_parser.parse_seats, for watch.diff_seats."""
+        return {(course.number, section.section_id): (section.available, section.limit)
+                for course in self._courses(subject_code, term) for section in course.sections}
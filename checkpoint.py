@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = 'scrape_checkpoint.jsonl'
+
+
+def subject_code_of(subject: Dict) -> str:
+    """Subject code of a get_all_subjects entry, e.g. "AAS" for "AAS - African American Studies"."""
+    return subject['text'].split(' - ')[0]
+
+
+class CheckpointJournal:
+    """Append-only JSON lines journal of completed (subject, page) units.
+
+    Each results page appends one line with its upload status once it has
+    been handed to the sink, and each subject appends a final line once all
+    of its pages are accounted for. Lines are flushed as they are written,
+    so a killed run loses at most the page in flight. On resume, finished
+    subjects are skipped and pages that were already uploaded are not sent
+    again, so the remaining sink writes stay free of duplicates.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH, resume: bool = False, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self.pages: Dict[str, Dict[int, bool]] = {}
+        self.done: Dict[str, bool] = {}
+        self.expected: Dict[str, int] = {}
+        # Subjects with pages this run skipped as uploaded by an earlier run
+        self.skipped: set = set()
+        self._lock = threading.Lock()
+
+        torn = False
+        if resume and os.path.exists(path):
+            torn = self._load()
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if torn:
+            # End the torn line so the next entry starts on a line of its own
+            self.file.write('\n')
+
+    def _load(self) -> bool:
+        """Read the journal back; returns True if its last line is unterminated."""
+        line = ''
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a killed run
+                    continue
+                subject = entry.get('subject')
+                if 'page' in entry:
+                    uploaded = entry.get('status') == 'uploaded'
+                    pages = self.pages.setdefault(subject, {})
+                    pages[entry['page']] = pages.get(entry['page'], False) or uploaded
+                elif entry.get('status') == 'done':
+                    self.done[subject] = True
+        done = sum(1 for subject in self.done if self.done[subject])
+        log.info(f"Resuming from {self.path}: {done} subjects done, "
+                 f"{sum(len(p) for p in self.pages.values())} pages journaled")
+        return bool(line) and not line.endswith('\n')
+
+    def _write(self, entry: Dict):
+        entry['t'] = round(time.time(), 3)
+        self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def is_subject_done(self, subject_code: str) -> bool:
+        return self.done.get(subject_code, False)
+
+    def is_page_uploaded(self, subject_code: str, page_number: int) -> bool:
+        return self.pages.get(subject_code, {}).get(page_number, False)
+
+    def pending(self, subjects: List[Dict]) -> List[Dict]:
+        """Subjects (as returned by get_all_subjects) that still need scraping."""
+        remaining = [s for s in subjects if not self.is_subject_done(subject_code_of(s))]
+        if len(remaining) < len(subjects):
+            log.info(f"Skipping {len(subjects) - len(remaining)} subjects finished in a previous run")
+        return remaining
+
+    def record_page(self, subject_code: str, page_number: int, uploaded: bool, sections: int = 0):
+        with self._lock:
+            pages = self.pages.setdefault(subject_code, {})
+            pages[page_number] = pages.get(page_number, False) or uploaded
+            self._write({'subject': subject_code, 'page': page_number,
+                         'status': 'uploaded' if uploaded else 'failed', 'sections': sections})
+            self._maybe_finish(subject_code)
+
+    def finish_subject(self, subject_code: str, page_count: int):
+        """Mark that a subject has `page_count` pages; it is done once all of them are uploaded."""
+        with self._lock:
+            self.expected[subject_code] = page_count
+            self._maybe_finish(subject_code)
+
+    def fail_subject(self, subject_code: str, error: Exception):
+        with self._lock:
+            self._write({'subject': subject_code, 'status': 'failed', 'error': str(error)})
+
+    def _maybe_finish(self, subject_code: str):
+        page_count = self.expected.get(subject_code)
+        if page_count is None or self.done.get(subject_code):
+            return
+        pages = self.pages.get(subject_code, {})
+        if all(pages.get(n) for n in range(1, page_count + 1)):
+            self.done[subject_code] = True
+            self._write({'subject': subject_code, 'status': 'done', 'pages': page_count})
+        elif len(pages) >= page_count:
+            self._write({'subject': subject_code, 'status': 'incomplete', 'pages': page_count})
+
+    def close(self):
+        self.file.close()
+
+
+def upload_page(sink, courses: List[Dict], subject_code: str, page_number: int,
+                journal: Optional[CheckpointJournal] = None) -> bool:
+    """Upload one results page, skipping pages a resumed run already uploaded."""
+    sections = sum(len(course['sections']) for course in courses)
+    metrics.incr('pages', subject=subject_code)
+    metrics.incr('rows', sections, subject=subject_code)
+    if journal and journal.is_page_uploaded(subject_code, page_number):
+        log.info(f"{subject_code} page {page_number} already uploaded, skipping")
+        metrics.incr('pages_skipped', subject=subject_code)
+        journal.skipped.add(subject_code)
+        return True
+    uploaded = True
+    if courses:
+        try:
+            with metrics.timer('upload', subject_code):
+                uploaded = sink.upload_courses(courses) is not False
+        except Exception as e:
+            log.error(f"Error uploading {subject_code} page {page_number}: {e}")
+            uploaded = False
+        if not uploaded:
+            metrics.incr('upload_failures', subject=subject_code)
+    if journal:
+        journal.record_page(subject_code, page_number, uploaded, sections)
+    return uploaded
+
+
+def complete_subject(sink, subject_code: str, journal: Optional[CheckpointJournal] = None):
+    """Tell the sink that every page of a subject has been handed to it (see Sink.complete_subject).
+
+    Subjects a resumed run only partly re-sent go to complete_resumed_subject
+    instead, as the sink never saw all of their sections.
+    """
+    if journal and subject_code in journal.skipped:
+        complete = getattr(sink, 'complete_resumed_subject', None)
+        if complete:
+            complete(subject_code)
+        return
+    complete = getattr(sink, 'complete_subject', None)
+    if complete:
+        complete(subject_code)
+
+
+def fail_subject(journal: Optional[CheckpointJournal], work, subject_code: str, error: Exception):
+    """Record a subject that failed in the journal and the work assignment (see sharding.py), if any."""
+    if journal:
+        journal.fail_subject(subject_code, error)
+    if work:
+        work.fail(subject_code, error)
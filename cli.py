@@ -0,0 +1,152 @@
+"""Command line entry point for Schedule Surfer.
+
+    python cli.py scrape [tritonscraper options]   scrape the Schedule of Classes
+    python cli.py sync DB [--incremental]          upload a SQLite scrape to Airtable
+    python cli.py watch TARGET ... [options]       watch seat availability
+    python cli.py export DB [--format parquet]     write a SQLite scrape as partitioned files
+    python cli.py query DB SUBJECT [NUMBER]        print stored sections
+    python cli.py bench [options]                  run the offline benchmarks
+
+Each command imports only what it uses: Playwright, requests, Airtable and
+pyarrow are loaded inside the commands that need them, so the local
+commands (export, query) start without paying for any of them.
+"""
+import argparse
+import logging
+import os
+import sys
+
+log = logging.getLogger(__name__)
+
+
+def _open_database(parser: argparse.ArgumentParser, path: str):
+    from sinks import SqliteSink
+
+    # SqliteSink would create an empty database for a mistyped path
+    if not os.path.exists(path):
+        parser.error(f"No such database: {path}")
+    return SqliteSink(path)
+
+
+def cmd_scrape(argv) -> int:
+    import tritonscraper
+    tritonscraper.main(argv)
+    return 0
+
+
+def cmd_watch(argv) -> int:
+    import watch
+    watch.main(argv)
+    return 0
+
+
+def cmd_bench(argv) -> int:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+    import run_benchmarks
+    return run_benchmarks.main(argv)
+
+
+# Commands that hand their remaining arguments to an existing script's own parser
+PASSTHROUGH = {
+    'scrape': (cmd_scrape, "scrape the Schedule of Classes (options as for tritonscraper.py)"),
+    'watch': (cmd_watch, "watch seat availability of courses or sections (options as for watch.py)"),
+    'bench': (cmd_bench, "run the offline benchmarks (options as for benchmarks/run_benchmarks.py)"),
+}
+
+
+def cmd_sync(args, parser) -> int:
+    from sinks import AirtableSink, sync_sqlite
+
+    source = _open_database(parser, args.database)
+    sink = AirtableSink(incremental=args.incremental, delete_missing=args.delete_missing)
+    try:
+        sync_sqlite(source, sink, args.subject)
+    finally:
+        sink.close()
+        source.close()
+    return 0
+
+
+def cmd_export(args, parser) -> int:
+    from export import ExportSink
+
+    source = _open_database(parser, args.database)
+    sink = ExportSink(args.export_dir, args.format, args.term)
+    try:
+        for courses in source.iter_courses(args.subject):
+            sink.upload_courses(courses)
+    finally:
+        sink.close()
+        source.close()
+    log.info(f"Wrote {len(sink.written)} file(s) under {args.export_dir}")
+    return 0
+
+
+def cmd_query(args, parser) -> int:
+    source = _open_database(parser, args.database)
+    try:
+        for courses in source.iter_courses(args.subject):
+            for course in courses:
+                if args.number and course['number'] != args.number:
+                    continue
+                sections = [s for s in course['sections'] if not args.open or (s['available'] or 0) > 0]
+                if not sections:
+                    continue
+                print(f"{course['subject_code']} {course['number']} - {course['name']} ({course['units']} units)")
+                for s in sections:
+                    print(f"  {s['sectionId']:<4} {s['meetingType']:<11} {s['days']:<6} {s['time']:<14} "
+                          f"{s['building']} {s['room']:<6} {s['instructor']:<24} {s['available']}/{s['limit']}")
+    finally:
+        source.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from export import DEFAULT_EXPORT_DIR, DEFAULT_TERM
+
+    parser = argparse.ArgumentParser(prog='cli.py', description="Scrape, store and query UCSD's Schedule of Classes")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+    for name, (_, help_text) in PASSTHROUGH.items():
+        commands.add_parser(name, help=help_text, add_help=False)
+
+    sync = commands.add_parser('sync', help="upload the courses stored in a SQLite database to Airtable")
+    sync.add_argument('database', help="SQLite database written by the sqlite sink")
+    sync.add_argument('--subject', help="only sync this subject code")
+    sync.add_argument('--incremental', action='store_true',
+                      help="only write sections that are new or changed since the last Airtable run")
+    sync.add_argument('--delete-missing', action='store_true',
+                      help="with --incremental, delete sections that disappeared from synced subjects")
+    sync.set_defaults(func=cmd_sync)
+
+    export = commands.add_parser('export', help="write a SQLite database as files partitioned by term and subject")
+    export.add_argument('database', help="SQLite database written by the sqlite sink")
+    export.add_argument('--format', choices=['jsonl', 'parquet', 'arrow'], default='jsonl')
+    export.add_argument('--export-dir', default=DEFAULT_EXPORT_DIR, help="root directory of the exported files")
+    export.add_argument('--term', default=DEFAULT_TERM, help="term label to partition by, e.g. FA24")
+    export.add_argument('--subject', help="only export this subject code")
+    export.set_defaults(func=cmd_export)
+
+    query = commands.add_parser('query', help="print the sections stored in a SQLite database")
+    query.add_argument('database', help="SQLite database written by the sqlite sink")
+    query.add_argument('subject', help="subject code, e.g. CSE")
+    query.add_argument('number', nargs='?', help="course number, e.g. 100")
+    query.add_argument('--open', action='store_true', help="only sections with available seats")
+    query.set_defaults(func=cmd_query)
+    return parser
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    # Hand everything after a passthrough command to that script, including --help
+    if argv and argv[0] in PASSTHROUGH:
+        command, _ = PASSTHROUGH[argv[0]]
+        return command(argv[1:])
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    return args.func(args, parser)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
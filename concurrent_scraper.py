@@ -0,0 +1,232 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from playwright.async_api import Browser, BrowserContext, async_playwright
+
+from checkpoint import CheckpointJournal, complete_subject, fail_subject, subject_code_of, upload_page
+from metrics import metrics
+from politeness import scheduler
+from sinks import Sink
+from tritonscraper import (BLOCKED_RESOURCE_TYPES, BLOCKED_URL_PARTS, EXTRACT_ROWS_JS, RESULTS_READY_SELECTOR, URL,
+                           check_results_rendered, rows_to_courses, select_test_subjects)
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+# Subjects each worker may have scraped ahead of the writer
+REORDER_BUFFER_PER_WORKER = 2
+
+
+async def get_all_subjects_async(browser: Browser) -> List[Dict]:
+    context = await browser.new_context()
+    try:
+        page = await context.new_page()
+        await scheduler.acall(page.goto, URL, kind='search_page')
+        await page.wait_for_selector('select[name="selectedSubjects"]')
+        return await page.evaluate("""() => {
+            const select = document.querySelector('select[name="selectedSubjects"]');
+            return Array.from(select.options).map(opt => ({
+                value: opt.value,
+                text: opt.text.trim()
+            })).filter(opt => opt.text && opt.value);
+        }""")
+    finally:
+        await context.close()
+
+
+async def _block_static_assets(route):
+    # Async counterpart of tritonscraper.RequestBlocker for --fast
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(part in request.url for part in BLOCKED_URL_PARTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def scrape_subject_async(context: BrowserContext, subject: Dict, fast: bool = False) -> List[List[Dict]]:
+    """Run the search and pagination loop for one subject on a fresh page.
+
+    Fast mode waits for the elements the next step needs instead of network
+    quiet, like tritonscraper.select_subject_and_search. Returns one list of
+    courses per results page.
+    """
+    subject_code = subject_code_of(subject)
+    page = await context.new_page()
+
+    async def search():
+        if fast:
+            await page.goto(URL, wait_until='domcontentloaded')
+            with metrics.timer('ready_wait', subject_code):
+                await page.wait_for_selector("select[name='selectedSubjects']")
+        else:
+            await page.goto(URL)
+            with metrics.timer('ready_wait', subject_code):
+                await page.wait_for_load_state('networkidle')
+        await page.locator("select[name='selectedSubjects']").select_option(subject['value'])
+        if fast:
+            async with page.expect_navigation(wait_until='domcontentloaded'):
+                await page.locator("#socFacSubmit").click()
+            with metrics.timer('ready_wait', subject_code):
+                await page.wait_for_selector(RESULTS_READY_SELECTOR)
+            return
+        await page.locator("#socFacSubmit").click()
+        with metrics.timer('ready_wait', subject_code):
+            await page.wait_for_load_state('networkidle')
+
+    async def follow_page_link(page_number: int):
+        if fast:
+            async with page.expect_navigation(wait_until='domcontentloaded'):
+                await page.click(f"a[href*='page={page_number}']")
+        else:
+            await page.click(f"a[href*='page={page_number}']")
+            with metrics.timer('ready_wait', subject_code):
+                await page.wait_for_load_state('networkidle')
+        with metrics.timer('ready_wait', subject_code):
+            await page.wait_for_selector('table.tbrdr', state='visible', timeout=10000)
+
+    try:
+        with metrics.timer('navigate', subject_code):
+            await scheduler.acall(search, kind='search', subject=subject_code)
+
+        pages = []
+        current_page = 1
+        while True:
+            with metrics.timer('extract', subject_code):
+                result = await page.evaluate(EXTRACT_ROWS_JS, current_page + 1)
+            check_results_rendered(result, subject_code)
+            if result['noClasses']:
+                log.info(f"No classes found for subject: {subject['text']}")
+                return [[]]
+            pages.append(rows_to_courses(result['rows'], subject_code))
+
+            if not result['hasNext']:
+                break
+            current_page += 1
+            log.info(f"{subject_code}: moving to page {current_page}")
+            with metrics.timer('navigate', subject_code):
+                await scheduler.acall(follow_page_link, current_page, kind='page', subject=subject_code)
+
+        return pages
+    finally:
+        await page.close()
+
+
+async def _worker(browser: Browser, queue: asyncio.Queue, results: asyncio.Queue, slots: asyncio.Semaphore,
+                  fast: bool = False):
+    # Each worker owns an isolated context (cookies, server-side search session)
+    try:
+        context = await browser.new_context()
+        if fast:
+            await context.route('**/*', _block_static_assets)
+    except Exception as e:
+        log.error(f"Error creating browser context: {e}")
+        context = None
+
+    try:
+        while True:
+            # A slot is held from taking a subject until the writer has written it
+            await slots.acquire()
+            index, subject = await queue.get()
+            if subject is None:
+                slots.release()
+                return
+            try:
+                if context is None:
+                    raise RuntimeError("No browser context available")
+                log.info(f"Processing subject: {subject['text']}")
+                pages = await scrape_subject_async(context, subject, fast)
+                await results.put((index, subject, pages, None))
+            except Exception as e:
+                log.error(f"Error processing subject {subject['text']}: {e}")
+                log.exception("Stack trace:")
+                await results.put((index, subject, [], e))
+    finally:
+        if context is not None:
+            await context.close()
+
+
+async def _write_subject(sink: Sink, subject: Dict, pages: List[List[Dict]],
+                         journal: Optional[CheckpointJournal] = None, work=None):
+    subject_code = subject_code_of(subject)
+    courses = sum(len(page_courses) for page_courses in pages)
+    if courses:
+        log.info(f"Extracted {courses} courses from {subject['text']}")
+    failed = []
+    for page_number, page_courses in enumerate(pages, start=1):
+        if not await asyncio.to_thread(upload_page, sink, page_courses, subject_code, page_number, journal):
+            failed.append(page_number)
+    if failed:
+        fail_subject(journal, work, subject_code,
+                     RuntimeError(f"Upload of {subject_code} page(s) {', '.join(map(str, failed))} failed"))
+        return
+    if journal:
+        journal.finish_subject(subject_code, len(pages))
+    complete_subject(sink, subject_code, journal)
+    if work:
+        work.complete(subject_code)
+
+
+async def _writer(results: asyncio.Queue, total: int, sink: Sink, slots: asyncio.Semaphore,
+                  journal: Optional[CheckpointJournal] = None, work=None):
+    """Single consumer that writes subjects in their original list order.
+
+    Subjects that finish early wait in a reorder buffer, which the worker
+    slots keep to a fixed size.
+    """
+    pending = {}
+    next_index = 0
+    while next_index < total:
+        index, subject, pages, error = await results.get()
+        pending[index] = (subject, pages, error)
+        while next_index in pending:
+            subject, pages, error = pending.pop(next_index)
+            next_index += 1
+            if error:
+                fail_subject(journal, work, subject_code_of(subject), error)
+            else:
+                await _write_subject(sink, subject, pages, journal, work)
+            slots.release()
+
+
+async def scrape_courses_concurrent(sink: Sink,
+                                    concurrency: int = DEFAULT_CONCURRENCY,
+                                    subjects: Optional[List[Dict]] = None,
+                                    headless: bool = False, fast: bool = False,
+                                    journal: Optional[CheckpointJournal] = None, work=None,
+                                    max_buffered: Optional[int] = None):
+    """Scrape subjects on `concurrency` browser contexts sharing one browser.
+
+    Results pages are always read with the lean extractor. A single writer
+    uploads subjects in list order, so the output doesn't depend on which
+    worker finishes first. At most `max_buffered` subjects are scraped but
+    not yet written: past that, workers wait for the writer instead of
+    buffering the catalog behind a slow subject or a slow sink.
+    """
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            if subjects is None:
+                subjects = select_test_subjects(await get_all_subjects_async(browser))
+            if work:
+                subjects = list(work.assign(subjects, journal))
+            elif journal:
+                subjects = journal.pending(subjects)
+            log.info(f"Scraping {len(subjects)} subjects with concurrency {concurrency}")
+
+            queue = asyncio.Queue()
+            worker_count = max(1, min(concurrency, len(subjects)))
+            # Subjects are taken in list order, so the one the writer waits for always holds a slot
+            slots = asyncio.Semaphore(max(worker_count, max_buffered or REORDER_BUFFER_PER_WORKER * worker_count))
+            results = asyncio.Queue()
+            for item in enumerate(subjects):
+                queue.put_nowait(item)
+            for _ in range(worker_count):
+                queue.put_nowait((None, None))
+
+            workers = [asyncio.create_task(_worker(browser, queue, results, slots, fast))
+                       for _ in range(worker_count)]
+            await _writer(results, len(subjects), sink, slots, journal, work)
+            await asyncio.gather(*workers)
+        finally:
+            await browser.close()
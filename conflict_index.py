@@ -0,0 +1,163 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from catalog import Catalog, Course, Section
+from schedule import WEEK_SLOTS, meeting_mask
+
+log = logging.getLogger(__name__)
+
+# The week's 5-minute slots packed into 64-bit words
+WORDS = -(-WEEK_SLOTS // 64)
+# Partial schedules extended per vectorized step, bounding the (partials x options x WORDS) temporary
+CHUNK_SIZE = 4096
+
+CourseKey = Tuple[str, str]          # (subject code, course number)
+SectionKey = Tuple[str, str, str]    # (subject code, course number, section id)
+# The sections a student enrolls in together, e.g. lecture A00 with discussion A01
+Option = Tuple[Section, ...]
+
+
+def mask_words(mask: int) -> np.ndarray:
+    """Pack a schedule.meeting_mask bitmask into WORDS little-endian uint64 words."""
+    return np.frombuffer(mask.to_bytes(WORDS * 8, 'little'), dtype='<u8').astype(np.uint64)
+
+
+def enrollment_options(course: Course) -> List[Option]:
+    """Split a course into the section combinations a student can enroll in.
+
+    Sections are grouped by their letter (A00, A01, ... are group A). The
+    'x00' sections of a group, usually the lecture, are attended by everyone
+    in the group, so each other section of the group is an option together
+    with them. A group with nothing but 'x00' sections is a single option.
+    """
+    groups: Dict[str, List[Section]] = {}
+    for section in course.sections:
+        groups.setdefault(section.section_id[:1], []).append(section)
+
+    options = []
+    for sections in groups.values():
+        common = tuple(s for s in sections if s.section_id.endswith('00'))
+        others = [s for s in sections if not s.section_id.endswith('00')]
+        if others:
+            options.extend(common + (section,) for section in others)
+        else:
+            options.append(common)
+    return options
+
+
+class ConflictIndex:
+    """Time-conflict index over every enrollment option in a catalog.
+
+    Each option's weekly meetings are stored as one row of a packed
+    (options x WORDS) uint64 bitmask matrix, so testing a schedule against
+    every option of a course is a single vectorized AND. Sections without a
+    fixed weekly time (TBA, or dated meetings like finals) never conflict.
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.options: List[Option] = []
+        self.course_rows: Dict[CourseKey, np.ndarray] = {}
+        self.section_masks: Dict[SectionKey, int] = {}
+        masks, is_open = [], []
+        for course in catalog:
+            key = (course.subject_code, course.number)
+            rows = []
+            for option in enrollment_options(course):
+                mask = 0
+                for section in option:
+                    section_mask = meeting_mask(section.days, section.time)
+                    self.section_masks[key + (section.section_id,)] = section_mask
+                    mask |= section_mask
+                rows.append(len(self.options))
+                self.options.append(option)
+                masks.append(mask_words(mask))
+                # The section that differs between options is the one students enroll in
+                is_open.append(option[-1].available > 0 if option else False)
+            self.course_rows[key] = np.array(rows, dtype=np.intp)
+        self.masks = np.array(masks, dtype=np.uint64).reshape(-1, WORDS)
+        self.is_open = np.array(is_open, dtype=bool)
+        log.debug(f"Indexed {len(self.options)} options of {len(self.course_rows)} courses")
+
+    @classmethod
+    def from_courses(cls, courses: Iterable[Dict]) -> 'ConflictIndex':
+        return cls(Catalog(courses))
+
+    def __len__(self) -> int:
+        return len(self.options)
+
+    def busy_mask(self, sections: Iterable[SectionKey] = ()) -> np.ndarray:
+        """Packed mask of the weekly times taken by the given (subject, number, section id) keys."""
+        mask = 0
+        for key in sections:
+            try:
+                mask |= self.section_masks[key]
+            except KeyError:
+                raise KeyError(f"Unknown section {' '.join(key)}") from None
+        return mask_words(mask)
+
+    def candidate_rows(self, course: CourseKey, busy: Optional[np.ndarray] = None,
+                       open_only: bool = True) -> np.ndarray:
+        rows = self.course_rows.get(course)
+        if rows is None:
+            raise KeyError(f"Unknown course {' '.join(course)}")
+        keep = np.ones(len(rows), dtype=bool)
+        if open_only:
+            keep &= self.is_open[rows]
+        if busy is not None:
+            keep &= ~(self.masks[rows] & busy).any(axis=1)
+        return rows[keep]
+
+    def compatible_options(self, course: CourseKey, sections: Iterable[SectionKey] = (),
+                           open_only: bool = True) -> List[Option]:
+        """Options of `course` that are open and don't clash with the given sections."""
+        rows = self.candidate_rows(course, self.busy_mask(sections), open_only)
+        return [self.options[row] for row in rows]
+
+    def combinations(self, courses: List[CourseKey], sections: Iterable[SectionKey] = (),
+                     open_only: bool = True, limit: Optional[int] = None) -> List[Tuple[Option, ...]]:
+        """Every conflict-free way to take all of `courses` around the given sections.
+
+        Schedules are built one course at a time, fewest options first. Each
+        step ANDs a chunk of partial schedule masks against every option of
+        the next course, keeps the clash-free pairs and extends them before
+        moving on to the next chunk, so at most a few chunks per course are
+        held at once and the search stops as soon as `limit` schedules are
+        complete. Results list one option per course, in the order the
+        courses were given.
+        """
+        if not courses or (limit is not None and limit <= 0):
+            return []
+        busy = self.busy_mask(sections)
+        candidates = [self.candidate_rows(course, busy, open_only) for course in courses]
+        order = sorted(range(len(courses)), key=lambda i: len(candidates[i]))
+        complete: List[np.ndarray] = []
+        found = 0
+
+        def extend(depth: int, combos: np.ndarray, masks: np.ndarray):
+            nonlocal found
+            if depth == len(order):
+                if limit is not None:
+                    combos = combos[:limit - found]
+                complete.append(combos)
+                found += len(combos)
+                return
+            rows = candidates[order[depth]]
+            option_masks = self.masks[rows]
+            for start in range(0, len(combos), CHUNK_SIZE):
+                chunk = masks[start:start + CHUNK_SIZE]
+                clash = (chunk[:, None, :] & option_masks[None, :, :]).any(axis=2)
+                partial, option = np.nonzero(~clash)
+                if len(partial):
+                    extend(depth + 1, np.column_stack((combos[start:start + CHUNK_SIZE][partial], rows[option])),
+                           chunk[partial] | option_masks[option])
+                if limit is not None and found >= limit:
+                    return
+
+        extend(0, np.zeros((1, 0), dtype=np.intp), busy.reshape(1, WORDS))
+        if not complete:
+            return []
+        # Columns are in `order`; put them back in the caller's course order
+        combos = np.concatenate(complete)[:, np.argsort(order)]
+        return [tuple(self.options[row] for row in combo) for combo in combos.tolist()]
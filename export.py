@@ -0,0 +1,191 @@
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Tuple
+
+from sinks import Sink
+
+log = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_DIR = 'exports'
+DEFAULT_TERM = 'current'
+# Partitions with an open file at once; a subject scrape only ever writes to one
+MAX_OPEN_PARTITIONS = 8
+# Rows buffered per partition before a Parquet/Arrow row group (record batch) is written
+ROW_GROUP_SIZE = 50_000
+
+# One row per section, in column order
+COLUMNS = ('term', 'subject_code', 'number', 'name', 'units', 'section_id', 'meeting_type', 'days', 'time',
+           'building', 'room', 'instructor', 'available', 'limit', 'scraped_at')
+# Encoded in the directory names rather than stored in columnar files
+PARTITION_COLUMNS = ('term', 'subject_code')
+
+
+def section_rows(courses: List[Dict], term: str, scraped_at: float) -> Iterator[Dict]:
+    """Flatten scraped course dicts into one export row per section."""
+    for course in courses:
+        for section in course['sections']:
+            yield {
+                'term': term,
+                'subject_code': course.get('subject_code', 'N/A'),
+                'number': course['number'],
+                'name': course['name'],
+                'units': course.get('units', 'N/A'),
+                'section_id': section['sectionId'],
+                'meeting_type': section['meetingType'],
+                'days': section['days'],
+                'time': section['time'],
+                'building': section['building'],
+                'room': section['room'],
+                'instructor': section['instructor'],
+                'available': section.get('available', 0),
+                'limit': section.get('limit', 0),
+                'scraped_at': scraped_at,
+            }
+
+
+def _partition_value(text: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', text) or '_'
+
+
+class _JsonlPartition:
+    def __init__(self, path: str):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, rows: List[Dict]):
+        self.file.writelines(json.dumps(row, separators=(',', ':')) + '\n' for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ArrowPartition:
+    """Buffers rows column-wise and writes them as row groups (Parquet) or record batches (Arrow IPC)."""
+
+    def __init__(self, path: str, schema, file_format: str, row_group_size: int):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.columns: Dict[str, List] = {name: [] for name in schema.names}
+        self.buffered = 0
+        if file_format == 'parquet':
+            self.writer = pq.ParquetWriter(path, schema, compression='zstd')
+        else:
+            self.writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    def write(self, rows: List[Dict]):
+        for row in rows:
+            for name, values in self.columns.items():
+                values.append(row[name])
+        self.buffered += len(rows)
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffered:
+            return
+        batch = self.pa.record_batch([self.pa.array(self.columns[name], type=field.type)
+                                      for name, field in zip(self.schema.names, self.schema)], schema=self.schema)
+        self.writer.write_batch(batch)
+        for values in self.columns.values():
+            values.clear()
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+class ExportSink(Sink):
+    """Stream scraped sections to files partitioned by term and subject.
+
+    Files are laid out Hive-style, e.g.
+    exports/term=FA24/subject_code=CSE/part-20241016T120000-1234-0000.parquet,
+    so Arrow, DuckDB or Spark can prune by term and subject. Every run writes
+    new part files and stamps its rows with scraped_at, so successive runs
+    build up a history of seat availability.
+
+    The format is 'jsonl' (gzip-compressed JSON lines, one self-contained
+    object per section), 'parquet' or 'arrow' (Arrow IPC file); the columnar
+    formats are zstd-compressed and leave the partition columns to the
+    directory names. Memory stays bounded: JSONL rows are written as each
+    page arrives, columnar rows are buffered up to row_group_size per
+    partition, and at most max_open partitions have a file open. A part file
+    is written under a .tmp name and only renamed into place once complete.
+    """
+    thread_safe = True
+    FORMATS = {'jsonl': '.jsonl.gz', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+    def __init__(self, root: str = DEFAULT_EXPORT_DIR, file_format: str = 'jsonl', term: str = DEFAULT_TERM,
+                 max_open: int = MAX_OPEN_PARTITIONS, row_group_size: int = ROW_GROUP_SIZE):
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown export format {file_format!r}, expected one of {', '.join(self.FORMATS)}")
+        self.schema = None
+        if file_format != 'jsonl':
+            import pyarrow as pa
+
+            columns = [name for name in COLUMNS if name not in PARTITION_COLUMNS]
+            types = {'available': pa.int32(), 'limit': pa.int32(), 'scraped_at': pa.float64()}
+            self.schema = pa.schema([(name, types.get(name, pa.string())) for name in columns])
+        self.root = root
+        self.file_format = file_format
+        self.term = term
+        self.max_open = max(1, max_open)
+        self.row_group_size = row_group_size
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.partitions: 'OrderedDict[Tuple[str, str], Tuple[str, object]]' = OrderedDict()
+        self.written: List[str] = []
+        self._parts = 0
+        self._lock = threading.Lock()
+
+    def _partition(self, subject_code: str):
+        key = (self.term, subject_code)
+        entry = self.partitions.get(key)
+        if entry is not None:
+            self.partitions.move_to_end(key)
+            return entry[1]
+        if len(self.partitions) >= self.max_open:
+            self._close_partition(next(iter(self.partitions)))
+
+        directory = os.path.join(self.root, f'term={_partition_value(self.term)}',
+                                 f'subject_code={_partition_value(subject_code)}')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'part-{self.run_id}-{self._parts:04d}{self.FORMATS[self.file_format]}')
+        self._parts += 1
+        if self.file_format == 'jsonl':
+            writer = _JsonlPartition(f'{path}.tmp')
+        else:
+            writer = _ArrowPartition(f'{path}.tmp', self.schema, self.file_format, self.row_group_size)
+        self.partitions[key] = (path, writer)
+        return writer
+
+    def _close_partition(self, key: Tuple[str, str]):
+        path, writer = self.partitions.pop(key)
+        writer.close()
+        os.replace(f'{path}.tmp', path)
+        self.written.append(path)
+        log.info(f"Exported {path}")
+
+    def upload_courses(self, courses: List[Dict]) -> bool:
+        if not courses:
+            return True
+        by_subject: Dict[str, List[Dict]] = {}
+        for row in section_rows(courses, self.term, time.time()):
+            by_subject.setdefault(row['subject_code'], []).append(row)
+        with self._lock:
+            for subject_code, rows in by_subject.items():
+                self._partition(subject_code).write(rows)
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            while self.partitions:
+                self._close_partition(next(iter(self.partitions)))
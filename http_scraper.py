@@ -0,0 +1,158 @@
+import logging
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import ResponseCache
+from politeness import scheduler
+from soc_parser import page_info, parse_courses, parse_search_form, parse_subjects
+
+log = logging.getLogger(__name__)
+
+URL = "https://act.ucsd.edu/scheduleOfClasses/scheduleOfClassesStudent.htm"
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) schedule-surfer"
+
+
+class HttpScraper:
+    """Browser-free scraper that submits the search form over pooled HTTP connections.
+
+    The results pages are stateful on the server side (pagination links refer
+    to the last search of the session), so a single instance must not be used
+    from several threads at once. Every request goes through the process-wide
+    politeness scheduler.
+    """
+
+    def __init__(self, url: str = URL, pool_size: int = 10, timeout: float = 30,
+                 session: Optional[requests.Session] = None, cache: Optional[ResponseCache] = None):
+        self.url = url
+        self.timeout = timeout
+        self.cache = cache
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.setdefault('User-Agent', USER_AGENT)
+
+        self._form_html = None
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        return scheduler.call(self._request, 'GET', url, kind='page', **kwargs)
+
+    def _post(self, url: str, data) -> requests.Response:
+        return scheduler.call(self._request, 'POST', url, kind='search', data=data)
+
+    def load_search_page(self) -> str:
+        """Fetch the search form page (also establishes the server session)."""
+        self._form_html = self._get(self.url).text
+        return self._form_html
+
+    def get_all_subjects(self) -> List[Dict]:
+        if self.cache:
+            subjects = self.cache.get_subjects()
+            if subjects is not None:
+                log.info(f"Using the cached list of {len(subjects)} subjects")
+                return subjects
+        try:
+            subjects = parse_subjects(self.load_search_page())
+        except Exception as e:
+            log.error(f"Error getting subjects: {e}")
+            return []
+        if self.cache and subjects:
+            self.cache.put_subjects(subjects)
+        return subjects
+
+    def search(self, subject_values: List[str]) -> requests.Response:
+        """Submit the search form for the given subject values and return page 1."""
+        if self._form_html is None:
+            self.load_search_page()
+
+        action, fields = parse_search_form(self._form_html)
+        fields = fields + [('selectedSubjects', value) for value in subject_values]
+        return self._post(urljoin(self.url, action or self.url), fields)
+
+    def iter_result_pages(self, subject_values: List[str]):
+        """Yield (page_number, html) for every results page of a search.
+
+        With a cache, a search whose pages are all fresh is replayed from
+        disk, and pages after the first are revalidated with conditional GETs.
+        A page that comes back unchanged reuses its stored next-page link.
+        """
+        key = ','.join(subject_values)
+        if self.cache:
+            cached = self.cache.get_search(key)
+            if cached is not None:
+                log.info(f"Using {len(cached)} cached page(s) for {key}")
+                yield from enumerate(cached, 1)
+                return
+
+        response = self.search(subject_values)
+        html = response.text
+        current_page = 1
+        while True:
+            href = self.page_info(html, current_page)['next_href']
+            if self.cache:
+                # Stored before yielding: callers stop early at "No classes found"
+                self.cache.put_page(key, current_page, html, response.headers, last=not href)
+            yield current_page, html
+
+            if not href:
+                break
+            current_page += 1
+            log.info(f"Moving to page {current_page}")
+            headers = self.cache.validators(key, current_page) if self.cache else {}
+            response = self._get(urljoin(response.url, href), headers=headers)
+            if response.status_code == 304:
+                log.info(f"Page {current_page} of {key} not modified")
+                html = self.cache.get_page(key, current_page)
+            else:
+                html = response.text
+
+    def fetch_pages(self, subject_values: List[str], page_numbers) -> Dict[int, str]:
+        """Search and fetch only the requested results pages.
+
+        Page 1 is the search response itself and is always returned; other
+        pages are requested directly with the same ?page=N query the
+        pagination links use.
+        """
+        response = self.search(subject_values)
+        pages = {1: response.text}
+        for page_number in sorted(n for n in page_numbers if n > 1):
+            pages[page_number] = self._get(urljoin(response.url, f'?page={page_number}')).text
+        return pages
+
+    def page_info(self, html: str, page_number: int) -> Dict:
+        """soc_parser.page_info, stored in the cache next to the page's parsed courses."""
+        if self.cache:
+            return self.cache.parsed(html, page_info, page_number)
+        return page_info(html, page_number)
+
+    def has_no_classes(self, html: str) -> bool:
+        """Whether page 1 of a search says "No classes found"."""
+        return self.page_info(html, 1)['no_classes']
+
+    def parse_page(self, html: str, subject_code: str, parser: Callable = parse_courses):
+        """parser(html, subject_code), skipped when the cache has already parsed identical content."""
+        if self.cache:
+            return self.cache.parsed(html, parser, subject_code)
+        return parser(html, subject_code)
+
+    def scrape_subject(self, subject_value: str, subject_code: str) -> List[Dict]:
+        """Return the courses of every results page for one subject."""
+        courses = []
+        for page_number, html in self.iter_result_pages([subject_value]):
+            if page_number == 1 and self.has_no_classes(html):
+                log.info(f"No classes found for subject: {subject_code}")
+                break
+            courses.extend(self.parse_page(html, subject_code))
+        return courses
+
+    def close(self):
+        self.session.close()
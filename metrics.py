@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+PROMETHEUS_PREFIX = 'schedule_surfer'
+
+# (metric name, subject code); the subject is '' for run-wide metrics
+Key = Tuple[str, str]
+
+
+class Metrics:
+    """Thread-safe counters and timers, broken down by subject.
+
+    Timers keep a count, a total and a maximum rather than every sample, so
+    recording is a dict lookup and three additions under a lock. Nothing is
+    formatted until the metrics are exported.
+    """
+
+    def __init__(self):
+        self.counters: Dict[Key, float] = {}
+        self.timers: Dict[Key, list] = {}  # key -> [count, total seconds, max seconds]
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1, subject: str = ''):
+        key = (name, subject)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, subject: str = ''):
+        key = (name, subject)
+        with self._lock:
+            timer = self.timers.get(key)
+            if timer is None:
+                self.timers[key] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def seconds(self, name: str, subject: str = '') -> float:
+        """Total time recorded so far by a timer."""
+        with self._lock:
+            timer = self.timers.get((name, subject))
+        return timer[1] if timer else 0.0
+
+    @contextmanager
+    def timer(self, name: str, subject: str = ''):
+        """Record the time spent in the with-block, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, subject)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> Dict:
+        """Totals per metric plus the same metrics per subject, as plain dicts."""
+        with self._lock:
+            counters = dict(self.counters)
+            timers = {key: list(value) for key, value in self.timers.items()}
+
+        totals = {'counters': {}, 'timers': {}}
+        subjects: Dict[str, Dict] = {}
+        for (name, subject), value in sorted(counters.items()):
+            totals['counters'][name] = totals['counters'].get(name, 0) + value
+            if subject:
+                subjects.setdefault(subject, {'counters': {}, 'timers': {}})['counters'][name] = value
+        for (name, subject), (count, total, maximum) in sorted(timers.items()):
+            merged = totals['timers'].setdefault(name, {'count': 0, 'seconds': 0.0, 'max': 0.0})
+            merged['count'] += count
+            merged['seconds'] += total
+            merged['max'] = max(merged['max'], maximum)
+            if subject:
+                subjects.setdefault(subject, {'counters': {}, 'timers': {}})['timers'][name] = {
+                    'count': count, 'seconds': total, 'max': maximum}
+        return {'started': self.started, 'elapsed': time.time() - self.started,
+                'totals': totals, 'subjects': subjects}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """Render in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            timers = sorted(self.timers.items())
+
+        lines = []
+        declared = set()
+        for (name, subject), value in counters:
+            metric = f'{PROMETHEUS_PREFIX}_{name}_total'
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{_labels(subject)} {value:g}')
+        maxima = []
+        for (name, subject), (count, total, maximum) in timers:
+            metric = f'{PROMETHEUS_PREFIX}_{name}_seconds'
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f'# TYPE {metric} summary')
+            labels = _labels(subject)
+            lines.append(f'{metric}_count{labels} {count}')
+            lines.append(f'{metric}_sum{labels} {total:.6f}')
+            maxima.append((f'{PROMETHEUS_PREFIX}_{name}_max_seconds', labels, maximum))
+        # Summaries can't carry a max sample, so it is exported as a separate gauge
+        for metric, labels, maximum in maxima:
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f'# TYPE {metric} gauge')
+            lines.append(f'{metric}{labels} {maximum:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """Write Prometheus text for .prom/.txt paths, JSON otherwise (atomically)."""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def log_summary(self):
+        totals = self.snapshot()['totals']
+        for name, timer in totals['timers'].items():
+            log.info(f"{name}: {timer['count']} x, {timer['seconds']:.2f}s total, {timer['max']:.2f}s max")
+        for name, value in totals['counters'].items():
+            log.info(f"{name}: {value:g}")
+
+
+def _labels(subject: str) -> str:
+    if not subject:
+        return ''
+    escaped = subject.replace('\\', '\\\\').replace('"', '\\"')
+    return f'{{subject="{escaped}"}}'
+
+
+class PeriodicExporter:
+    """Rewrite a metrics file every `interval` seconds, and once more on stop()."""
+
+    def __init__(self, metrics: Metrics, path: str, interval: Optional[float] = None):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'PeriodicExporter':
+        if self.interval:
+            self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.metrics.write(self.path)
+            except OSError as e:
+                log.error(f"Error writing metrics to {self.path}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.metrics.write(self.path)
+
+
+# Process-wide registry shared by the scrape loops, upload_page and the Airtable client
+metrics = Metrics()
@@ -0,0 +1,334 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+from checkpoint import CheckpointJournal, complete_subject, fail_subject, subject_code_of, upload_page
+from metrics import metrics
+from politeness import scheduler
+from sinks import Sink
+
+if TYPE_CHECKING:
+    # The browser pipeline shouldn't have to load requests
+    from http_scraper import HttpScraper
+
+log = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_UPLOAD_WORKERS = 4
+
+# Marks the end of the stream on a stage's input queue
+_DONE = object()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage (safe to update from several workers)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0      # seconds spent doing the stage's work
+        self.blocked = 0.0   # seconds waiting for room in the next queue (backpressure)
+        self.idle = 0.0      # seconds waiting for input
+        self._lock = threading.Lock()
+
+    def add(self, items: int = 0, busy: float = 0.0, blocked: float = 0.0, idle: float = 0.0, errors: int = 0):
+        with self._lock:
+            self.items += items
+            self.busy += busy
+            self.blocked += blocked
+            self.idle += idle
+            self.errors += errors
+
+    @contextmanager
+    def time(self, items: int = 1):
+        """Count `items` and the time spent in the with-block as work."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(items=items, busy=time.perf_counter() - started)
+
+    def summary(self, elapsed: float) -> str:
+        rate = self.items / elapsed if elapsed else 0.0
+        return (f"{self.name}: {self.items} items ({rate:.1f}/s), busy {self.busy:.2f}s, "
+                f"blocked {self.blocked:.2f}s, idle {self.idle:.2f}s, {self.errors} errors")
+
+
+class Pipeline:
+    """Run a source and a chain of stages connected by bounded queues.
+
+    The source is iterated on the calling thread, which is what the sync
+    Playwright API requires. Each stage runs on its own worker threads and
+    returns the item for the next stage, or None to drop it. Full queues
+    block the producer, so a slow sink throttles scraping instead of
+    buffering a whole catalog in memory. A failing item is logged and
+    counted, and the rest of the stream continues; items are tuples keyed
+    by subject code, and the subjects that lost an item land in `failed`.
+    """
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.stages: List[tuple] = []
+        self.stats: Dict[str, StageStats] = {}
+        self.failed: Dict[str, Exception] = {}
+        self._failed_lock = threading.Lock()
+        self.elapsed = 0.0
+
+    def counter(self, name: str) -> StageStats:
+        if name not in self.stats:
+            self.stats[name] = StageStats(name)
+        return self.stats[name]
+
+    def stage(self, name: str, func: Callable, workers: int = 1) -> 'Pipeline':
+        self.stages.append((name, func, max(1, workers)))
+        self.counter(name)
+        return self
+
+    def _put(self, q: queue.Queue, item, stats: StageStats):
+        started = time.perf_counter()
+        q.put(item)
+        stats.add(blocked=time.perf_counter() - started)
+
+    def _worker(self, name, func, in_q, out_q, remaining, next_workers):
+        stats = self.stats[name]
+        while True:
+            started = time.perf_counter()
+            item = in_q.get()
+            stats.add(idle=time.perf_counter() - started)
+            if item is _DONE:
+                break
+            started = time.perf_counter()
+            try:
+                result = func(item)
+                stats.add(items=1, busy=time.perf_counter() - started)
+            except Exception as e:
+                stats.add(errors=1, busy=time.perf_counter() - started)
+                log.error(f"Error in pipeline stage {name}: {e}")
+                log.exception("Stack trace:")
+                with self._failed_lock:
+                    self.failed.setdefault(item[0], e)
+                continue
+            if out_q is not None and result is not None:
+                self._put(out_q, result, stats)
+
+        # The last worker of a stage to finish closes the next stage's input
+        with remaining['lock']:
+            remaining['count'] -= 1
+            last = remaining['count'] == 0
+        if last and out_q is not None:
+            for _ in range(next_workers):
+                out_q.put(_DONE)
+
+    def run(self, source: Iterable, source_name: str = 'source') -> Dict[str, StageStats]:
+        """Feed every item of `source` through the stages and wait until all are drained."""
+        source_stats = self.counter(source_name)
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = []
+        for index, (name, func, workers) in enumerate(self.stages):
+            out_q = queues[index + 1] if index + 1 < len(queues) else None
+            next_workers = self.stages[index + 1][2] if out_q is not None else 0
+            remaining = {'count': workers, 'lock': threading.Lock()}
+            for i in range(workers):
+                thread = threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True,
+                                          args=(name, func, queues[index], out_q, remaining, next_workers))
+                thread.start()
+                threads.append(thread)
+
+        started = time.perf_counter()
+        try:
+            for item in source:
+                if queues:
+                    self._put(queues[0], item, source_stats)
+        finally:
+            # Drain: let every queued item through, then stop the workers stage by stage
+            if queues:
+                for _ in range(self.stages[0][2]):
+                    queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - started
+            self.log_stats()
+        return self.stats
+
+    def log_stats(self):
+        log.info(f"Pipeline finished in {self.elapsed:.2f}s")
+        for stats in self.stats.values():
+            log.info(stats.summary(self.elapsed))
+
+
+def _upload_stage(sink: Sink, upload_workers: int, journal: Optional[CheckpointJournal] = None):
+    workers = upload_workers if getattr(sink, 'thread_safe', False) else 1
+    if workers < upload_workers:
+        log.info(f"{type(sink).__name__} is not thread-safe, uploading with a single worker")
+
+    def upload(item):
+        subject_code, page_number, courses = item
+        if not upload_page(sink, courses, subject_code, page_number, journal):
+            raise RuntimeError(f"Upload of {subject_code} page {page_number} failed")
+        return None
+
+    return upload, workers
+
+
+def _complete(sink: Sink, pipeline: Pipeline, finished: List[tuple],
+              journal: Optional[CheckpointJournal] = None, work=None):
+    # Only called once run() has drained the upload stage, so every page of a
+    # finished subject has either reached the sink or failed in some stage
+    for subject_code, page_count in finished:
+        error = pipeline.failed.get(subject_code)
+        if error is not None:
+            log.error(f"Not completing {subject_code}: a page failed in the pipeline")
+            fail_subject(journal, work, subject_code, error)
+            continue
+        if journal:
+            journal.finish_subject(subject_code, page_count)
+        complete_subject(sink, subject_code, journal)
+        if work:
+            work.complete(subject_code)
+
+
+def http_pages(scraper: 'HttpScraper', subjects: List[Dict], stats: StageStats,
+               journal: Optional[CheckpointJournal] = None, work=None, finished: Optional[List[tuple]] = None):
+    """Navigate stage for the HTTP engine: yield (subject_code, page_number, html).
+
+    Subjects whose pages were all yielded are appended to `finished` as
+    (subject_code, page_count), to be completed by _complete once the later
+    stages have drained; failed ones are reported to `work` straight away.
+    """
+    for subject in subjects:
+        subject_code = subject_code_of(subject)
+        try:
+            pages = scraper.iter_result_pages([subject['value']])
+            page_count = 0
+            while True:
+                started = time.perf_counter()
+                item = next(pages, None)
+                if item is None:
+                    break
+                elapsed = time.perf_counter() - started
+                stats.add(items=1, busy=elapsed)
+                metrics.observe('navigate', elapsed, subject_code)
+                page_number, html = item
+                page_count = page_number
+                yield subject_code, page_number, html
+            if finished is not None:
+                finished.append((subject_code, page_count))
+        except Exception as e:
+            stats.add(errors=1)
+            log.error(f"Error processing subject {subject['text']}: {e}")
+            log.exception("Stack trace:")
+            fail_subject(journal, work, subject_code, e)
+
+
+def scrape_courses_http_pipelined(scraper: 'HttpScraper', sink: Sink, subjects: Optional[List[Dict]] = None,
+                                  queue_size: int = DEFAULT_QUEUE_SIZE,
+                                  upload_workers: int = DEFAULT_UPLOAD_WORKERS,
+                                  journal: Optional[CheckpointJournal] = None, work=None) -> Pipeline:
+    """HTTP engine run as navigate -> extract -> transform -> upload stages."""
+    if subjects is None:
+        from tritonscraper import select_test_subjects
+        subjects = select_test_subjects(scraper.get_all_subjects())
+    if work:
+        subjects = work.assign(subjects, journal)
+    elif journal:
+        subjects = journal.pending(subjects)
+
+    def extract(item):
+        subject_code, page_number, html = item
+        if page_number == 1 and scraper.has_no_classes(html):
+            log.info(f"No classes found for subject: {subject_code}")
+            return subject_code, page_number, []
+        with metrics.timer('extract', subject_code):
+            return subject_code, page_number, scraper.parse_page(html, subject_code)
+
+    def transform(item):
+        subject_code, page_number, courses = item
+        if courses:
+            log.info(f"Extracted {len(courses)} courses from {subject_code} page {page_number}")
+        return item
+
+    upload, workers = _upload_stage(sink, upload_workers, journal)
+    pipeline = Pipeline(queue_size)
+    pipeline.stage('extract', extract).stage('transform', transform).stage('upload', upload, workers)
+    finished = []
+    pipeline.run(http_pages(scraper, subjects, pipeline.counter('navigate'), journal, work, finished),
+                 source_name='navigate')
+    _complete(sink, pipeline, finished, journal, work)
+    return pipeline
+
+
+def browser_pages(page, subjects: List[Dict], navigate: StageStats, extract: StageStats, fast: bool = False,
+                  journal: Optional[CheckpointJournal] = None, work=None, finished: Optional[List[tuple]] = None):
+    """Navigate and extract stages for the browser engine.
+
+    Both touch the Page, so they run on the source thread; they yield
+    (subject_code, page_number, compact rows) for the transform stage.
+    `work` and `finished` are as for http_pages.
+    """
+    from tritonscraper import EXTRACT_ROWS_JS, check_results_rendered, go_to_results_page, select_subject_and_search
+
+    for subject in subjects:
+        subject_code = subject_code_of(subject)
+        try:
+            with navigate.time(), metrics.timer('navigate', subject_code):
+                select_subject_and_search(page, subject['value'], subject['text'], debug_capture=False, fast=fast)
+            current_page = 1
+            while True:
+                with extract.time(), metrics.timer('extract', subject_code):
+                    result = page.evaluate(EXTRACT_ROWS_JS, current_page + 1)
+                check_results_rendered(result, subject_code)
+                if result['noClasses']:
+                    log.info(f"No classes found for subject: {subject['text']}")
+                    yield subject_code, current_page, []
+                    break
+                yield subject_code, current_page, result['rows']
+                if not result['hasNext']:
+                    break
+                current_page += 1
+                with navigate.time(), metrics.timer('navigate', subject_code):
+                    go_to_results_page(page, current_page, fast, subject_code)
+            if finished is not None:
+                finished.append((subject_code, current_page))
+        except Exception as e:
+            navigate.add(errors=1)
+            log.error(f"Error processing subject {subject['text']}: {e}")
+            log.exception("Stack trace:")
+            fail_subject(journal, work, subject_code, e)
+
+
+def scrape_courses_pipelined(page, sink: Sink, subjects: Optional[List[Dict]] = None, fast: bool = False,
+                             queue_size: int = DEFAULT_QUEUE_SIZE,
+                             upload_workers: int = DEFAULT_UPLOAD_WORKERS,
+                             journal: Optional[CheckpointJournal] = None, work=None) -> Pipeline:
+    """Browser engine run as navigate/extract -> transform -> upload stages."""
+    from tritonscraper import URL, get_all_subjects, rows_to_courses, select_test_subjects
+
+    if subjects is None:
+        scheduler.call(page.goto, URL, kind='search_page')
+        page.wait_for_selector('select[name="selectedSubjects"]')
+        subjects = select_test_subjects(get_all_subjects(page))
+    if work:
+        subjects = work.assign(subjects, journal)
+    elif journal:
+        subjects = journal.pending(subjects)
+
+    def transform(item):
+        subject_code, page_number, rows = item
+        courses = rows_to_courses(rows, subject_code)
+        if courses:
+            log.info(f"Extracted {len(courses)} courses from {subject_code} page {page_number}")
+        return subject_code, page_number, courses
+
+    upload, workers = _upload_stage(sink, upload_workers, journal)
+    pipeline = Pipeline(queue_size)
+    pipeline.stage('transform', transform).stage('upload', upload, workers)
+    finished = []
+    source = browser_pages(page, subjects, pipeline.counter('navigate'), pipeline.counter('extract'), fast,
+                           journal, work, finished)
+    pipeline.run(source, source_name='navigate')
+    _complete(sink, pipeline, finished, journal, work)
+    return pipeline
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+from metrics import metrics
+from rate_limit import TokenBucket, backoff_delay, retry_after, status_code
+
+log = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 3
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 60.0
+# A request slower than TOLERANCE x its kind's baseline latency (plus SLACK) counts as congestion
+LATENCY_TOLERANCE = 2.0
+LATENCY_SLACK = 0.25
+# How fast a kind's baseline latency follows slower samples
+BASELINE_DRIFT = 0.05
+DECREASE_FACTOR = 0.5
+# Back-to-back failures of requests that were all in flight together only halve the limit once
+DECREASE_COOLDOWN = 2.0
+# How often asyncio callers re-check for a free slot
+SLOT_POLL_SECONDS = 0.05
+
+
+def parse_rate_limit(text: str) -> float:
+    """Parse a --rate-limit value: requests per second, 0 for no limit."""
+    rate = float(text)
+    if rate < 0:
+        raise ValueError(f"Invalid rate limit {text!r}, expected 0 or more requests per second")
+    return rate
+
+
+@lru_cache(maxsize=None)
+def _timeout_errors() -> tuple:
+    # Imported on first failure only; neither library is needed to use the scheduler
+    errors = [TimeoutError]
+    try:
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+        errors.append(PlaywrightTimeoutError)
+    except ImportError:
+        pass
+    try:
+        import requests
+        errors.extend([requests.Timeout, requests.ConnectionError])
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def is_overload(error: Exception) -> bool:
+    """True for failures that suggest the server is struggling: timeouts, 429 and 5xx responses."""
+    status = status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, _timeout_errors())
+
+
+class RequestScheduler:
+    """Paces every request the scrapers send to the Schedule of Classes.
+
+    A token bucket caps the request rate for the whole process, and an AIMD
+    limit caps how many requests are in flight at once. The limit starts at
+    one and grows by 1/limit per request that comes back at about its usual
+    latency (roughly one more slot per round of requests). It is halved when
+    a request times out, the server answers 429 or 5xx, or a request takes
+    much longer than the baseline latency of its kind. Timeouts and overload
+    responses are retried after a jittered exponential backoff (or the
+    server's Retry-After); other errors are raised straight away.
+
+    call() is for blocking callers (requests, the sync Playwright API) and
+    acall() for coroutines; both share the same limits.
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = DEFAULT_REQUESTS_PER_SECOND,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = BACKOFF_BASE, backoff_cap: float = BACKOFF_CAP,
+                 clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.limit = 1.0
+        self.baselines = {}
+        self._last_decrease = float('-inf')
+        self.configure(requests_per_second, max_concurrency, max_retries, backoff_base, backoff_cap)
+
+    def configure(self, requests_per_second: Optional[float] = DEFAULT_REQUESTS_PER_SECOND,
+                  max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_retries: int = DEFAULT_MAX_RETRIES,
+                  backoff_base: float = BACKOFF_BASE, backoff_cap: float = BACKOFF_CAP):
+        """Set the limits; a requests_per_second of None or 0 removes the rate cap."""
+        with self._cond:
+            self.bucket = TokenBucket(requests_per_second, clock=self._clock) if requests_per_second else None
+            self.max_concurrency = max(1, max_concurrency)
+            self.limit = min(self.limit, self.max_concurrency)
+            self.max_retries = max_retries
+            self.backoff_base = backoff_base
+            self.backoff_cap = backoff_cap
+
+    def _try_enter(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _reserve(self) -> float:
+        return self.bucket.reserve() if self.bucket else 0.0
+
+    def _exit(self, kind: str, latency: float, outcome: str):
+        """Release a slot and adapt the limit; outcome is 'ok', 'overload' or 'error'."""
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == 'overload':
+                self._decrease(f"{kind} failed")
+            elif outcome == 'ok':
+                baseline = self.baselines.get(kind)
+                if baseline is not None and latency > baseline * LATENCY_TOLERANCE + LATENCY_SLACK:
+                    self._decrease(f"{kind} took {latency:.2f}s (baseline {baseline:.2f}s)")
+                elif self.limit < self.max_concurrency:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                if baseline is None or latency < baseline:
+                    self.baselines[kind] = latency
+                else:
+                    self.baselines[kind] = baseline + (latency - baseline) * BASELINE_DRIFT
+            self._cond.notify_all()
+        metrics.observe('request', latency)
+
+    def _decrease(self, reason: str):
+        now = self._clock()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit * DECREASE_FACTOR)
+        metrics.incr('request_backoffs')
+        log.info(f"{reason}, request concurrency limit lowered to {int(self.limit)}")
+
+    def _retry_delay(self, error: Exception, attempt: int, kind: str, subject: str) -> float:
+        """Delay before retrying a failed request; re-raises errors that shouldn't be retried."""
+        if not is_overload(error) or attempt >= self.max_retries:
+            raise error
+        delay = retry_after(error) or backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+        metrics.incr('request_retries', subject=subject)
+        log.warning(f"{kind} request failed ({type(error).__name__}: {error}), "
+                    f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def call(self, func, *args, kind: str = 'request', subject: str = '', **kwargs):
+        """Run func(*args, **kwargs) under the rate and concurrency limits, retrying timeouts."""
+        attempt = 0
+        while True:
+            started = self._clock()
+            with self._cond:
+                while not self._try_enter():
+                    self._cond.wait()
+            delay = self._reserve()
+            if delay:
+                self._sleep(delay)
+            metrics.observe('request_wait', self._clock() - started, subject)
+
+            started = self._clock()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._exit(kind, self._clock() - started, 'overload' if is_overload(e) else 'error')
+                self._sleep(self._retry_delay(e, attempt, kind, subject))
+                attempt += 1
+                continue
+            self._exit(kind, self._clock() - started, 'ok')
+            return result
+
+    async def acall(self, func, *args, kind: str = 'request', subject: str = '', **kwargs):
+        """Coroutine version of call(); func must return an awaitable."""
+        # Only coroutine callers need asyncio, and they have already loaded it
+        import asyncio
+
+        attempt = 0
+        while True:
+            started = self._clock()
+            while True:
+                with self._cond:
+                    if self._try_enter():
+                        break
+                await asyncio.sleep(SLOT_POLL_SECONDS)
+            delay = self._reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            metrics.observe('request_wait', self._clock() - started, subject)
+
+            started = self._clock()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                self._exit(kind, self._clock() - started, 'overload' if is_overload(e) else 'error')
+                await asyncio.sleep(self._retry_delay(e, attempt, kind, subject))
+                attempt += 1
+                continue
+            self._exit(kind, self._clock() - started, 'ok')
+            return result
+
+
+# Process-wide scheduler shared by the HTTP scraper and every browser navigation
+scheduler = RequestScheduler()
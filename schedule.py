@@ -0,0 +1,76 @@
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Day tokens as the Schedule of Classes prints them ('MWF', 'TuTh'), in week order
+DAY_CODES = ('M', 'Tu', 'W', 'Th', 'F', 'Sa', 'Su')
+DAY_RE = re.compile(r'Tu|Th|Sa|Su|M|W|F')
+TIME_RE = re.compile(r'^(\d{1,2}):(\d{2})\s*([ap])m?\s*-\s*(\d{1,2}):(\d{2})\s*([ap])m?$', re.IGNORECASE)
+
+MINUTES_PER_DAY = 24 * 60
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+
+# (start, end) in minutes from Monday 00:00, end exclusive
+Interval = Tuple[int, int]
+
+
+def parse_days(text: str) -> Optional[Tuple[int, ...]]:
+    """Day indices (Monday = 0) for a days cell like 'MWF', or None if it isn't a weekly pattern.
+
+    TBA sections and one-off meetings such as finals (whose days cell holds a
+    date) have no weekly pattern.
+    """
+    text = (text or '').strip()
+    tokens = DAY_RE.findall(text)
+    if not tokens or ''.join(tokens) != text:
+        return None
+    return tuple(sorted({DAY_CODES.index(token) for token in tokens}))
+
+
+def _minutes(hour: str, minute: str, meridiem: str) -> int:
+    # 12:xxa is just after midnight and 12:xxp just after noon
+    return (int(hour) % 12 + (12 if meridiem.lower() == 'p' else 0)) * 60 + int(minute)
+
+
+def parse_time_range(text: str) -> Optional[Tuple[int, int]]:
+    """(start, end) minutes after midnight for a time cell like '11:00a-12:20p', or None for TBA."""
+    match = TIME_RE.match((text or '').strip())
+    if not match:
+        return None
+    start = _minutes(*match.group(1, 2, 3))
+    end = _minutes(*match.group(4, 5, 6))
+    if end <= start:
+        return None
+    return start, end
+
+
+def meeting_intervals(days: str, time: str) -> List[Interval]:
+    """Weekly intervals of a meeting, in minutes from Monday 00:00; empty if it has no fixed time."""
+    day_indices = parse_days(days)
+    time_range = parse_time_range(time)
+    if day_indices is None or time_range is None:
+        return []
+    start, end = time_range
+    return [(day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end) for day in day_indices]
+
+
+@lru_cache(maxsize=4096)
+def meeting_mask(days: str, time: str) -> int:
+    """Bitmask of the 5-minute slots of the week a meeting occupies (bit 0 = Monday 00:00).
+
+    A slot is set if the meeting overlaps any part of it, so two meetings
+    conflict exactly when their masks share a bit, give or take the rounding
+    of times that don't fall on a 5-minute boundary. Back-to-back meetings
+    (one ending at 10:50, the next starting at 11:00 or 10:50) don't conflict.
+    The catalog only has a few hundred distinct days/time pairs, so results
+    are cached.
+    """
+    mask = 0
+    for start, end in meeting_intervals(days, time):
+        first = start // SLOT_MINUTES
+        last = -(-end // SLOT_MINUTES)
+        mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
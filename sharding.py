@@ -0,0 +1,253 @@
+import logging
+import os
+import socket
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from checkpoint import CheckpointJournal, subject_code_of
+from sinks import Sink, SqliteSink
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 900
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse 'i/N' (0-based shard index i of N shards)."""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard {text!r}, expected i/N such as 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {text!r}, i must be in 0..N-1")
+    return index, count
+
+
+class ShardAssignment:
+    """Static partition: shard i of N takes every N-th subject starting at i.
+
+    Every worker reads the same subject list from the search page, so the
+    shards are disjoint and together cover the whole list without any
+    coordination.
+    """
+
+    def __init__(self, index: int, count: int):
+        self.index = index
+        self.count = count
+
+    def assign(self, subjects: List[Dict], journal: Optional[CheckpointJournal] = None) -> List[Dict]:
+        """This shard's subjects, less those the journal has finished.
+
+        The shard is cut from the full list first, so a resumed worker keeps
+        the same share as the other workers.
+        """
+        assigned = subjects[self.index::self.count]
+        log.info(f"Shard {self.index}/{self.count}: {len(assigned)} of {len(subjects)} subjects")
+        return journal.pending(assigned) if journal else assigned
+
+    def renew(self, subject_code: str):
+        pass
+
+    def complete(self, subject_code: str):
+        pass
+
+    def fail(self, subject_code: str, error: Exception):
+        pass
+
+
+LEASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subjects (
+    code TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_subjects_status ON subjects (status, position);
+"""
+
+
+class LeaseQueue:
+    """Work queue of subjects in a SQLite file shared by local worker processes.
+
+    Every worker seeds the queue with the subject list (idempotently) and
+    then claims one subject at a time under a lease. A claimed subject that
+    is neither completed nor failed before its lease expires, e.g. because
+    its worker was killed, is handed to the next worker that asks. A subject
+    that has used up max_attempts is marked 'failed' instead, which is
+    final. Claims run in BEGIN IMMEDIATE transactions, so two workers never
+    hold the same live lease. Workers call renew() as they go, so a subject
+    that takes longer than one lease to scrape isn't handed out twice.
+    """
+
+    def __init__(self, path: str, worker_id: Optional[str] = None, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(LEASE_SCHEMA)
+        self.renewed = 0.0
+
+    def seed(self, subjects: List[Dict]):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO subjects (code, position, value, text) VALUES (?, ?, ?, ?)",
+                [(subject_code_of(s), i, s['value'], s['text']) for i, s in enumerate(subjects)])
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def _expire_leases(self, now: float):
+        # An abandoned lease on the last attempt will never be claimed again
+        self.conn.execute(
+            "UPDATE subjects SET status = 'failed', lease_expires = NULL, "
+            "error = COALESCE(error, 'lease expired on the last attempt') "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, self.max_attempts))
+
+    def claim(self) -> Optional[Dict]:
+        """Lease the next pending (or abandoned) subject, or return None when none is left."""
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._expire_leases(now)
+            row = self.conn.execute(
+                "SELECT code, value, text FROM subjects "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ? "
+                "ORDER BY position LIMIT 1", (now, self.max_attempts)).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE subjects SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE code = ?", (self.worker_id, now + self.lease_seconds, row[0]))
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        if row is None:
+            return None
+        self.renewed = now
+        return {'value': row[1], 'text': row[2]}
+
+    def renew(self, subject_code: str):
+        """Extend this worker's lease on a subject, at most once per half lease.
+
+        Raises RuntimeError if the lease expired and the subject went to another worker.
+        """
+        now = time.time()
+        if now - self.renewed < self.lease_seconds / 2:
+            return
+        renewed = self.conn.execute(
+            "UPDATE subjects SET lease_expires = ? WHERE code = ? AND worker = ? AND status = 'leased'",
+            (now + self.lease_seconds, subject_code, self.worker_id)).rowcount
+        if not renewed:
+            raise RuntimeError(f"Lease on {subject_code} was lost to another worker")
+        self.renewed = now
+
+    def assign(self, subjects: List[Dict], journal: Optional[CheckpointJournal] = None) -> Iterator[Dict]:
+        """Seed the queue with the full list and yield subjects as this worker claims them.
+
+        A claimed subject the journal has already finished is completed
+        straight away rather than scraped again.
+        """
+        self.seed(subjects)
+        while True:
+            subject = self.claim()
+            if subject is None:
+                return
+            subject_code = subject_code_of(subject)
+            if journal and journal.is_subject_done(subject_code):
+                log.info(f"Worker {self.worker_id} leased {subject_code}, finished in a previous run")
+                self.complete(subject_code)
+                continue
+            log.info(f"Worker {self.worker_id} leased {subject_code}")
+            yield subject
+
+    def complete(self, subject_code: str):
+        self.conn.execute("UPDATE subjects SET status = 'done', lease_expires = NULL WHERE code = ? AND worker = ?",
+                          (subject_code, self.worker_id))
+
+    def fail(self, subject_code: str, error: Exception):
+        # Give the subject back to the queue until it runs out of attempts
+        self.conn.execute(
+            "UPDATE subjects SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_expires = NULL, error = ? WHERE code = ? AND worker = ?",
+            (self.max_attempts, str(error), subject_code, self.worker_id))
+
+    def counts(self) -> Dict[str, int]:
+        self._expire_leases(time.time())
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM subjects GROUP BY status"))
+
+    def failed(self) -> Dict[str, str]:
+        """Subjects that ran out of attempts, with their last error."""
+        self._expire_leases(time.time())
+        return dict(self.conn.execute("SELECT code, error FROM subjects WHERE status = 'failed' ORDER BY position"))
+
+    def close(self):
+        self.conn.close()
+
+
+def merge_partials(paths: List[str], sink: Sink, queue: Optional[LeaseQueue] = None) -> Dict[str, str]:
+    """Combine the SQLite partial results of several workers into one sink.
+
+    Only subjects a partial records as finished are merged, since a failed
+    or interrupted attempt may have written only some of their pages. A
+    subject finished by more than one worker (an expired lease, or
+    overlapping shards) is taken whole from the partial that finished it
+    most recently, with ties going to the first path in sorted order. Subjects
+    are written in code order, so the same partials always produce the same
+    output. Given the lease queue the workers shared, subjects it marks
+    failed are reported and left out as well. A subject is only completed
+    in the sink once all of its uploads succeeded. Returns the chosen
+    partial for each merged subject.
+    """
+    failed = queue.failed() if queue else {}
+    for subject_code, error in failed.items():
+        log.warning(f"{subject_code} failed in the lease queue and is not merged: {error}")
+    sources = [SqliteSink(path) for path in sorted(paths)]
+    try:
+        chosen: Dict[str, Tuple[float, int]] = {}
+        stored = set()
+        for index, source in enumerate(sources):
+            for subject_code, finished_at in source.finished_subjects().items():
+                if subject_code in failed:
+                    continue
+                if subject_code not in chosen or finished_at > chosen[subject_code][0]:
+                    chosen[subject_code] = (finished_at, index)
+            stored.update(source.subject_timestamps())
+        for subject_code in sorted(stored - set(chosen) - set(failed)):
+            log.warning(f"{subject_code} was not finished in any partial and is not merged")
+
+        merged = {}
+        for subject_code in sorted(chosen):
+            source = sources[chosen[subject_code][1]]
+            try:
+                ok = True
+                for courses in source.iter_courses(subject_code):
+                    log.info(f"Merging {len(courses)} {subject_code} courses from {source.path}")
+                    ok = sink.upload_courses(courses) is not False and ok
+            except Exception as e:
+                log.error(f"Error merging {subject_code}: {e}")
+                ok = False
+            if not ok:
+                log.error(f"Merging {subject_code} from {source.path} failed, not completing it")
+                continue
+            sink.complete_subject(subject_code)
+            merged[subject_code] = source.path
+        return merged
+    finally:
+        for source in sources:
+            source.close()
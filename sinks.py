@@ -0,0 +1,287 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+class Sink:
+    """Destination for scraped courses.
+
+    Scrapers call upload_courses() once per results page with the course
+    dicts produced by extract_course_data, and close() once at the end.
+    upload_courses() returns False when some records could not be written.
+    complete_subject() follows the last page of a subject that was scraped
+    in full during this run, and complete_resumed_subject() the last page of
+    one whose earlier pages were stored by an interrupted run. Sinks that set thread_safe may receive concurrent upload_courses() calls
+    from the pipeline's upload workers.
+    """
+    thread_safe = False
+
+    def upload_courses(self, courses: List[Dict]) -> bool:
+        raise NotImplementedError
+
+    def complete_subject(self, subject_code: str) -> None:
+        pass
+
+    def complete_resumed_subject(self, subject_code: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class AirtableSink(Sink):
+    """Airtable storage, optionally syncing incrementally (see airtable_sync)."""
+
+    def __init__(self, airtable=None, incremental: bool = False, delete_missing: bool = False):
+        from airtable_integration import AirtableManager
+
+        self.airtable = airtable or AirtableManager()
+        self.sync = None
+        if incremental:
+            from airtable_sync import IncrementalSync
+
+            self.sync = IncrementalSync(self.airtable, delete_missing=delete_missing)
+            self.sync.load_index()
+
+    @property
+    def thread_safe(self) -> bool:
+        # The manager's rate limiter is shared across threads; the sync's diff state is not
+        return self.sync is None
+
+    def upload_courses(self, courses: List[Dict]) -> bool:
+        return (self.sync or self.airtable).upload_courses(courses)
+
+    def complete_subject(self, subject_code: str) -> None:
+        if self.sync:
+            self.sync.complete_subject(subject_code)
+
+    def close(self) -> None:
+        if self.sync:
+            self.sync.finish()
+
+
+class MultiSink(Sink):
+    """Fan each page out to several sinks; one failing sink doesn't stop the others."""
+
+    def __init__(self, sinks: List[Sink]):
+        self.sinks = sinks
+
+    @property
+    def thread_safe(self) -> bool:
+        return all(getattr(sink, 'thread_safe', False) for sink in self.sinks)
+
+    def upload_courses(self, courses: List[Dict]) -> bool:
+        ok = True
+        for sink in self.sinks:
+            try:
+                ok = sink.upload_courses(courses) is not False and ok
+            except Exception as e:
+                log.error(f"Error writing to {type(sink).__name__}: {e}")
+                log.exception("Stack trace:")
+                ok = False
+        return ok
+
+    def complete_subject(self, subject_code: str) -> None:
+        for sink in self.sinks:
+            sink.complete_subject(subject_code)
+
+    def complete_resumed_subject(self, subject_code: str) -> None:
+        for sink in self.sinks:
+            sink.complete_resumed_subject(subject_code)
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY,
+    subject_code TEXT NOT NULL,
+    number TEXT NOT NULL,
+    name TEXT,
+    units TEXT,
+    UNIQUE (subject_code, number)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY,
+    course_id INTEGER NOT NULL REFERENCES courses(id),
+    section_id TEXT NOT NULL,
+    meeting_type TEXT,
+    days TEXT,
+    time TEXT,
+    building TEXT,
+    room TEXT,
+    instructor TEXT,
+    available INTEGER,
+    seat_limit INTEGER,
+    scraped_at REAL,
+    UNIQUE (course_id, section_id)
+);
+CREATE TABLE IF NOT EXISTS finished_subjects (
+    subject_code TEXT PRIMARY KEY,
+    finished_at REAL NOT NULL
+);
+-- The UNIQUE constraints already index courses by subject_code and sections by course_id
+CREATE INDEX IF NOT EXISTS idx_sections_instructor ON sections (instructor);
+CREATE INDEX IF NOT EXISTS idx_sections_building ON sections (building);
+CREATE INDEX IF NOT EXISTS idx_sections_schedule ON sections (days, time);
+"""
+
+UPSERT_COURSE = """
+INSERT INTO courses (subject_code, number, name, units) VALUES (?, ?, ?, ?)
+ON CONFLICT (subject_code, number) DO UPDATE SET name = excluded.name, units = excluded.units
+"""
+
+UPSERT_SECTION = """
+INSERT INTO sections (course_id, section_id, meeting_type, days, time, building, room,
+                      instructor, available, seat_limit, scraped_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (course_id, section_id) DO UPDATE SET
+    meeting_type = excluded.meeting_type, days = excluded.days, time = excluded.time,
+    building = excluded.building, room = excluded.room, instructor = excluded.instructor,
+    available = excluded.available, seat_limit = excluded.seat_limit, scraped_at = excluded.scraped_at
+"""
+
+
+class SqliteSink(Sink):
+    """Local SQLite storage with normalized course/section tables.
+
+    Every upload_courses() call is one transaction of executemany upserts,
+    so re-scraping a subject updates rows in place. complete_subject() then
+    deletes the subject's sections this run didn't write and records the
+    subject as finished, unless one of its pages failed. The database runs in WAL mode, letting readers query while
+    a scrape is writing.
+    """
+    thread_safe = True
+
+    def __init__(self, path: str = 'courses.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.subjects_failed: set = set()
+
+    def _course_ids(self, courses: List[Dict]) -> Dict:
+        subject_codes = sorted({course.get('subject_code', 'N/A') for course in courses})
+        placeholders = ','.join('?' * len(subject_codes))
+        rows = self.conn.execute(
+            f"SELECT id, subject_code, number FROM courses WHERE subject_code IN ({placeholders})", subject_codes)
+        return {(subject_code, number): course_id for course_id, subject_code, number in rows}
+
+    def upload_courses(self, courses: List[Dict]) -> bool:
+        if not courses:
+            return True
+        scraped_at = time.time()
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(UPSERT_COURSE, [
+                    (course.get('subject_code', 'N/A'), course['number'], course['name'],
+                     course.get('units', 'N/A'))
+                    for course in courses
+                ])
+                course_ids = self._course_ids(courses)
+                self.conn.executemany(UPSERT_SECTION, [
+                    (course_ids[(course.get('subject_code', 'N/A'), course['number'])], section['sectionId'],
+                     section['meetingType'], section['days'], section['time'], section['building'],
+                     section['room'], section['instructor'], section.get('available', 0),
+                     section.get('limit', 0), scraped_at)
+                    for course in courses for section in course['sections']
+                ])
+        except Exception:
+            self.subjects_failed.update(course.get('subject_code', 'N/A') for course in courses)
+            raise
+        log.info(f"Stored {len(courses)} courses in {self.path}")
+        return True
+
+    def complete_subject(self, subject_code: str) -> None:
+        """Delete sections (and then empty courses) of a fully scraped subject that this run didn't write."""
+        if subject_code in self.subjects_failed:
+            log.warning(f"Not pruning {subject_code}: some of its pages failed to store")
+            return
+        with self._lock, self.conn:
+            self._record_finished(subject_code)
+            sections = self.conn.execute(
+                "DELETE FROM sections WHERE scraped_at < ? AND course_id IN "
+                "(SELECT id FROM courses WHERE subject_code = ?)", (self.started, subject_code)).rowcount
+            courses = self.conn.execute(
+                "DELETE FROM courses WHERE subject_code = ? AND NOT EXISTS "
+                "(SELECT 1 FROM sections s WHERE s.course_id = courses.id)", (subject_code,)).rowcount
+        if sections or courses:
+            log.info(f"Pruned {sections} sections and {courses} courses of {subject_code} no longer listed")
+
+    def complete_resumed_subject(self, subject_code: str) -> None:
+        # Earlier pages were written before this run started, so nothing is pruned
+        if subject_code not in self.subjects_failed:
+            with self._lock, self.conn:
+                self._record_finished(subject_code)
+
+    def _record_finished(self, subject_code: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO finished_subjects (subject_code, finished_at) VALUES (?, ?)",
+                          (subject_code, time.time()))
+
+    def finished_subjects(self) -> Dict[str, float]:
+        """Subjects stored in full, with the time they were finished."""
+        with self._lock:
+            return dict(self.conn.execute("SELECT subject_code, finished_at FROM finished_subjects"))
+
+    def subject_timestamps(self) -> Dict[str, float]:
+        """Latest scrape time of every stored subject."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT c.subject_code, MAX(s.scraped_at) FROM courses c JOIN sections s ON s.course_id = c.id "
+                "GROUP BY c.subject_code").fetchall()
+        return dict(rows)
+
+    def iter_courses(self, subject_code: Optional[str] = None) -> Iterator[List[Dict]]:
+        """Yield stored courses one subject at a time, in the dict shape scrapers produce."""
+        query = """
+            SELECT c.subject_code, c.number, c.name, c.units, s.section_id, s.meeting_type, s.days,
+                   s.time, s.building, s.room, s.instructor, s.available, s.seat_limit
+            FROM courses c JOIN sections s ON s.course_id = c.id
+        """
+        params = ()
+        if subject_code:
+            query += " WHERE c.subject_code = ?"
+            params = (subject_code,)
+        query += " ORDER BY c.subject_code, c.id, s.id"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        courses, current_subject, current = [], None, None
+        for (subject, number, name, units, section_id, meeting_type, days, time_, building, room,
+             instructor, available, limit) in rows:
+            if subject != current_subject and courses:
+                yield courses
+                courses = []
+            current_subject = subject
+            if current is None or (current['subject_code'], current['number']) != (subject, number):
+                current = {'name': name, 'number': number, 'units': units, 'subject_code': subject, 'sections': []}
+                courses.append(current)
+            current['sections'].append({
+                'sectionId': section_id, 'meetingType': meeting_type, 'days': days, 'time': time_,
+                'building': building, 'room': room, 'instructor': instructor,
+                'available': available, 'limit': limit,
+            })
+        if courses:
+            yield courses
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def sync_sqlite(source: SqliteSink, sink: Sink, subject_code: Optional[str] = None) -> None:
+    """Copy courses stored in SQLite to another sink, one subject per upload."""
+    for courses in source.iter_courses(subject_code):
+        log.info(f"Syncing {len(courses)} {courses[0]['subject_code']} courses")
+        if sink.upload_courses(courses) is not False:
+            sink.complete_subject(courses[0]['subject_code'])
@@ -0,0 +1,432 @@
+import re
+from html import unescape
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+# Elements that never have children
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+UNITS_RE = re.compile(r'\(\s*(\d+)\s*Units\)')
+INT_RE = re.compile(r'^\s*([+-]?\d+)')
+# Subject heading rows of multi-subject results, e.g. "Anthropology (ANTH)" or "African American Studies (AAS )"
+SUBJECT_HEADING_RE = re.compile(r'\(\s*([A-Z0-9]+)\s*\)$')
+# Page-level checks that don't need a tree: the NoClasses cell (up to where it ends) and link hrefs
+NO_CLASSES_RE = re.compile(r'<td\b[^>]*\bclass\s*=\s*["\']?[^"\'>]*\bNoClasses\b[^>]*>(.*?)(?:</td|<td\b|</tr|$)',
+                           re.IGNORECASE | re.DOTALL)
+LINK_HREF_RE = re.compile(r'<a\b[^>]*?\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]*>')
+
+
+class Node:
+    """Minimal DOM element used to query saved or fetched result pages."""
+    __slots__ = ('tag', 'attrs', 'children', 'parent')
+
+    def __init__(self, tag: str, attrs: Dict[str, str], parent: Optional['Node'] = None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+
+    @property
+    def classes(self) -> List[str]:
+        return self.attrs.get('class', '').split()
+
+    def has_class(self, name: str) -> bool:
+        return name in self.classes
+
+    def iter(self, tag: str = None):
+        """Yield all descendant elements (document order), optionally filtered by tag."""
+        stack = list(reversed(self.children))
+        while stack:
+            child = stack.pop()
+            if isinstance(child, Node):
+                if tag is None or child.tag == tag:
+                    yield child
+                stack.extend(reversed(child.children))
+
+    def find(self, tag: str = None, cls: str = None) -> Optional['Node']:
+        for node in self.iter(tag):
+            if cls is None or node.has_class(cls):
+                return node
+        return None
+
+    def element_children(self, tag: str = None) -> List['Node']:
+        return [c for c in self.children if isinstance(c, Node) and (tag is None or c.tag == tag)]
+
+    def text(self) -> str:
+        """Equivalent of the DOM textContent property."""
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            else:
+                stack.extend(reversed(node.children))
+        return ''.join(parts)
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node('#document', {})
+        self.stack = [self.root]
+
+    def _close_until(self, tags, stop=('table',)):
+        # Close implicitly terminated cells/rows, but never leave the enclosing table
+        for i in range(len(self.stack) - 1, 0, -1):
+            tag = self.stack[i].tag
+            if tag in stop:
+                return
+            if tag in tags:
+                del self.stack[i:]
+                return
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('td', 'th'):
+            self._close_until(('td', 'th'), stop=('table', 'tr'))
+        elif tag == 'tr':
+            self._close_until(('tr',))
+        elif tag == 'option':
+            self._close_until(('option',), stop=('select',))
+
+        parent = self.stack[-1]
+        node = Node(tag, {k: (v if v is not None else '') for k, v in attrs}, parent)
+        parent.children.append(node)
+        if tag not in VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        parent = self.stack[-1]
+        parent.children.append(Node(tag, {k: (v if v is not None else '') for k, v in attrs}, parent))
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+
+def parse_html(html: str) -> Node:
+    """Parse an HTML document into a Node tree."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def clean_text(text: str) -> str:
+    """Collapse whitespace the same way the in-browser extractor does."""
+    return ' '.join(text.split())
+
+
+def parse_int(text: str) -> int:
+    """Mimic JavaScript parseInt(text) || 0."""
+    match = INT_RE.match(text)
+    return int(match.group(1)) if match else 0
+
+
+def _course_rows(doc: Node) -> List[Node]:
+    rows = []
+    for table in doc.iter('table'):
+        if table.has_class('tbrdr'):
+            rows.extend(table.iter('tr'))
+    return rows
+
+
+def _parse_course_header(row: Node, subject_code: str) -> Optional[Dict]:
+    cells = row.element_children('td')
+    number_cell = cells[1] if len(cells) > 1 and cells[1].has_class('crsheader') else None
+    name_cell = None
+    for cell in row.iter('td'):
+        if cell.has_class('crsheader'):
+            name_cell = cell.find('span', 'boldtxt')
+            if name_cell:
+                break
+    if not (number_cell and name_cell):
+        return None
+    units = UNITS_RE.search(row.text())
+    return {
+        'name': name_cell.text().strip(),
+        'number': number_cell.text().strip(),
+        'units': units.group(1) if units else '',
+        'subject_code': subject_code,
+        'sections': [],
+    }
+
+
+def parse_enrollment_cells(available_cell: Node, limit_cell: Node) -> Tuple[int, int]:
+    """Return (available, limit) from the two enrollment cells of a section row."""
+    full_marker = available_cell.find(cls='ertext')
+    if full_marker and full_marker.text().strip() == 'FULL':
+        return 0, parse_int(limit_cell.text().strip())
+    return parse_int(available_cell.text().strip()), parse_int(limit_cell.text().strip())
+
+
+def _parse_section_row(row: Node) -> Optional[Dict]:
+    cells = list(row.iter('td'))
+    if len(cells) < 13:
+        return None
+
+    meeting_span = cells[3].find('span')
+    meeting_type = (meeting_span.attrs.get('title') if meeting_span else None) or cells[3].text().strip()
+    available, limit = parse_enrollment_cells(cells[10], cells[11])
+
+    section = {
+        'sectionId': cells[4].text(),
+        'meetingType': meeting_type,
+        'days': cells[5].text(),
+        'time': cells[6].text(),
+        'building': cells[7].text(),
+        'room': cells[8].text(),
+        'instructor': cells[9].text(),
+        'available': available,
+        'limit': limit,
+    }
+    for key, value in section.items():
+        if isinstance(value, str):
+            section[key] = clean_text(value) or 'N/A'
+    return section
+
+
+def parse_subject_heading(text: str) -> Optional[str]:
+    """Return the subject code of a results heading such as 'Anthropology (ANTH)'."""
+    match = SUBJECT_HEADING_RE.search(text.strip())
+    return match.group(1) if match else None
+
+
+def _parse_courses(html: str, subject_code: str, follow_headings: bool) -> Tuple[List[Dict], str]:
+    doc = parse_html(html)
+    courses = []
+    current_course = None
+
+    for row in _course_rows(doc):
+        if row.find('td') is None:
+            continue
+
+        if row.find('td', 'crsheader'):
+            if current_course and current_course['sections']:
+                courses.append(current_course)
+            current_course = _parse_course_header(row, subject_code) or current_course
+            continue
+
+        if row.has_class('sectxt'):
+            if current_course:
+                section = _parse_section_row(row)
+                if section:
+                    current_course['sections'].append(section)
+            continue
+
+        if follow_headings:
+            heading = row.find('span', 'centeralign')
+            code = parse_subject_heading(heading.text()) if heading else None
+            if code:
+                # Sections after a new heading never belong to the previous subject's course
+                if current_course and current_course['sections']:
+                    courses.append(current_course)
+                current_course = None
+                subject_code = code
+
+    if current_course and current_course['sections']:
+        courses.append(current_course)
+
+    return courses, subject_code
+
+
+def parse_courses(html: str, subject_code: str = '') -> List[Dict]:
+    """Parse a results page into the same course dicts as extract_course_data."""
+    return _parse_courses(html, subject_code, follow_headings=False)[0]
+
+
+def parse_batch_page(html: str, subject_code: str = '') -> Tuple[List[Dict], str]:
+    """Parse a page of a multi-subject search, taking each course's subject from the headings.
+
+    `subject_code` is the subject in effect at the top of the page (the one
+    the previous page ended with). Returns the courses and the subject in
+    effect at the bottom of the page, to pass in for the next page.
+    """
+    return _parse_courses(html, subject_code, follow_headings=True)
+
+
+def has_no_classes(html: str) -> bool:
+    """Check for the "No classes found" cell shown for empty subjects.
+
+    A regex scan rather than a tree, so checking a page costs a fraction of parsing it.
+    """
+    if 'NoClasses' not in html:
+        return False
+    match = NO_CLASSES_RE.search(html)
+    return bool(match and 'No classes found' in unescape(TAG_RE.sub('', match.group(1))))
+
+
+def find_page_link(html: str, page_number: int) -> Optional[str]:
+    """Return the href of the link to the given results page, if present (a regex scan, like has_no_classes)."""
+    needle = f'page={page_number}'
+    if needle not in html:
+        return None
+    for match in LINK_HREF_RE.finditer(html):
+        href = unescape(next(group for group in match.groups() if group is not None))
+        if needle in href:
+            return href
+    return None
+
+
+def page_info(html: str, page_number: int) -> Dict:
+    """The "No classes found" flag and the href of the next page's link for a results page."""
+    return {'no_classes': has_no_classes(html), 'next_href': find_page_link(html, page_number + 1)}
+
+
+def parse_subjects(html: str) -> List[Dict]:
+    """Read the subject options the same way get_all_subjects does."""
+    doc = parse_html(html)
+    for select in doc.iter('select'):
+        if select.attrs.get('name') == 'selectedSubjects':
+            subjects = []
+            for option in select.iter('option'):
+                text = option.text().strip()
+                value = option.attrs.get('value', option.text())
+                if text and value:
+                    subjects.append({'value': value, 'text': text})
+            return subjects
+    return []
+
+
+def parse_search_form(html: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Return (action, default fields) of the form holding the subject selector.
+
+    Fields mirror what a browser would submit without user input: hidden and
+    text inputs, checked checkboxes/radios and selected options.
+    """
+    doc = parse_html(html)
+    for form in doc.iter('form'):
+        selects = [s for s in form.iter('select') if s.attrs.get('name') == 'selectedSubjects']
+        if not selects:
+            continue
+
+        fields = []
+        for node in form.iter():
+            name = node.attrs.get('name')
+            if not name or name == 'selectedSubjects':
+                continue
+            if node.tag == 'input':
+                kind = node.attrs.get('type', 'text').lower()
+                if kind in ('submit', 'button', 'image', 'reset', 'file'):
+                    continue
+                if kind in ('checkbox', 'radio') and 'checked' not in node.attrs:
+                    continue
+                fields.append((name, node.attrs.get('value', 'on' if kind in ('checkbox', 'radio') else '')))
+            elif node.tag == 'select':
+                options = list(node.iter('option'))
+                chosen = [o for o in options if 'selected' in o.attrs]
+                if not chosen and options and 'multiple' not in node.attrs:
+                    chosen = options[:1]
+                for option in chosen:
+                    fields.append((name, option.attrs.get('value', option.text().strip())))
+            elif node.tag == 'textarea':
+                fields.append((name, node.text()))
+        return form.attrs.get('action', ''), fields
+
+    return '', []
+
+
+class _EnrollmentParser(HTMLParser):
+    """Streaming pass that keeps only what the seat columns need.
+
+    Unlike parse_courses it builds no tree: it collects text for the course
+    number cell of header rows and cells 4, 10 and 11 of section rows, plus
+    whether cell 10 holds the .ertext FULL marker. Tokenizing the page is
+    most of the cost, so this is only modestly cheaper than parse_courses.
+    """
+
+    # Course number in header rows; sectionId, available and limit in section rows
+    KEPT_CELLS = (1, 4, 10, 11)
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.table_depth = 0
+        self.row = None
+        self.cell = None
+        self.ertext_depth = 0
+        self.current_course = None
+        self.seats = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            if self.table_depth or 'tbrdr' in (dict(attrs).get('class') or '').split():
+                self.table_depth += 1
+            return
+        if not self.table_depth:
+            return
+
+        if tag == 'tr':
+            self._end_row()
+            self.row = {'classes': (dict(attrs).get('class') or '').split(), 'cells': [], 'header': False}
+        elif tag == 'td' and self.row is not None:
+            classes = (dict(attrs).get('class') or '').split()
+            if 'crsheader' in classes:
+                self.row['header'] = True
+            index = len(self.row['cells'])
+            self.cell = {'text': [], 'full': [], 'keep': index in self.KEPT_CELLS}
+            self.row['cells'].append(self.cell)
+        elif self.cell is not None:
+            if self.ertext_depth:
+                self.ertext_depth += 1
+            elif 'ertext' in (dict(attrs).get('class') or '').split():
+                self.ertext_depth = 1
+
+    def handle_endtag(self, tag):
+        if not self.table_depth:
+            return
+        if tag == 'table':
+            self._end_row()
+            self.table_depth -= 1
+        elif tag == 'tr':
+            self._end_row()
+        elif tag == 'td':
+            self.cell = None
+            self.ertext_depth = 0
+        elif self.ertext_depth:
+            self.ertext_depth -= 1
+
+    def handle_data(self, data):
+        cell = self.cell
+        if cell is None or not cell['keep']:
+            return
+        cell['text'].append(data)
+        if self.ertext_depth:
+            cell['full'].append(data)
+
+    def _end_row(self):
+        row, self.row, self.cell = self.row, None, None
+        if not row or not row['cells']:
+            return
+        cells = row['cells']
+        if row['header']:
+            self.current_course = ''.join(cells[1]['text']).strip() if len(cells) > 1 else None
+            return
+        if 'sectxt' not in row['classes'] or self.current_course is None or len(cells) < 13:
+            return
+
+        available_cell, limit_cell = cells[10], cells[11]
+        limit = parse_int(''.join(limit_cell['text']).strip())
+        if ''.join(available_cell['full']).strip() == 'FULL':
+            available = 0
+        else:
+            available = parse_int(''.join(available_cell['text']).strip())
+        section_id = clean_text(''.join(cells[4]['text'])) or 'N/A'
+        self.seats[(self.current_course, section_id)] = (available, limit)
+
+
+def parse_seats(html: str) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """Map (course number, sectionId) to (available, limit) for a results page."""
+    parser = _EnrollmentParser()
+    parser.feed(html)
+    parser.close()
+    parser._end_row()
+    return parser.seats
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fixture_server import FixtureServer  # noqa: E402
+
+
+@pytest.fixture
+def unthrottled():
+    """Lift the politeness rate limit for requests to the local fixture server."""
+    from politeness import DEFAULT_REQUESTS_PER_SECOND, scheduler
+
+    scheduler.configure(requests_per_second=None)
+    yield scheduler
+    scheduler.configure(requests_per_second=DEFAULT_REQUESTS_PER_SECOND)
+
+
+@pytest.fixture
+def fixture_server(unthrottled):
+    """The benchmark corpus served as a local stand-in for act.ucsd.edu."""
+    with FixtureServer() as server:
+        yield server
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from checkpoint import CheckpointJournal, complete_subject, subject_code_of, upload_page
+
+
+class ListSink:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.pages = []
+        self.completed = []
+        self.resumed = []
+
+    def upload_courses(self, courses):
+        self.pages.append(courses)
+        return not self.fail
+
+    def complete_subject(self, subject_code):
+        self.completed.append(subject_code)
+
+    def complete_resumed_subject(self, subject_code):
+        self.resumed.append(subject_code)
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / 'journal.jsonl')
+
+
+def test_subject_code_of():
+    assert subject_code_of({'value': 'AAS', 'text': 'AAS - African American Studies'}) == 'AAS'
+
+
+def test_subject_is_done_once_every_page_is_uploaded(journal_path):
+    journal = CheckpointJournal(journal_path)
+    journal.record_page('ANTH', 1, True)
+    journal.record_page('ANTH', 2, False)
+    journal.finish_subject('ANTH', 2)
+    assert not journal.is_subject_done('ANTH')
+    journal.record_page('ANTH', 2, True)
+    assert journal.is_subject_done('ANTH')
+    journal.close()
+
+
+def test_resume_skips_finished_subjects_and_uploaded_pages(journal_path):
+    journal = CheckpointJournal(journal_path)
+    journal.record_page('AAS', 1, True)
+    journal.finish_subject('AAS', 1)
+    journal.record_page('ANTH', 1, True)
+    journal.record_page('ANTH', 2, False)
+    journal.close()
+
+    journal = CheckpointJournal(journal_path, resume=True)
+    subjects = [{'value': code, 'text': f'{code} - Name'} for code in ('AAS', 'ANTH')]
+    assert journal.pending(subjects) == subjects[1:]
+    assert journal.is_page_uploaded('ANTH', 1)
+    assert not journal.is_page_uploaded('ANTH', 2)
+    journal.close()
+
+
+def test_resume_after_truncated_line(journal_path):
+    journal = CheckpointJournal(journal_path)
+    journal.record_page('ANTH', 1, True)
+    journal.close()
+    with open(journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"subject":"ANTH","page":2,"sta')
+
+    journal = CheckpointJournal(journal_path, resume=True)
+    assert journal.pages == {'ANTH': {1: True}}
+    journal.record_page('ANTH', 2, True)
+    journal.finish_subject('ANTH', 2)
+    journal.close()
+
+    journal = CheckpointJournal(journal_path, resume=True)
+    assert journal.pages == {'ANTH': {1: True, 2: True}}
+    assert journal.is_subject_done('ANTH')
+    journal.close()
+    with open(journal_path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line)['status'] for line in lines[2:]] == ['uploaded', 'done']
+
+
+def test_upload_page_skips_pages_uploaded_before(journal_path):
+    journal = CheckpointJournal(journal_path)
+    journal.record_page('ANTH', 1, True)
+    journal.close()
+
+    journal = CheckpointJournal(journal_path, resume=True)
+    sink = ListSink()
+    assert upload_page(sink, [{'number': '1', 'sections': []}], 'ANTH', 1, journal)
+    assert upload_page(sink, [{'number': '2', 'sections': []}], 'ANTH', 2, journal)
+    assert sink.pages == [[{'number': '2', 'sections': []}]]
+
+    # The sink only saw part of the subject, so it is told the subject was resumed
+    journal.finish_subject('ANTH', 2)
+    complete_subject(sink, 'ANTH', journal)
+    assert (sink.completed, sink.resumed) == ([], ['ANTH'])
+    journal.close()
+
+
+def test_failed_upload_keeps_subject_pending(journal_path):
+    journal = CheckpointJournal(journal_path)
+    assert not upload_page(ListSink(fail=True), [{'number': '1', 'sections': []}], 'AAS', 1, journal)
+    journal.finish_subject('AAS', 1)
+    assert not journal.is_subject_done('AAS')
+    journal.close()
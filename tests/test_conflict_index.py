@@ -0,0 +1,93 @@
+from itertools import combinations, product
+
+import pytest
+
+from fixture_server import read_fixture
+from schedule import meeting_intervals
+from soc_parser import parse_courses
+
+conflict_index = pytest.importorskip('conflict_index')
+ConflictIndex, enrollment_options = conflict_index.ConflictIndex, conflict_index.enrollment_options
+
+PAGES = [('AAS_1.html', 'AAS'), ('ANAR_1.html', 'ANAR'), ('ANTH_1.html', 'ANTH'), ('ANTH_2.html', 'ANTH'),
+         ('ANTH_3.html', 'ANTH')]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return ConflictIndex.from_courses(course for name, code in PAGES
+                                      for course in parse_courses(read_fixture(name), code))
+
+
+def overlaps(first, second) -> bool:
+    """Brute force: does any meeting of one option overlap any meeting of the other?"""
+    intervals = [interval for section in second for interval in meeting_intervals(section.days, section.time)]
+    return any(start < other_end and other_start < end
+               for section in first for start, end in meeting_intervals(section.days, section.time)
+               for other_start, other_end in intervals)
+
+
+def brute_force(index, courses, open_only):
+    per_course = []
+    for key in courses:
+        options = [index.options[row] for row in index.course_rows[key]]
+        if open_only:
+            options = [option for option in options if option and option[-1].available > 0]
+        per_course.append(options)
+    return [schedule for schedule in product(*per_course)
+            if not any(overlaps(a, b) for a, b in combinations(schedule, 2))]
+
+
+def section_ids(schedules):
+    return sorted(tuple(tuple(section.section_id for section in option) for option in schedule)
+                  for schedule in schedules)
+
+
+def course_sets(index):
+    keys = sorted(index.course_rows)
+    anth = [key for key in keys if key[0] == 'ANTH']
+    return [list(pair) for pair in combinations(keys[:8], 2)] + [anth[i:i + 3] for i in range(0, len(anth) - 3, 2)]
+
+
+@pytest.mark.parametrize('open_only', [False, True])
+def test_combinations_match_brute_force(index, open_only):
+    pruned = 0
+    for courses in course_sets(index):
+        expected = brute_force(index, courses, open_only)
+        assert section_ids(index.combinations(courses, open_only=open_only)) == section_ids(expected), courses
+        pruned += len(list(product(*(index.course_rows[key] for key in courses)))) - len(expected)
+    # The corpus has clashes, so the comparison covers rejected schedules as well
+    assert pruned > 0
+
+
+def busy_option(index, key):
+    subject_code, number, section_id = key
+    return next((section,) for row in index.course_rows[(subject_code, number)]
+                for section in index.options[row] if section.section_id == section_id)
+
+
+def test_combinations_respect_busy_sections_and_limit(index):
+    courses = next(courses for courses in course_sets(index) if len(brute_force(index, courses, False)) > 1)
+    schedules = brute_force(index, courses, open_only=False)
+    # A section of another course that rules out some, but not all, of the schedules
+    for busy_key in index.section_masks:
+        if busy_key[:2] in courses:
+            continue
+        expected = [schedule for schedule in schedules
+                    if not any(overlaps(option, busy_option(index, busy_key)) for option in schedule)]
+        if 0 < len(expected) < len(schedules):
+            break
+    else:
+        pytest.fail("No section in the corpus clashes with part of the schedules")
+
+    found = index.combinations(courses, sections=[busy_key], open_only=False)
+    assert section_ids(found) == section_ids(expected)
+    assert len(index.combinations(courses, sections=[busy_key], open_only=False, limit=1)) == 1
+
+
+def test_enrollment_options_pair_the_lecture_with_each_section():
+    from catalog import Catalog
+
+    course = Catalog(parse_courses(read_fixture('ANTH_1.html'), 'ANTH')).find('ANTH', '1')
+    options = [tuple(section.section_id for section in option) for option in enrollment_options(course)]
+    assert options == [('A00', 'A01'), ('A00', 'A02'), ('A00', 'A03'), ('A00', 'A04')]
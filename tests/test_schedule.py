@@ -0,0 +1,55 @@
+import pytest
+
+from schedule import MINUTES_PER_DAY, meeting_intervals, meeting_mask, parse_days, parse_time_range
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('MWF', (0, 2, 4)),
+    ('TuTh', (1, 3)),
+    ('M', (0,)),
+    ('SaSu', (5, 6)),
+    ('ThTu', (1, 3)),
+    (' MW ', (0, 2)),
+])
+def test_parse_days(text, expected):
+    assert parse_days(text) == expected
+
+
+@pytest.mark.parametrize('text', ['TBA', '', None, 'M 12/14/2024', 'MX', 'mwf'])
+def test_parse_days_without_weekly_pattern(text):
+    assert parse_days(text) is None
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('11:00a-12:20p', (660, 740)),
+    ('12:00p-12:50p', (720, 770)),
+    ('12:00a-12:50a', (0, 50)),
+    ('11:00a-12:00p', (660, 720)),
+    ('9:00a-9:50a', (540, 590)),
+    ('5:00p-7:50p', (1020, 1190)),
+    ('2:00 pm - 3:20 pm', (840, 920)),
+])
+def test_parse_time_range(text, expected):
+    assert parse_time_range(text) == expected
+
+
+@pytest.mark.parametrize('text', ['TBA', '', None, '12:00p-12:00p', '1:00p-12:00p', '8:00a'])
+def test_parse_time_range_without_fixed_time(text):
+    assert parse_time_range(text) is None
+
+
+def test_meeting_intervals():
+    assert meeting_intervals('TuTh', '12:00p-12:50p') == [
+        (MINUTES_PER_DAY + 720, MINUTES_PER_DAY + 770),
+        (3 * MINUTES_PER_DAY + 720, 3 * MINUTES_PER_DAY + 770),
+    ]
+    assert meeting_intervals('TBA', '10:00a-10:50a') == []
+    assert meeting_intervals('MWF', 'TBA') == []
+
+
+def test_meeting_mask_conflicts():
+    assert meeting_mask('MWF', '10:00a-10:50a') & meeting_mask('M', '10:30a-11:20a')
+    # Back to back, on another day, or without a fixed time: no conflict
+    assert not meeting_mask('MWF', '10:00a-10:50a') & meeting_mask('MWF', '10:50a-11:40a')
+    assert not meeting_mask('MWF', '10:00a-10:50a') & meeting_mask('TuTh', '10:00a-10:50a')
+    assert meeting_mask('TBA', 'TBA') == 0
@@ -0,0 +1,130 @@
+from types import SimpleNamespace
+
+import pytest
+
+import sharding
+from sharding import LeaseQueue, ShardAssignment, merge_partials, parse_shard
+from sinks import SqliteSink
+
+SUBJECTS = [
+    {'value': 'AAS', 'text': 'AAS - African American Studies'},
+    {'value': 'ANAR', 'text': 'ANAR - Anthropological Archaeology'},
+    {'value': 'ANTH', 'text': 'ANTH - Anthropology'},
+]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the lease queue."""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(sharding, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / 'queue.db')
+
+
+def lease_queue(path, worker_id, **options):
+    queue = LeaseQueue(path, worker_id, lease_seconds=60, **options)
+    queue.seed(SUBJECTS)
+    return queue
+
+
+def test_parse_shard():
+    assert parse_shard('1/4') == (1, 4)
+    for text in ('4/4', '-1/4', '1', 'a/b', '0/0'):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_shards_partition_the_subjects():
+    shards = [ShardAssignment(i, 2).assign(SUBJECTS) for i in range(2)]
+    assert shards == [[SUBJECTS[0], SUBJECTS[2]], [SUBJECTS[1]]]
+
+
+def test_claim_hands_out_each_subject_once_in_order(queue_path, clock):
+    first, second = lease_queue(queue_path, 'w1'), lease_queue(queue_path, 'w2')
+    assert first.claim() == SUBJECTS[0]
+    assert second.claim() == SUBJECTS[1]
+    assert first.claim() == SUBJECTS[2]
+    assert second.claim() is None
+    assert first.counts() == {'leased': 3}
+
+
+def test_expired_lease_is_claimed_again(queue_path, clock):
+    first, second = lease_queue(queue_path, 'w1'), lease_queue(queue_path, 'w2')
+    assert first.claim() == SUBJECTS[0]
+    clock.value += 59
+    assert second.claim() == SUBJECTS[1]
+    clock.value += 2
+    assert second.claim() == SUBJECTS[0]
+
+    # The first worker's completion no longer counts; the new holder's does
+    first.complete('AAS')
+    assert second.counts() == {'leased': 2, 'pending': 1}
+    second.complete('AAS')
+    assert second.counts() == {'done': 1, 'leased': 1, 'pending': 1}
+
+
+def test_renew_extends_the_lease(queue_path, clock):
+    first, second = lease_queue(queue_path, 'w1'), lease_queue(queue_path, 'w2')
+    first.claim()
+    clock.value += 40
+    first.renew('AAS')
+    clock.value += 40
+    assert second.claim() == SUBJECTS[1]
+
+
+def test_renew_raises_once_the_lease_was_lost(queue_path, clock):
+    first, second = lease_queue(queue_path, 'w1'), lease_queue(queue_path, 'w2')
+    first.claim()
+    clock.value += 61
+    assert second.claim() == SUBJECTS[0]
+    with pytest.raises(RuntimeError):
+        first.renew('AAS')
+
+
+def test_failed_subject_is_retried_until_max_attempts(queue_path, clock):
+    queue = lease_queue(queue_path, 'w1', max_attempts=2)
+    assert queue.claim() == SUBJECTS[0]
+    queue.fail('AAS', RuntimeError('first'))
+    assert queue.claim() == SUBJECTS[0]
+    queue.fail('AAS', RuntimeError('second'))
+    assert queue.failed() == {'AAS': 'second'}
+    assert queue.claim() == SUBJECTS[1]
+
+
+def test_lease_expiring_on_the_last_attempt_fails_the_subject(queue_path, clock):
+    first, second = lease_queue(queue_path, 'w1', max_attempts=1), lease_queue(queue_path, 'w2', max_attempts=1)
+    first.claim()
+    clock.value += 61
+    assert second.claim() == SUBJECTS[1]
+    assert second.failed() == {'AAS': 'lease expired on the last attempt'}
+
+
+def course(subject_code, number, *section_ids):
+    return {'name': f'Course {number}', 'number': number, 'units': '4', 'subject_code': subject_code,
+            'sections': [{'sectionId': section_id, 'meetingType': 'LE', 'days': 'MWF', 'time': '9:00a-9:50a',
+                          'building': 'CENTR', 'room': '101', 'instructor': 'Staff', 'available': 1, 'limit': 10}
+                         for section_id in section_ids]}
+
+
+def test_merge_partials_takes_only_finished_subjects(tmp_path):
+    first, second, target = (str(tmp_path / name) for name in ('part-0.db', 'part-1.db', 'merged.db'))
+    partial = SqliteSink(first)
+    partial.upload_courses([course('AAS', '10', 'A00')])
+    partial.complete_subject('AAS')
+    partial.upload_courses([course('ANTH', '1', 'A00')])  # never finished
+    partial.close()
+    partial = SqliteSink(second)
+    partial.upload_courses([course('AAS', '10', 'A00', 'A01')])
+    partial.complete_subject('AAS')
+    partial.close()
+
+    sink = SqliteSink(target)
+    assert merge_partials([second, first], sink) == {'AAS': second}
+    assert [[s['sectionId'] for c in courses for s in c['sections']] for courses in sink.iter_courses()] == [
+        ['A00', 'A01']]
+    sink.close()
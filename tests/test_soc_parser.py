@@ -0,0 +1,89 @@
+import pytest
+
+from fixture_server import render_results_page, read_fixture
+from soc_parser import find_page_link, has_no_classes, parse_batch_page, parse_courses
+
+# (fixture, subject code) of every results page in the corpus
+RESULT_PAGES = [
+    ('AAS_1.html', 'AAS'),
+    ('ANAR_1.html', 'ANAR'),
+    ('ANTH_1.html', 'ANTH'),
+    ('ANTH_2.html', 'ANTH'),
+    ('ANTH_3.html', 'ANTH'),
+]
+
+
+@pytest.fixture(scope='module')
+def browser_page():
+    sync_api = pytest.importorskip('playwright.sync_api')
+    with sync_api.sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=True)
+        except Exception as e:
+            pytest.skip(f"Chromium is not available: {e}")
+        try:
+            yield browser.new_page()
+        finally:
+            browser.close()
+
+
+@pytest.mark.parametrize('name, code', RESULT_PAGES)
+def test_parse_courses_matches_extract_course_data(browser_page, name, code):
+    import tritonscraper
+
+    html = read_fixture(name)
+    browser_page.set_content(html)
+    assert parse_courses(html, code) == tritonscraper.extract_course_data(browser_page, code)
+
+
+@pytest.mark.parametrize('name, code', RESULT_PAGES)
+def test_parse_courses_matches_lean_extractor(browser_page, name, code):
+    import tritonscraper
+
+    html = read_fixture(name)
+    browser_page.set_content(html)
+    courses, has_next, no_classes = tritonscraper.extract_course_data_lean(browser_page, code)
+    assert courses == parse_courses(html, code)
+    assert has_next == (find_page_link(html, 2) is not None)
+    assert not no_classes
+
+
+def test_parse_courses_reads_full_sections_as_zero_available():
+    courses = parse_courses(read_fixture('ANTH_2.html'), 'ANTH')
+    section = next(s for c in courses if c['number'] == '113' for s in c['sections'] if s['sectionId'] == 'A01')
+    assert (section['available'], section['limit']) == (0, 35)
+
+
+def test_parse_batch_page_splits_subjects():
+    subjects = ['AAS', 'ANAR', 'ANTH']
+    expected = [course for name, code in RESULT_PAGES for course in parse_courses(read_fixture(name), code)]
+
+    courses, subject_code, page = [], '', 1
+    while True:
+        html = render_results_page(subjects, page)
+        page_courses, subject_code = parse_batch_page(html, subject_code)
+        courses.extend(page_courses)
+        if not find_page_link(html, page + 1):
+            break
+        page += 1
+
+    assert page == len(RESULT_PAGES)
+    assert subject_code == 'ANTH'
+    assert courses == expected
+
+
+def test_parse_batch_page_carries_subject_across_pages():
+    # The last ANTH page has no heading of its own; its courses belong to the subject passed in
+    html = render_results_page(['AAS', 'ANTH'], 4)
+    courses, subject_code = parse_batch_page(html, 'ANTH')
+    assert courses and all(course['subject_code'] == 'ANTH' for course in courses)
+    assert subject_code == 'ANTH'
+
+
+def test_no_classes_and_page_links():
+    assert has_no_classes(read_fixture('NOCLASSES.html'))
+    assert not any(has_no_classes(read_fixture(name)) for name, _ in RESULT_PAGES)
+    anth = read_fixture('ANTH_1.html')
+    assert find_page_link(anth, 2) is not None
+    assert find_page_link(anth, 4) is None
+    assert find_page_link(read_fixture('AAS_1.html'), 2) is None
@@ -0,0 +1,67 @@
+import pytest
+
+import fixture_server as corpus
+from watch import SeatWatcher, WatchTarget, diff_seats
+
+FULL_CELL = '<span class="ertext">FULL</span><br>\nWaitlist(39)'
+
+
+class CollectingSink:
+    def __init__(self):
+        self.events = []
+
+    def push(self, events):
+        self.events.extend(events)
+
+
+def test_watch_target_parse():
+    assert WatchTarget.parse('anth:101:a01') == WatchTarget('ANTH', '101', 'A01')
+    assert WatchTarget.parse('CSE:100') == WatchTarget('CSE', '100')
+    for text in ('CSE', 'CSE::A01', 'CSE:100:A01:X'):
+        with pytest.raises(ValueError):
+            WatchTarget.parse(text)
+
+
+def test_diff_seats():
+    old = {('1', 'A01'): (0, 30), ('1', 'A02'): (5, 30), ('1', 'A03'): (5, 30),
+           ('1', 'A04'): (5, 30), ('1', 'A05'): (5, 30)}
+    new = {('1', 'A01'): (2, 30), ('1', 'A02'): (0, 30), ('1', 'A03'): (4, 30),
+           ('1', 'A04'): (5, 40), ('1', 'A05'): (5, 30), ('1', 'A06'): (9, 30)}
+    events = diff_seats('ANTH', old, new, timestamp=1.0)
+    assert [(event.section_id, event.kind) for event in events] == [
+        ('A01', 'opened'), ('A02', 'filled'), ('A03', 'seats_changed'), ('A04', 'limit_changed')]
+    assert (events[0].previous_available, events[0].available) == (0, 2)
+
+
+def test_diff_seats_reports_seat_and_limit_changes_together():
+    events = diff_seats('ANTH', {('1', 'A01'): (0, 30)}, {('1', 'A01'): (3, 35)}, timestamp=1.0)
+    assert [event.kind for event in events] == ['opened', 'limit_changed']
+
+
+def test_seat_watcher_polls_only_the_pages_with_targets(fixture_server, monkeypatch):
+    sink = CollectingSink()
+    watcher = SeatWatcher([WatchTarget.parse('ANTH:113:A01')], sinks=[sink], url=fixture_server.url)
+    watcher.load_subjects()
+    try:
+        assert watcher.poll() == []
+        assert watcher.pages['ANTH'] == {2}
+
+        read_fixture = corpus.read_fixture
+
+        def seats_opened(name):
+            html = read_fixture(name)
+            return html.replace(FULL_CELL, '3', 1) if name == 'ANTH_2.html' else html
+
+        monkeypatch.setattr(corpus, 'read_fixture', seats_opened)
+        requests_before = fixture_server.requests
+        events = watcher.poll()
+    finally:
+        for scraper in watcher.scrapers.values():
+            scraper.close()
+
+    assert [(e.course_number, e.section_id, e.kind, e.previous_available, e.available) for e in events] == [
+        ('113', 'A01', 'opened', 0, 3)]
+    assert sink.events == events
+    # The search and page 2 only, not the three pages of a full scan
+    assert fixture_server.requests - requests_before == 2
+
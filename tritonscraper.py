@@ -1,195 +1,358 @@
-import os
+from __future__ import annotations
+
+import argparse
 import logging
-import re
 import time
-import agentql
-from agentql.ext.playwright.sync_api import Page
-from playwright.sync_api import sync_playwright, TimeoutError
-from dotenv import load_dotenv
-from airtable_integration import AirtableManager
-from typing import List, Dict
+from checkpoint import (DEFAULT_JOURNAL_PATH, CheckpointJournal, complete_subject, fail_subject, subject_code_of,
+                        upload_page)
+from metrics import PeriodicExporter, metrics
+from politeness import (DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_RETRIES, DEFAULT_REQUESTS_PER_SECOND,
+                        parse_rate_limit, scheduler)
+from typing import TYPE_CHECKING, List, Dict, Optional, Union
+
+# Like Playwright, requests (http_scraper), asyncio and the storage backends are
+# imported by the functions that use them, so importing this module stays cheap
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
+    from http_scraper import HttpScraper
+    from sinks import Sink
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-os.environ["AGENTQL_API_KEY"] = os.getenv("AGENTQL_API_KEY")
-
 # Set the URL to the desired website
 URL = "https://act.ucsd.edu/scheduleOfClasses/scheduleOfClassesStudent.htm"
 
-def extract_course_data(page: Page, subject_code: str = '') -> List[Dict]:
-    """Extract course data from the page."""
-    try:
-        # Get HTML content for debugging
-        html_content = page.content()
-        log.info("Page HTML content length: %d", len(html_content))
-        log.info("Looking for table.tbrdr...")
-        
-        # Check if table exists
-        table_exists = page.evaluate("""() => {
-            const table = document.querySelector('table.tbrdr');
-            return table !== null;
-        }""")
-        log.info("Table exists: %s", table_exists)
-        
-        if not table_exists:
-            log.error("Could not find course table on page")
-            return []
-        
-        # Get row count
-        row_count = page.evaluate("""() => {
-            const rows = document.querySelectorAll('table.tbrdr tr');
-            return rows.length;
-        }""")
-        log.info("Found %d rows in table", row_count)
+# Any of these means a search has rendered (results, empty subject or error message)
+RESULTS_READY_SELECTOR = 'table.tbrdr, td.NoClasses, div.centeralign'
+
+# Requests aborted in fast mode: nothing the scraper reads depends on them
+BLOCKED_RESOURCE_TYPES = {'image', 'font', 'stylesheet', 'media'}
+BLOCKED_URL_PARTS = ('google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'siteimprove')
+
+# Waits the default navigation pays per subject that fast mode skips, for an estimate only:
+# two time.sleep(2) calls plus >= 500 ms of network quiet per networkidle wait
+FIXED_SLEEP_SECONDS = 4.0
+NETWORKIDLE_QUIET_SECONDS = 0.5
+
+class RequestBlocker:
+    """Abort static asset and analytics requests on a page, counting what was blocked."""
+    
+    def __init__(self):
+        self.blocked = 0
+    
+    def install(self, page: Page):
+        page.route('**/*', self._handle)
+    
+    def _handle(self, route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(part in request.url for part in BLOCKED_URL_PARTS):
+            self.blocked += 1
+            route.abort()
+        else:
+            route.continue_()
+
+def estimated_wait_savings(page_count: int, lean: bool = False) -> float:
+    """Estimated lower bound on the fixed waiting the default mode spends on one subject.
+    
+    Derived from the constants above, not measured; compare the ready_wait
+    timers of a default and a fast run for the real difference.
+    """
+    # Two waits in select_subject_and_search, one more before the default extraction, one per extra page
+    networkidle_waits = (2 if lean else 3) + max(page_count - 1, 0)
+    return FIXED_SLEEP_SECONDS + networkidle_waits * NETWORKIDLE_QUIET_SECONDS
+
+# In-page extractor used by extract_course_data
+EXTRACT_COURSES_JS = """(subject_code) => {
+    const courses = [];
+    let currentCourse = null;
+    
+    // Get all rows from the table
+    const rows = Array.from(document.querySelectorAll('table.tbrdr tr'));
+    
+    for (let row of rows) {
+        // Skip header rows and empty rows
+        if (!row.querySelector('td')) {
+            continue;
+        }
         
-        courses = page.evaluate("""(subject_code) => {
-            const courses = [];
-            let currentCourse = null;
+        // Check if this is a course header row (contains course name and number)
+        const isCourseHeader = row.querySelector('td.crsheader');
+        if (isCourseHeader) {
+            // If we have a previous course with sections, add it to our list
+            if (currentCourse && currentCourse.sections.length > 0) {
+                courses.push(currentCourse);
+            }
             
-            // Get all rows from the table
-            const rows = Array.from(document.querySelectorAll('table.tbrdr tr'));
-            console.log('Processing ' + rows.length + ' rows');
+            // Extract course name and number
+            const courseNumberCell = row.querySelector('td.crsheader:nth-child(2)');
+            const courseNameCell = row.querySelector('td.crsheader span.boldtxt');
+            const unitsText = row.textContent.match(/\\(\\s*(\\d+)\\s*Units\\)/);
             
-            for (let row of rows) {
-                // Skip header rows and empty rows
-                if (!row.querySelector('td')) {
-                    console.log('Skipping row without td');
-                    continue;
-                }
+            // Only create a new course if we have both a number and a name
+            if (courseNumberCell && courseNameCell) {
+                currentCourse = {
+                    name: courseNameCell.textContent.trim(),
+                    number: courseNumberCell.textContent.trim(),
+                    units: unitsText ? unitsText[1] : '',
+                    subject_code: subject_code,
+                    sections: []
+                };
+            }
+            continue;
+        }
+        
+        // Check if this is a section row (contains class details)
+        const isSection = row.classList.contains('sectxt');
+        if (isSection && currentCourse) {
+            const cells = Array.from(row.querySelectorAll('td'));
+            if (cells.length >= 13) {  
+                // Extract meeting type
+                const meetingType = cells[3].querySelector('span')?.getAttribute('title') || cells[3].textContent.trim();
                 
-                // Check if this is a course header row (contains course name and number)
-                const isCourseHeader = row.querySelector('td.crsheader');
-                if (isCourseHeader) {
-                    console.log('Found course header row');
-                    
-                    // If we have a previous course with sections, add it to our list
-                    if (currentCourse && currentCourse.sections.length > 0) {
-                        console.log('Adding course: ' + currentCourse.number);
-                        courses.push(currentCourse);
-                    }
-                    
-                    // Extract course name and number
-                    const courseNumberCell = row.querySelector('td.crsheader:nth-child(2)');
-                    const courseNameCell = row.querySelector('td.crsheader span.boldtxt');
-                    const unitsText = row.textContent.match(/\\(\\s*(\\d+)\\s*Units\\)/);
-                    
-                    // Only create a new course if we have both a number and a name
-                    if (courseNumberCell && courseNameCell) {
-                        console.log('Creating new course: ' + courseNumberCell.textContent.trim());
-                        currentCourse = {
-                            name: courseNameCell.textContent.trim(),
-                            number: courseNumberCell.textContent.trim(),
-                            units: unitsText ? unitsText[1] : '',
-                            subject_code: subject_code,
-                            sections: []
-                        };
-                    } else {
-                        console.log('Missing course number or name');
-                    }
-                    continue;
+                // Parse fields in correct order
+                const sectionId = cells[4].textContent.trim(); // Section ID is in the "Days" column
+                const days = cells[5].textContent.trim(); // Days is in the "Time" column
+                const time = cells[6].textContent.trim(); // Time is in the "Building" column
+                const building = cells[7].textContent.trim(); // Building is in the "Room" column
+                const room = cells[8].textContent.trim(); // Room is in the "Instructor" column
+                const instructor = cells[9] ? cells[9].textContent.trim() : 'N/A'; // Instructor is in the next column
+                
+                // Extract seat counts from the enrollment cells
+                const availableCell = cells[10];
+                const limitCell = cells[11];
+                
+                let available = 0, limit = 0;
+                
+                // Check if section is full
+                const fullText = availableCell.querySelector('.ertext')?.textContent.trim();
+                if (fullText === 'FULL') {
+                    available = 0;
+                    limit = parseInt(limitCell.textContent.trim()) || 0;
+                } else {
+                    // Try to get direct numbers
+                    const availText = availableCell.textContent.trim();
+                    const limitText = limitCell.textContent.trim();
+                    available = parseInt(availText) || 0;
+                    limit = parseInt(limitText) || 0;
                 }
                 
-                // Check if this is a section row (contains class details)
-                const isSection = row.classList.contains('sectxt');
-                if (isSection && currentCourse) {
-                    console.log('Found section row for course: ' + currentCourse.number);
-                    const cells = Array.from(row.querySelectorAll('td'));
-                    if (cells.length >= 13) {  
-                        // Extract meeting type
-                        const meetingType = cells[3].querySelector('span')?.getAttribute('title') || cells[3].textContent.trim();
-                        
-                        // Parse fields in correct order
-                        const sectionId = cells[4].textContent.trim(); // Section ID is in the "Days" column
-                        const days = cells[5].textContent.trim(); // Days is in the "Time" column
-                        const time = cells[6].textContent.trim(); // Time is in the "Building" column
-                        const building = cells[7].textContent.trim(); // Building is in the "Room" column
-                        const room = cells[8].textContent.trim(); // Room is in the "Instructor" column
-                        const instructor = cells[9] ? cells[9].textContent.trim() : 'N/A'; // Instructor is in the next column
-                        
-                        // Extract seat counts from the enrollment cells
-                        const availableCell = cells[10];
-                        const limitCell = cells[11];
-                        
-                        let available = 0, limit = 0;
-                        
-                        // Check if section is full
-                        const fullText = availableCell.querySelector('.ertext')?.textContent.trim();
-                        if (fullText === 'FULL') {
-                            available = 0;
-                            limit = parseInt(limitCell.textContent.trim()) || 0;
-                        } else {
-                            // Try to get direct numbers
-                            const availText = availableCell.textContent.trim();
-                            const limitText = limitCell.textContent.trim();
-                            available = parseInt(availText) || 0;
-                            limit = parseInt(limitText) || 0;
-                        }
-                        
-                        const section = {
-                            sectionId,
-                            meetingType,
-                            days,
-                            time,
-                            building,
-                            room,
-                            instructor,
-                            available,
-                            limit
-                        };
-                        
-                        // Clean up the data
-                        for (const key in section) {
-                            if (typeof section[key] === 'string') {
-                                section[key] = section[key].replace(/\\s+/g, ' ').trim();
-                                if (!section[key]) {
-                                    section[key] = 'N/A';
-                                }
-                            }
+                const section = {
+                    sectionId,
+                    meetingType,
+                    days,
+                    time,
+                    building,
+                    room,
+                    instructor,
+                    available,
+                    limit
+                };
+                
+                // Clean up the data
+                for (const key in section) {
+                    if (typeof section[key] === 'string') {
+                        section[key] = section[key].replace(/\\s+/g, ' ').trim();
+                        if (!section[key]) {
+                            section[key] = 'N/A';
                         }
-                        
-                        currentCourse.sections.push(section);
-                        console.log('Added section: ' + section.sectionId);
-                    } else {
-                        console.log('Section row has insufficient cells: ' + cells.length);
                     }
                 }
+                
+                currentCourse.sections.push(section);
             }
-            
-            // Don't forget to add the last course if it has sections
-            if (currentCourse && currentCourse.sections.length > 0) {
-                console.log('Adding final course: ' + currentCourse.number);
-                courses.push(currentCourse);
+        }
+    }
+    
+    // Don't forget to add the last course if it has sections
+    if (currentCourse && currentCourse.sections.length > 0) {
+        courses.push(currentCourse);
+    }
+    
+    return courses;
+}"""
+
+# Lean variant: one round trip per results page returning compact rows.
+# Course headers are [0, number, name, units] ([0] if incomplete) and
+# sections [1, sectionId, meetingType, days, time, building, room, instructor, available, limit].
+EXTRACT_ROWS_JS = """(nextPage) => {
+    const result = {table: false, noClasses: false, hasNext: false, rows: []};
+    const noClasses = document.querySelector('td.NoClasses');
+    result.noClasses = !!(noClasses && noClasses.textContent.includes('No classes found'));
+    result.hasNext = document.querySelector(`a[href*='page=${nextPage}']`) !== null;
+    if (!document.querySelector('table.tbrdr')) {
+        return result;
+    }
+    result.table = true;
+    
+    const clean = (text) => text.replace(/\\s+/g, ' ').trim() || 'N/A';
+    const rows = result.rows;
+    for (const row of document.querySelectorAll('table.tbrdr tr')) {
+        if (!row.querySelector('td')) {
+            continue;
+        }
+        
+        if (row.querySelector('td.crsheader')) {
+            const numberCell = row.querySelector('td.crsheader:nth-child(2)');
+            const nameCell = row.querySelector('td.crsheader span.boldtxt');
+            const units = row.textContent.match(/\\(\\s*(\\d+)\\s*Units\\)/);
+            rows.push(numberCell && nameCell
+                ? [0, numberCell.textContent.trim(), nameCell.textContent.trim(), units ? units[1] : '']
+                : [0]);
+            continue;
+        }
+        
+        if (!row.classList.contains('sectxt')) {
+            // Subject headings separate the subjects of a multi-subject search
+            const heading = row.querySelector('span.centeralign');
+            const code = heading && heading.textContent.trim().match(/\\(\\s*([A-Z0-9]+)\\s*\\)$/);
+            if (code) {
+                rows.push([2, code[1]]);
             }
-            
-            console.log('Returning ' + courses.length + ' courses');
-            return courses;
-        }""", subject_code)
-        
-        # Log the extracted data in a more structured way
-        log.info(f"\nExtracted {len(courses)} courses:")
-        for course in courses:
-            log.info(f"\nCourse: {course['number']} - {course['name']}")
-            log.info(f"  Units: {course.get('units', 'N/A')}")
-            log.info(f"  Total Sections: {len(course['sections'])}")
-            for section in course['sections']:
-                log.info(f"    Section {section['sectionId']}:")
-                log.info(f"      Type: {section['meetingType']}")
-                log.info(f"      Days: {section['days']}")
-                log.info(f"      Time: {section['time']}")
-                log.info(f"      Location: {section['building']} {section['room']}")
-                log.info(f"      Instructor: {section['instructor']}")
-                log.info(f"      Seats: {section['available']}/{section['limit']} available")
+            continue;
+        }
+        const cells = row.querySelectorAll('td');
+        if (cells.length < 13) {
+            continue;
+        }
+        
+        const meetingType = cells[3].querySelector('span')?.getAttribute('title') || cells[3].textContent.trim();
+        const fullText = cells[10].querySelector('.ertext')?.textContent.trim();
+        const available = fullText === 'FULL' ? 0 : (parseInt(cells[10].textContent.trim()) || 0);
+        const limit = parseInt(cells[11].textContent.trim()) || 0;
+        rows.push([
+            1,
+            clean(cells[4].textContent),
+            clean(meetingType),
+            clean(cells[5].textContent),
+            clean(cells[6].textContent),
+            clean(cells[7].textContent),
+            clean(cells[8].textContent),
+            clean(cells[9].textContent),
+            available,
+            limit
+        ]);
+    }
+    return result;
+}"""
+
+SECTION_ROW_KEYS = ('sectionId', 'meetingType', 'days', 'time', 'building', 'room', 'instructor', 'available', 'limit')
+
+def _rows_to_courses(rows: List[List], subject_code: str, follow_headings: bool):
+    courses = []
+    current_course = None
+    for row in rows:
+        if row[0] == 0:
+            if current_course and current_course['sections']:
+                courses.append(current_course)
+            if len(row) > 1:
+                current_course = {
+                    'name': row[2],
+                    'number': row[1],
+                    'units': row[3],
+                    'subject_code': subject_code,
+                    'sections': []
+                }
+        elif row[0] == 1:
+            if current_course:
+                current_course['sections'].append(dict(zip(SECTION_ROW_KEYS, row[1:])))
+        elif follow_headings:
+            if current_course and current_course['sections']:
+                courses.append(current_course)
+            current_course = None
+            subject_code = row[1]
+    
+    if current_course and current_course['sections']:
+        courses.append(current_course)
+    return courses, subject_code
+
+def rows_to_courses(rows: List[List], subject_code: str = '') -> List[Dict]:
+    """Rebuild extract_course_data's course dicts from EXTRACT_ROWS_JS rows."""
+    return _rows_to_courses(rows, subject_code, follow_headings=False)[0]
+
+def rows_to_batch_courses(rows: List[List], subject_code: str = ''):
+    """Like rows_to_courses for a multi-subject search (see soc_parser.parse_batch_page).
+    
+    Returns (courses, subject code in effect after the last row).
+    """
+    return _rows_to_courses(rows, subject_code, follow_headings=True)
+
+def check_results_rendered(result: Dict, subject_code: str = ''):
+    """Raise unless an EXTRACT_ROWS_JS result saw a results table or the "No classes found" cell.
+    
+    Anything else (an error page, the search form again) must not be recorded as an empty subject.
+    """
+    if not result['table'] and not result['noClasses']:
+        raise RuntimeError(f"Search for {subject_code or 'subject'} rendered no results table")
+
+def extract_course_data_lean(page: Page, subject_code: str = '', next_page: int = 2):
+    """Extract a results page in a single evaluate call.
+    
+    Returns (courses, has_next_page, no_classes) without serializing the document.
+    """
+    result = page.evaluate(EXTRACT_ROWS_JS, next_page)
+    check_results_rendered(result, subject_code)
+    return rows_to_courses(result['rows'], subject_code), result['hasNext'], result['noClasses']
+
+def extract_course_data(page: Page, subject_code: str = '', debug_capture: bool = False) -> List[Dict]:
+    """Extract course data from the page.
+    
+    Raises if the page has no results table or can't be read, so a broken
+    page is never recorded as an empty one. The document is only serialized
+    (and the rows counted) when debug_capture is set and DEBUG is enabled.
+    """
+    try:
+        debug = log.isEnabledFor(logging.DEBUG)
+        capture = debug_capture and debug
+        if capture:
+            log.debug("Page HTML content length: %d", len(page.content()))
+            log.debug("Looking for table.tbrdr...")
+        
+        # Check if table exists
+        table_exists = page.evaluate("""() => {
+            const table = document.querySelector('table.tbrdr');
+            return table !== null;
+        }""")
+        
+        if not table_exists:
+            raise RuntimeError(f"Could not find course table on {subject_code or 'the'} results page")
+        
+        if capture:
+            # Get row count
+            row_count = page.evaluate("""() => {
+                const rows = document.querySelectorAll('table.tbrdr tr');
+                return rows.length;
+            }""")
+            log.debug("Found %d rows in table", row_count)
+        
+        courses = page.evaluate(EXTRACT_COURSES_JS, subject_code)
+        
+        if debug:
+            # Log the extracted data in a more structured way
+            log.debug(f"Extracted {len(courses)} courses:")
+            log_courses(courses)
         
         return courses
         
     except Exception as e:
         log.error(f"Error extracting course data: {e}")
-        log.exception("Stack trace:")
-        return []
+        raise
+
+def log_courses(courses: List[Dict]):
+    """Dump every course and section at DEBUG level (callers check the level first)."""
+    for course in courses:
+        log.debug(f"Course: {course['number']} - {course['name']}")
+        log.debug(f"  Units: {course.get('units', 'N/A')}")
+        log.debug(f"  Total Sections: {len(course['sections'])}")
+        for section in course['sections']:
+            log.debug(f"    Section {section['sectionId']}:")
+            log.debug(f"      Type: {section['meetingType']}")
+            log.debug(f"      Days: {section['days']}")
+            log.debug(f"      Time: {section['time']}")
+            log.debug(f"      Location: {section['building']} {section['room']}")
+            log.debug(f"      Instructor: {section['instructor']}")
+            log.debug(f"      Seats: {section['available']}/{section['limit']} available")
 
 def parse_enrollment(cell):
     """Parse enrollment information from a cell."""
@@ -255,155 +418,516 @@ def get_all_subjects(page: Page):
         log.error(f"Error getting subjects: {e}")
         return []
 
-def select_subject_and_search(page: Page, subject_value: str, subject_text: str) -> List[Dict]:
-    """Select a subject and click search."""
-    try:
+def select_subject_and_search(page: Page, subject_value: Union[str, List[str]], subject_text: str,
+                              debug_capture: bool = False, fast: bool = False) -> List[Dict]:
+    """Select a subject (or a list of subjects for a batched search) and click search.
+    
+    In fast mode the fixed sleeps and networkidle waits are replaced by waits
+    for the elements the next step actually needs. The whole search, from
+    loading the form to the results, is one request to the politeness
+    scheduler, so a timeout retries it from the start.
+    """
+    subject_code = subject_text.split(' - ')[0]
+
+    def search():
         # Go back to the main page
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
+        if fast:
+            page.goto(URL, wait_until='domcontentloaded')
+            with metrics.timer('ready_wait', subject_code):
+                page.wait_for_selector("select[name='selectedSubjects']")
+        else:
+            page.goto(URL)
+            with metrics.timer('ready_wait', subject_code):
+                page.wait_for_load_state('networkidle')
         
-        # Log the HTML for debugging
-        html_content = page.content()
-        log.info("Page HTML:")
-        log.info(html_content[:1000])  # First 1000 chars
+        if debug_capture and log.isEnabledFor(logging.DEBUG):
+            # Log the HTML for debugging
+            html_content = page.content()
+            log.debug(f"Page HTML: {html_content[:1000]}")  # First 1000 chars
         
-        # Add a delay to see what's happening
-        time.sleep(2)
+        if not fast:
+            # Add a delay to see what's happening
+            time.sleep(2)
         
         # Select the subject using the correct selector
         subject_selector = page.locator("select[name='selectedSubjects']")
         subject_selector.select_option(subject_value)
         log.info(f"Selected subject: {subject_text}")
         
+        # Click search using the correct selector
+        search_button = page.locator("#socFacSubmit")
+        if fast:
+            with page.expect_navigation(wait_until='domcontentloaded'):
+                search_button.click()
+            log.info("Clicked search button")
+            with metrics.timer('ready_wait', subject_code):
+                page.wait_for_selector(RESULTS_READY_SELECTOR)
+            return
+        
         # Add another delay
         time.sleep(2)
         
-        # Click search using the correct selector
-        search_button = page.locator("#socFacSubmit")
         search_button.click()
         log.info("Clicked search button")
         
         # Wait for results to load
-        page.wait_for_load_state('networkidle')
-        
+        with metrics.timer('ready_wait', subject_code):
+            page.wait_for_load_state('networkidle')
+
+    try:
+        scheduler.call(search, kind='search', subject=subject_code)
     except Exception as e:
+        # Callers must not journal a subject whose search never produced results
         log.error(f"Error in select_subject_and_search: {e}")
+        raise
+
+def _follow_page_link(page: Page, page_number: int, fast: bool, subject_code: str):
+    selector = f"a[href*='page={page_number}']"
+    if fast:
+        with page.expect_navigation(wait_until='domcontentloaded'):
+            page.click(selector)
+    else:
+        page.click(selector)
+        with metrics.timer('ready_wait', subject_code):
+            page.wait_for_load_state('networkidle')
+    with metrics.timer('ready_wait', subject_code):
+        page.wait_for_selector('table.tbrdr', state='visible', timeout=10000)
+
+def go_to_results_page(page: Page, page_number: int, fast: bool = False, subject_code: str = ''):
+    """Follow the pagination link to the given results page and wait for its table."""
+    scheduler.call(_follow_page_link, page, page_number, fast, subject_code, kind='page', subject=subject_code)
+
+def select_test_subjects(subjects: List[Dict]) -> List[Dict]:
+    """Define the subjects to test (up to ANBI)."""
+    test_subjects = []
+    for subject in subjects:
+        subject_text = subject['text']
+        if subject_text.startswith("ANBI"):
+            test_subjects.append(subject)
+            break
+        test_subjects.append(subject)
+    return test_subjects
+
+def scrape_subject_lean(page: Page, subject: Dict, subject_code: str, sink: Sink,
+                        fast: bool = False, journal: Optional[CheckpointJournal] = None, work=None) -> int:
+    """Pagination loop using one extraction round trip per results page.
+    
+    Returns the number of results pages visited. `work` has its lease renewed after every page.
+    """
+    current_page = 1
+    while True:
+        with metrics.timer('extract', subject_code):
+            courses, has_next, no_classes = extract_course_data_lean(page, subject_code, current_page + 1)
+        if no_classes:
+            log.info(f"No classes found for subject: {subject['text']}")
+            upload_page(sink, [], subject_code, current_page, journal)
+            return current_page
+        
+        if courses:
+            log.info(f"Extracted {len(courses)} courses from {subject['text']} page {current_page}")
+        upload_page(sink, courses, subject_code, current_page, journal)
+        if work:
+            work.renew(subject_code)
+        
+        if not has_next:
+            log.info("No more pages, moving to next subject")
+            return current_page
+        current_page += 1
+        log.info(f"Moving to page {current_page}")
+        with metrics.timer('navigate', subject_code):
+            go_to_results_page(page, current_page, fast, subject_code)
+
+def scrape_subject_pages(page: Page, subject: Dict, subject_code: str, sink: Sink,
+                         fast: bool = False, journal: Optional[CheckpointJournal] = None,
+                         debug_capture: bool = False, work=None) -> int:
+    """Default pagination loop for one subject; returns the number of results pages visited."""
+    if not fast:
+        # Wait for page load
+        with metrics.timer('ready_wait', subject_code):
+            page.wait_for_load_state('networkidle')
+    
+    if debug_capture and log.isEnabledFor(logging.DEBUG):
+        # Log current state
+        log.debug(f"Current URL: {page.url}")
+        log.debug(f"Page title: {page.title()}")
+        log.debug(f"Page HTML content length: {len(page.content())}")
+    
+    # Check for "No classes found" message
+    no_results = page.query_selector('td.NoClasses')
+    if no_results and "No classes found" in no_results.text_content():
+        logging.info(f"No classes found for subject: {subject['text']}")
+        upload_page(sink, [], subject_code, 1, journal)
+        return 1
+    if not page.query_selector('table.tbrdr'):
+        raise RuntimeError(f"Search for {subject_code} rendered no results table")
+    
+    # Process all pages for this subject
+    current_page = 1
+    while True:
+        # Extract courses from current page (extract_course_data dumps them at DEBUG level)
+        with metrics.timer('extract', subject_code):
+            courses = extract_course_data(page, subject_code, debug_capture)
+        if courses:
+            logging.info(f"Extracted {len(courses)} courses from {subject['text']} page {current_page}")
+        
+        # Upload to the configured sink(s)
+        upload_page(sink, courses, subject_code, current_page, journal)
+        if work:
+            work.renew(subject_code)
+        
+        # Check for next page link
+        if page.query_selector(f"a[href*='page={current_page + 1}']"):
+            current_page += 1
+            logging.info(f"Moving to page {current_page}")
+            with metrics.timer('navigate', subject_code):
+                go_to_results_page(page, current_page, fast, subject_code)
+        else:
+            logging.info("No more pages, moving to next subject")
+            return current_page
+
+def scrape_courses(page: Page, sink: Sink, lean: bool = False, debug_capture: bool = False,
+                   fast: bool = False, subjects: Optional[List[Dict]] = None,
+                   journal: Optional[CheckpointJournal] = None, batch_size: int = 1, work=None):
+    """Scrape every test subject and upload each results page.
 
-def scrape_courses(page: Page, airtable: AirtableManager):
+    The options match the command line flags described in the README.
+    """
+    blocker = None
+    if fast:
+        blocker = RequestBlocker()
+        blocker.install(page)
     try:
         # Navigate to initial page
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-        
-        # Get all subjects
-        subjects = get_all_subjects(page)
-        subject_count = len(subjects)
-        log.info(f"Found {subject_count} subjects")
-        
-        # Define the subjects to test (up to ANBI)
-        test_subjects = []
-        for subject in subjects:
-            subject_text = subject['text']
-            if subject_text.startswith("ANBI"):
-                test_subjects.append(subject)
-                break
-            test_subjects.append(subject)
+        if fast:
+            scheduler.call(page.goto, URL, wait_until='domcontentloaded', kind='search_page')
+        else:
+            scheduler.call(page.goto, URL, kind='search_page')
+            page.wait_for_load_state('networkidle')
         
+        if subjects is None:
+            # Get all subjects
+            subjects = get_all_subjects(page)
+            subject_count = len(subjects)
+            log.info(f"Found {subject_count} subjects")
+            subjects = select_test_subjects(subjects)
+        
+        test_subjects = subjects
         logging.info(f"Testing {len(test_subjects)} subjects: {', '.join(s['text'] for s in test_subjects)}")
+        # Assign from the full list so every worker cuts the same shares, then drop finished subjects
+        if work:
+            test_subjects = work.assign(test_subjects, journal)
+        elif journal:
+            test_subjects = journal.pending(test_subjects)
+        if batch_size > 1:
+            from batching import scrape_batches_browser
+            test_subjects = scrape_batches_browser(page, sink, test_subjects, batch_size, fast, journal, work)
         
         # Process each subject
         for subject in test_subjects:
             try:
                 logging.info(f"Processing subject: {subject['text']}")
+                started = time.perf_counter()
+                blocked_before = blocker.blocked if blocker else 0
                 
-                # Extract subject code from the text (e.g., "AAS - African American Studies" -> "AAS")
-                subject_code = subject['text'].split(' - ')[0]
+                subject_code = subject_code_of(subject)
+                ready_wait_before = metrics.seconds('ready_wait', subject_code)
                 
                 # Select the subject and search
-                select_subject_and_search(page, subject['value'], subject['text'])
+                with metrics.timer('navigate', subject_code):
+                    select_subject_and_search(page, subject['value'], subject['text'], debug_capture, fast)
                 logging.info(f"Selected subject: {subject['text']}")
                 
-                # Wait for page load
-                page.wait_for_load_state('networkidle')
-                
-                # Log current state
-                current_url = page.url
-                page_title = page.title()
-                html_content = page.content()
-                logging.info(f"Current URL: {current_url}")
-                logging.info(f"Page title: {page_title}")
-                logging.info(f"Page HTML content length: {len(html_content)}")
+                if lean:
+                    page_count = scrape_subject_lean(page, subject, subject_code, sink, fast, journal, work)
+                else:
+                    page_count = scrape_subject_pages(page, subject, subject_code, sink, fast, journal,
+                                                      debug_capture, work)
+                if journal:
+                    journal.finish_subject(subject_code, page_count)
+                complete_subject(sink, subject_code, journal)
+                if work:
+                    work.complete(subject_code)
                 
-                # Check for "No classes found" message
-                no_results = page.query_selector('td.NoClasses')
-                if no_results and "No classes found" in no_results.text_content():
-                    logging.info(f"No classes found for subject: {subject['text']}")
-                    continue
-                
-                # Process all pages for this subject
-                current_page = 1
-                while True:
-                    # Extract courses from current page
-                    courses = extract_course_data(page, subject_code)
-                    if courses:
-                        logging.info(f"\nExtracted {len(courses)} courses from {subject['text']}:")
-                        for course in courses:
-                            logging.info(f"\nCourse: {course['number']} - {course['name']}")
-                            logging.info(f"  Units: {course['units']}")
-                            logging.info(f"  Total Sections: {len(course['sections'])}")
-                            for section in course['sections']:
-                                logging.info(f"    Section {section['sectionId']}:")
-                                logging.info(f"      Type: {section['meetingType']}")
-                                logging.info(f"      Days: {section['days']}")
-                                logging.info(f"      Time: {section['time']}")
-                                logging.info(f"      Location: {section['building']} {section['room']}")
-                                logging.info(f"      Instructor: {section['instructor']}")
-                                logging.info(f"      Seats: {section['available']}/{section['limit']} available")
-                        
-                        # Upload to Airtable
-                        logging.info("\nUploading courses to Airtable...")
-                        airtable.upload_courses(courses)
-                    
-                    # Check for next page link
-                    current_page += 1
-                    next_page_link = page.query_selector(f"a[href*='page={current_page}']")
-                    
-                    if next_page_link:
-                        logging.info(f"Moving to page {current_page}")
-                        next_page_link.click()
-                        page.wait_for_load_state('networkidle')
-                        page.wait_for_selector('table.tbrdr', state='visible', timeout=10000)
-                    else:
-                        logging.info("No more pages, moving to next subject")
-                        break
+                if fast:
+                    ready_wait = metrics.seconds('ready_wait', subject_code) - ready_wait_before
+                    log.info(f"Fast navigation for {subject_code}: {time.perf_counter() - started:.2f}s over "
+                             f"{page_count} page(s), {blocker.blocked - blocked_before} requests blocked, "
+                             f"{ready_wait:.2f}s measured waiting for pages to be ready; the default mode's "
+                             f"fixed waits would add an estimated >= {estimated_wait_savings(page_count, lean):.1f}s")
                 
             except Exception as e:
                 logging.error(f"Error processing subject {subject['text']}: {e}")
                 logging.exception("Stack trace:")
+                fail_subject(journal, work, subject_code_of(subject), e)
                 continue
                 
     except Exception as e:
         logging.error(f"Error in scrape_courses: {e}")
         logging.exception("Stack trace:")
 
-def main():
+def scrape_courses_http(scraper: HttpScraper, sink: Sink, subjects: Optional[List[Dict]] = None,
+                        journal: Optional[CheckpointJournal] = None, batch_size: int = 1, work=None):
+    """Same flow as scrape_courses, but submitting the search form over plain HTTP."""
     try:
-        # Initialize Airtable manager
-        airtable = AirtableManager()
+        if subjects is None:
+            subjects = scraper.get_all_subjects()
+            log.info(f"Found {len(subjects)} subjects")
+            subjects = select_test_subjects(subjects)
         
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-            
-            # Scrape courses
-            scrape_courses(page, airtable)
-            
-            browser.close()
+        test_subjects = subjects
+        log.info(f"Testing {len(test_subjects)} subjects: {', '.join(s['text'] for s in test_subjects)}")
+        if work:
+            test_subjects = work.assign(test_subjects, journal)
+        elif journal:
+            test_subjects = journal.pending(test_subjects)
+        if batch_size > 1:
+            from batching import scrape_batches_http
+            test_subjects = scrape_batches_http(scraper, sink, test_subjects, batch_size, journal, work)
+        
+        for subject in test_subjects:
+            try:
+                log.info(f"Processing subject: {subject['text']}")
+                subject_code = subject_code_of(subject)
+                
+                page_count = 0
+                pages = scraper.iter_result_pages([subject['value']])
+                while True:
+                    with metrics.timer('navigate', subject_code):
+                        item = next(pages, None)
+                    if item is None:
+                        break
+                    page_number, html = item
+                    page_count = page_number
+                    if page_number == 1 and scraper.has_no_classes(html):
+                        log.info(f"No classes found for subject: {subject['text']}")
+                        upload_page(sink, [], subject_code, page_number, journal)
+                        break
+                    
+                    with metrics.timer('extract', subject_code):
+                        courses = scraper.parse_page(html, subject_code)
+                    log.info(f"Extracted {len(courses)} courses from {subject['text']} page {page_number}")
+                    upload_page(sink, courses, subject_code, page_number, journal)
+                    if work:
+                        work.renew(subject_code)
+                if journal:
+                    journal.finish_subject(subject_code, page_count)
+                complete_subject(sink, subject_code, journal)
+                if work:
+                    work.complete(subject_code)
+                
+            except Exception as e:
+                log.error(f"Error processing subject {subject['text']}: {e}")
+                log.exception("Stack trace:")
+                fail_subject(journal, work, subject_code_of(subject), e)
+                continue
+                
+    except Exception as e:
+        log.error(f"Error in scrape_courses_http: {e}")
+        log.exception("Stack trace:")
+
+def parse_args(argv=None):
+    from cache import DEFAULT_CACHE_PATH, DEFAULT_PAGE_TTL
+    from export import DEFAULT_EXPORT_DIR, DEFAULT_TERM
+    from sharding import DEFAULT_LEASE_SECONDS, parse_shard
+
+    parser = argparse.ArgumentParser(description="Scrape UCSD's Schedule of Classes into Airtable or SQLite")
+    parser.add_argument('--engine', choices=['playwright', 'http'], default='playwright',
+                        help="playwright drives a real browser, http submits the search form directly")
+    parser.add_argument('--headless', action='store_true',
+                        help="run the browser without a window (playwright engine)")
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help="number of browser contexts scraping subjects in parallel (playwright engine)")
+    parser.add_argument('--lean', action='store_true',
+                        help="extract each results page in one browser round trip (playwright engine, "
+                             "always on with --concurrency)")
+    parser.add_argument('--fast', action='store_true',
+                        help="wait for page elements instead of fixed delays and block static assets (playwright engine)")
+    parser.add_argument('--debug-capture', action='store_true',
+                        help="serialize and log each search and results page's HTML (DEBUG level, implies --verbose)")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="search up to this many subjects per form submission to start with; the size then "
+                             "adapts to keep each search at a few results pages (1 disables batching)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="run navigation, extraction and uploads as concurrent stages with bounded queues")
+    parser.add_argument('--upload-workers', type=int, default=4, help="upload threads in --pipeline mode")
+    parser.add_argument('--queue-size', type=int, default=8, help="bound on each --pipeline stage queue")
+    parser.add_argument('--sink', action='append', choices=['airtable', 'sqlite', 'jsonl', 'parquet', 'arrow'],
+                        help="where to store results (repeatable, default airtable); jsonl, parquet and arrow "
+                             "export files partitioned by term and subject")
+    parser.add_argument('--sqlite-path', default='courses.db', help="database file for the sqlite sink")
+    parser.add_argument('--export-dir', default=DEFAULT_EXPORT_DIR, help="root directory of the file exports")
+    parser.add_argument('--term', default=DEFAULT_TERM, help="term label to partition the file exports by, e.g. FA24")
+    parser.add_argument('--sync-from-sqlite', metavar='PATH',
+                        help="skip scraping and upload the courses stored in this SQLite database instead")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only write sections that are new or changed since the last Airtable run")
+    parser.add_argument('--delete-missing', action='store_true',
+                        help="with --incremental, delete sections that disappeared from completely scraped subjects")
+    parser.add_argument('--checkpoint', metavar='PATH',
+                        help=f"journal finished subjects and pages to this file (default {DEFAULT_JOURNAL_PATH} "
+                             f"with --resume)")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip subjects and pages the checkpoint journal records as uploaded")
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help="scrape only shard i (0-based) of N, e.g. 0/4 in the first of four processes")
+    parser.add_argument('--lease-queue', metavar='PATH',
+                        help="share subjects with other workers through this SQLite work queue")
+    parser.add_argument('--worker-id', help="name of this worker in the lease queue (default host-pid)")
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="time after which a subject leased by an unresponsive worker is handed out again")
+    parser.add_argument('--merge-partials', nargs='+', metavar='PATH',
+                        help="skip scraping and merge the SQLite partial results of sharded workers into the sink "
+                             "(with --lease-queue, leaving out subjects the queue marks failed)")
+    parser.add_argument('--cache', metavar='PATH', nargs='?', const=DEFAULT_CACHE_PATH,
+                        help=f"keep the subject list and results pages in this on-disk cache "
+                             f"(default {DEFAULT_CACHE_PATH}, http engine)")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_PAGE_TTL, metavar='SECONDS',
+                        help="age after which cached results pages are fetched again")
+    parser.add_argument('--rate-limit', type=parse_rate_limit, default=DEFAULT_REQUESTS_PER_SECOND, metavar='RPS',
+                        help="most requests per second sent to the Schedule of Classes (0 for no limit)")
+    parser.add_argument('--max-inflight', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="ceiling for the adaptive number of concurrent requests")
+    parser.add_argument('--retries', type=int, default=DEFAULT_MAX_RETRIES,
+                        help="times a timed-out or overloaded request is retried with backoff")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="write per-subject timers and counters here at the end of the run "
+                             "(Prometheus text for .prom/.txt, JSON otherwise)")
+    parser.add_argument('--metrics-interval', type=float, metavar='SECONDS',
+                        help="also rewrite the --metrics file every SECONDS during the run")
+    parser.add_argument('--verbose', action='store_true',
+                        help="log every extracted course and section (DEBUG level)")
+    args = parser.parse_args(argv)
+    if args.shard and args.lease_queue:
+        parser.error("--shard and --lease-queue are mutually exclusive")
+    if args.pipeline and args.concurrency > 1:
+        parser.error("--pipeline and --concurrency are mutually exclusive")
+    if args.lease_queue and (args.pipeline or args.concurrency > 1 or args.batch_size > 1):
+        parser.error("--lease-queue claims one subject at a time and can't be combined with "
+                     "--pipeline, --concurrency or --batch-size")
+    return args
+
+def build_sink(args) -> Sink:
+    """Create the sink(s) selected on the command line."""
+    from sinks import AirtableSink, MultiSink, SqliteSink
+
+    sinks = []
+    for name in args.sink or ['airtable']:
+        if name == 'airtable':
+            sinks.append(AirtableSink(incremental=args.incremental, delete_missing=args.delete_missing))
+        elif name == 'sqlite':
+            sinks.append(SqliteSink(args.sqlite_path))
+        else:
+            from export import ExportSink
+            sinks.append(ExportSink(args.export_dir, name, args.term))
+    return sinks[0] if len(sinks) == 1 else MultiSink(sinks)
+
+def main(argv=None):
+    from sharding import LeaseQueue, ShardAssignment, merge_partials
+    from sinks import SqliteSink, sync_sqlite
+
+    args = parse_args(argv)
+    if args.verbose or args.debug_capture:
+        log.setLevel(logging.DEBUG)
+    scheduler.configure(args.rate_limit, args.max_inflight, args.retries)
+    exporter = None
+    if args.metrics:
+        exporter = PeriodicExporter(metrics, args.metrics, args.metrics_interval).start()
+    try:
+        sink = build_sink(args)
+        try:
+            if args.sync_from_sqlite:
+                source = SqliteSink(args.sync_from_sqlite)
+                try:
+                    sync_sqlite(source, sink)
+                finally:
+                    source.close()
+            elif args.merge_partials:
+                queue = LeaseQueue(args.lease_queue) if args.lease_queue else None
+                try:
+                    merge_partials(args.merge_partials, sink, queue)
+                finally:
+                    if queue:
+                        queue.close()
+            else:
+                journal = None
+                if args.checkpoint or args.resume:
+                    journal = CheckpointJournal(args.checkpoint or DEFAULT_JOURNAL_PATH, resume=args.resume)
+                work = None
+                if args.shard:
+                    work = ShardAssignment(*args.shard)
+                elif args.lease_queue:
+                    work = LeaseQueue(args.lease_queue, args.worker_id, args.lease_seconds)
+                try:
+                    run_scrape(args, sink, journal, work)
+                finally:
+                    if journal:
+                        journal.close()
+                    if isinstance(work, LeaseQueue):
+                        log.info(f"Lease queue status: {work.counts()}")
+                        for subject_code, error in work.failed().items():
+                            log.warning(f"{subject_code} failed after {work.max_attempts} attempts: {error}")
+                        work.close()
+        finally:
+            sink.close()
+            metrics.log_summary()
+            if exporter:
+                exporter.stop()
             
     except Exception as e:
         log.error(f"Error in main: {e}")
         log.exception("Stack trace:")
         raise e  # Re-raise to see full traceback
 
+def run_scrape(args, sink: Sink, journal: Optional[CheckpointJournal] = None, work=None):
+    """Run the scrape with the engine selected on the command line."""
+    if args.batch_size > 1 and (args.pipeline or (args.engine == 'playwright' and args.concurrency > 1)):
+        log.warning("--batch-size is not supported with --pipeline or --concurrency, searching one subject at a time")
+    if args.cache and args.engine != 'http':
+        log.warning("--cache only applies to the http engine")
+    if args.engine == 'http':
+        from cache import ResponseCache
+        from http_scraper import HttpScraper
+        cache = ResponseCache(args.cache, args.term, args.cache_ttl) if args.cache else None
+        scraper = HttpScraper(cache=cache)
+        try:
+            if args.pipeline:
+                from pipeline import scrape_courses_http_pipelined
+                scrape_courses_http_pipelined(scraper, sink, queue_size=args.queue_size,
+                                              upload_workers=args.upload_workers, journal=journal, work=work)
+            else:
+                scrape_courses_http(scraper, sink, journal=journal, batch_size=args.batch_size, work=work)
+        finally:
+            scraper.close()
+            if cache:
+                cache.close()
+        return
+    
+    if args.concurrency > 1:
+        import asyncio
+        from concurrent_scraper import scrape_courses_concurrent
+        # The concurrent scraper always extracts lean, so --lean needs no passing on
+        asyncio.run(scrape_courses_concurrent(sink, concurrency=args.concurrency, headless=args.headless,
+                                              fast=args.fast, journal=journal, work=work))
+        return
+    
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=args.headless)
+        page = browser.new_page()
+        
+        if args.pipeline:
+            from pipeline import scrape_courses_pipelined
+            if args.fast:
+                RequestBlocker().install(page)
+            scrape_courses_pipelined(page, sink, fast=args.fast, queue_size=args.queue_size,
+                                     upload_workers=args.upload_workers, journal=journal, work=work)
+        else:
+            # Scrape courses
+            scrape_courses(page, sink, lean=args.lean, debug_capture=args.debug_capture,
+                           fast=args.fast, journal=journal, batch_size=args.batch_size, work=work)
+        
+        browser.close()
+
 if __name__ == "__main__":
     main()
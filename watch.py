@@ -0,0 +1,315 @@
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from checkpoint import subject_code_of
+from http_scraper import HttpScraper
+from soc_parser import parse_seats
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60.0
+DEFAULT_WORKERS = 4
+# A subject with targets still missing is rescanned in full every 2, 4, 8, ... polls, up to this many;
+# one watching whole courses is rescanned this often to pick up new sections on other pages
+MAX_RESCAN_BACKOFF = 16
+
+# (course number, sectionId) -> (available, limit), as returned by parse_seats
+Seats = Dict[Tuple[str, str], Tuple[int, int]]
+
+
+@dataclass(frozen=True)
+class WatchTarget:
+    """A watched course (all of its sections) or a single section."""
+    subject_code: str
+    course_number: str
+    section_id: Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str) -> 'WatchTarget':
+        """Parse 'SUBJ:NUMBER' or 'SUBJ:NUMBER:SECTION', e.g. 'ANTH:101:A01'."""
+        parts = [part.strip() for part in text.split(':')]
+        if len(parts) not in (2, 3) or not all(parts):
+            raise ValueError(f"Invalid watch target {text!r}, expected SUBJ:NUMBER[:SECTION]")
+        return cls(parts[0].upper(), parts[1].upper(), parts[2].upper() if len(parts) == 3 else None)
+
+    def matches(self, key: Tuple[str, str]) -> bool:
+        course_number, section_id = key
+        return course_number == self.course_number and self.section_id in (None, section_id)
+
+
+@dataclass
+class ChangeEvent:
+    kind: str  # 'opened', 'filled', 'limit_changed' or 'seats_changed'
+    subject_code: str
+    course_number: str
+    section_id: str
+    available: int
+    limit: int
+    previous_available: int
+    previous_limit: int
+    timestamp: float
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return self.subject_code, self.course_number, self.section_id
+
+    def __str__(self):
+        return (f"{self.kind}: {self.subject_code} {self.course_number} {self.section_id} "
+                f"{self.previous_available}/{self.previous_limit} -> {self.available}/{self.limit}")
+
+
+def diff_seats(subject_code: str, old: Seats, new: Seats, timestamp: float = None) -> List[ChangeEvent]:
+    """Events for sections present in both snapshots whose seat counts changed."""
+    timestamp = time.time() if timestamp is None else timestamp
+    events = []
+    for key, (available, limit) in new.items():
+        if key not in old:
+            continue
+        previous_available, previous_limit = old[key]
+        kinds = []
+        if previous_available == 0 and available > 0:
+            kinds.append('opened')
+        elif previous_available > 0 and available == 0:
+            kinds.append('filled')
+        elif previous_available != available:
+            kinds.append('seats_changed')
+        if previous_limit != limit:
+            kinds.append('limit_changed')
+        for kind in kinds:
+            events.append(ChangeEvent(kind, subject_code, key[0], key[1], available, limit,
+                                      previous_available, previous_limit, timestamp))
+    return events
+
+
+class LogSink:
+    def push(self, events: List[ChangeEvent]) -> None:
+        for event in events:
+            log.info(f"Seat change {event}")
+
+
+class JsonlEventSink:
+    """Append events to a JSON lines file, flushed after every batch."""
+
+    def __init__(self, path: str):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def push(self, events: List[ChangeEvent]) -> None:
+        for event in events:
+            self.file.write(json.dumps(asdict(event)) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class AirtableSeatSink:
+    """Write only the seat fields of changed sections through an indexed IncrementalSync."""
+
+    def __init__(self, sync):
+        self.sync = sync
+
+    def push(self, events: List[ChangeEvent]) -> None:
+        changes = {}
+        for event in events:
+            changes[event.key] = {'Available Seats': event.available, 'Seat Limit': event.limit}
+        updated = self.sync.update_sections(changes)
+        log.info(f"Pushed {updated} seat updates to Airtable")
+
+
+class SeatWatcher:
+    """Re-poll only the results pages that hold watched sections.
+
+    The first poll of a subject walks all of its pages to learn where the
+    watched sections are; later polls fetch just those pages and keep only
+    the enrollment cells (each page is still tokenized, see parse_seats). A subject is rescanned when a target that was
+    found before disappears from its page. A subject where some target
+    hasn't turned up keeps being scanned in full, but less and less often,
+    and one watching whole courses is rescanned every MAX_RESCAN_BACKOFF
+    polls in case a course gains sections on other pages.
+    """
+
+    def __init__(self, targets: List[WatchTarget], sinks: List = None, interval: float = DEFAULT_INTERVAL,
+                 workers: int = DEFAULT_WORKERS, url: str = None):
+        self.targets_by_subject: Dict[str, List[WatchTarget]] = {}
+        for target in targets:
+            self.targets_by_subject.setdefault(target.subject_code, []).append(target)
+        self.sinks = sinks if sinks is not None else [LogSink()]
+        self.interval = interval
+        self.workers = workers
+        self.url = url
+
+        self.subject_values: Dict[str, str] = {}
+        self.scrapers: Dict[str, HttpScraper] = {}
+        self.pages: Dict[str, Optional[Set[int]]] = {}
+        self.seats: Dict[str, Seats] = {}
+        self.missing: Dict[str, Set[WatchTarget]] = {}
+        self.rescans: Dict[str, int] = {}
+        # Polls left before a subject's next full scan; absent when none is scheduled
+        self.rescan_in: Dict[str, int] = {}
+
+    def _scraper(self, subject_code: str) -> HttpScraper:
+        # One session per subject so subjects can be polled concurrently
+        if subject_code not in self.scrapers:
+            self.scrapers[subject_code] = HttpScraper(url=self.url) if self.url else HttpScraper()
+        return self.scrapers[subject_code]
+
+    def load_subjects(self) -> None:
+        scraper = HttpScraper(url=self.url) if self.url else HttpScraper()
+        try:
+            for subject in scraper.get_all_subjects():
+                self.subject_values[subject_code_of(subject).strip()] = subject['value']
+        finally:
+            scraper.close()
+        for subject_code in self.targets_by_subject:
+            if subject_code not in self.subject_values:
+                log.error(f"Unknown subject {subject_code}, it will not be watched")
+
+    def poll_subject(self, subject_code: str, full_scan: bool = False) -> List[ChangeEvent]:
+        targets = self.targets_by_subject[subject_code]
+        value = self.subject_values[subject_code]
+        scraper = self._scraper(subject_code)
+
+        known_pages = None if full_scan else self.pages.get(subject_code)
+        if known_pages is None:
+            pages = dict(scraper.iter_result_pages([value]))
+        else:
+            pages = scraper.fetch_pages([value], known_pages)
+
+        seats, found_pages = {}, set()
+        for page_number, html in pages.items():
+            if known_pages is not None and page_number not in known_pages:
+                continue
+            page_seats = {key: value for key, value in parse_seats(html).items()
+                          if any(target.matches(key) for target in targets)}
+            if page_seats:
+                found_pages.add(page_number)
+                seats.update(page_seats)
+
+        missing = {target for target in targets if not any(target.matches(key) for key in seats)}
+        if known_pages is not None and missing - self.missing.get(subject_code, set()):
+            log.info(f"Watched sections of {subject_code} moved, rescanning all pages")
+            return self.poll_subject(subject_code, full_scan=True)
+        if known_pages is None:
+            previous = self.missing.get(subject_code, set())
+            for target in missing - previous:
+                log.warning(f"Watched target not found: {target}")
+            self.missing[subject_code] = missing
+            # Nothing to re-poll yet: leave the pages unknown so the next poll scans them all again
+            self.pages[subject_code] = found_pages or None
+            self._schedule_rescan(subject_code, missing, previous)
+
+        events = diff_seats(subject_code, self.seats.get(subject_code, {}), seats)
+        self.seats[subject_code] = seats
+        return events
+
+    def _schedule_rescan(self, subject_code: str, missing: Set[WatchTarget], previous: Set[WatchTarget]) -> None:
+        if missing:
+            # Back off again from the start whenever a missing target turns up
+            scans = 1 if missing < previous else self.rescans.get(subject_code, 0) + 1
+            self.rescans[subject_code] = scans
+            self.rescan_in[subject_code] = min(2 ** scans, MAX_RESCAN_BACKOFF) - 1
+            return
+        self.rescans.pop(subject_code, None)
+        if any(target.section_id is None for target in self.targets_by_subject[subject_code]):
+            self.rescan_in[subject_code] = MAX_RESCAN_BACKOFF - 1
+        else:
+            self.rescan_in.pop(subject_code, None)
+
+    def _push(self, events: List[ChangeEvent]) -> None:
+        for sink in self.sinks:
+            try:
+                sink.push(events)
+            except Exception as e:
+                log.error(f"Error pushing seat changes to {type(sink).__name__}: {e}")
+
+    def poll(self) -> List[ChangeEvent]:
+        """Poll every watched subject, pushing each subject's events as soon as they are known."""
+        subjects = []
+        for code in self.targets_by_subject:
+            if code not in self.subject_values:
+                continue
+            full_scan = False
+            if code in self.rescan_in:
+                if self.rescan_in[code] > 0:
+                    self.rescan_in[code] -= 1
+                    if self.pages.get(code) is None:
+                        # No known pages to poll in between full scans
+                        continue
+                else:
+                    full_scan = True
+            subjects.append((code, full_scan))
+        all_events = []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(subjects) or 1))) as executor:
+            futures = {executor.submit(self.poll_subject, code, full_scan): code for code, full_scan in subjects}
+            for future in as_completed(futures):
+                try:
+                    events = future.result()
+                except Exception as e:
+                    log.error(f"Error polling subject {futures[future]}: {e}")
+                    continue
+                if events:
+                    self._push(events)
+                    all_events.extend(events)
+        return all_events
+
+    def run(self, max_polls: int = None) -> None:
+        if not self.subject_values:
+            self.load_subjects()
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            started = time.monotonic()
+            events = self.poll()
+            polls += 1
+            elapsed = time.monotonic() - started
+            log.info(f"Poll {polls} took {elapsed:.2f}s, {len(events)} changes")
+            if max_polls is not None and polls >= max_polls:
+                break
+            time.sleep(max(0.0, self.interval - elapsed))
+
+    def close(self):
+        for scraper in self.scrapers.values():
+            scraper.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch seat availability of selected courses or sections")
+    parser.add_argument('targets', nargs='+', help="SUBJ:NUMBER or SUBJ:NUMBER:SECTION, e.g. ANTH:101:A01")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="seconds between polls")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="subjects polled in parallel")
+    parser.add_argument('--polls', type=int, help="stop after this many polls")
+    parser.add_argument('--events-file', help="append change events to this JSON lines file")
+    parser.add_argument('--airtable', action='store_true', help="push seat changes to Airtable")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    sinks = [LogSink()]
+    if args.events_file:
+        sinks.append(JsonlEventSink(args.events_file))
+    if args.airtable:
+        from airtable_integration import AirtableManager
+        from airtable_sync import IncrementalSync
+        sync = IncrementalSync(AirtableManager())
+        sync.load_index()
+        sinks.append(AirtableSeatSink(sync))
+
+    watcher = SeatWatcher([WatchTarget.parse(t) for t in args.targets], sinks,
+                          interval=args.interval, workers=args.workers)
+    try:
+        watcher.run(max_polls=args.polls)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        for sink in sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+
+
+if __name__ == "__main__":
+    main()